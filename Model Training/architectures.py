@@ -0,0 +1,81 @@
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import (Conv2D, SeparableConv2D, MaxPooling2D, GlobalAveragePooling2D, Flatten,
+                                     Dense, Dropout, BatchNormalization, Activation)
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.regularizers import l2
+
+# The two trainers' networks with their hyperparameters exposed. Defaults are
+# the hand-tuned values the trainers use; sweep.py varies them. Each conv
+# block is two Conv2D + BatchNormalization, max pooling and dropout, and
+# `dropout` has one rate per block plus one for the dense layers.
+
+
+# Emotion DCNN (emotion_trainer.py)
+def build_emotion_net(input_shape, num_classes, filters=(64, 128, 256), dropout=(0.4, 0.4, 0.5, 0.6),
+                      dense=128, learning_rate=0.001):
+    model = Sequential(name='DCNN')
+    for block, (n, rate) in enumerate(zip(filters, dropout)):
+        kernel = (5,5) if block == 0 else (3,3)
+        extra = {'input_shape': input_shape} if block == 0 else {}
+        model.add(Conv2D(n, kernel, activation='elu', padding='same', kernel_initializer='he_normal', **extra))
+        model.add(BatchNormalization())
+        model.add(Conv2D(n, kernel, activation='elu', padding='same', kernel_initializer='he_normal'))
+        model.add(BatchNormalization())
+        model.add(MaxPooling2D(pool_size=(2,2)))
+        model.add(Dropout(rate))
+    model.add(Flatten())
+    model.add(Dense(dense, activation='elu', kernel_initializer='he_normal'))
+    model.add(BatchNormalization())
+    model.add(Dropout(dropout[len(filters)]))
+    model.add(Dense(num_classes, activation='softmax'))
+    model.compile(loss='categorical_crossentropy', optimizer=Adam(learning_rate=learning_rate), metrics=['accuracy'])
+    return model
+
+
+# Face detection CNN (face_trainer.py), with L2 regularization on conv and dense layers
+def build_face_net(input_shape, num_classes, filters=(32, 64, 128, 256), dropout=(0.35, 0.35, 0.45, 0.45, 0.55),
+                   dense=(256, 128), learning_rate=0.0005, l2_factor=1e-4):
+    model = Sequential(name='FaceDetectionCNN')
+    reg = l2(l2_factor)
+    for block, (n, rate) in enumerate(zip(filters, dropout)):
+        extra = {'input_shape': input_shape} if block == 0 else {}
+        model.add(Conv2D(n, (3,3), activation='relu', padding='same',
+                         kernel_initializer='he_normal', kernel_regularizer=reg, **extra))
+        model.add(BatchNormalization())
+        model.add(Conv2D(n, (3,3), activation='relu', padding='same',
+                         kernel_initializer='he_normal', kernel_regularizer=reg))
+        model.add(BatchNormalization())
+        model.add(MaxPooling2D(pool_size=(2,2)))
+        model.add(Dropout(rate))
+    model.add(Flatten())
+    for units in dense:
+        model.add(Dense(units, activation='relu', kernel_initializer='he_normal', kernel_regularizer=reg))
+        model.add(BatchNormalization())
+        model.add(Dropout(dropout[len(filters)]))
+    model.add(Dense(num_classes, activation='sigmoid'))
+    model.compile(loss='binary_crossentropy', optimizer=Adam(learning_rate=learning_rate), metrics=['accuracy'])
+    return model
+
+
+# Compact emotion students for emotion_distill.py: one conv per block,
+# depthwise-separable after the first (single-channel) layer when `separable`,
+# and global average pooling instead of Flatten so the head stays small.
+# Outputs logits; emotion_distill.py adds the softmax for deployment.
+def build_emotion_student(input_shape, num_classes, filters=(32, 64, 128), separable=True, dense=64, dropout=0.3):
+    model = Sequential(name='DCNN_student')
+    for block, n in enumerate(filters):
+        if block == 0:
+            model.add(Conv2D(n, (3,3), padding='same', use_bias=False, input_shape=input_shape))
+        elif separable:
+            model.add(SeparableConv2D(n, (3,3), padding='same', use_bias=False))
+        else:
+            model.add(Conv2D(n, (3,3), padding='same', use_bias=False))
+        model.add(BatchNormalization())
+        model.add(Activation('elu'))
+        model.add(MaxPooling2D(pool_size=(2,2)))
+    model.add(GlobalAveragePooling2D())
+    model.add(Dropout(dropout))
+    if dense:
+        model.add(Dense(dense, activation='elu', kernel_initializer='he_normal'))
+    model.add(Dense(num_classes))
+    return model
@@ -0,0 +1,59 @@
+import os
+import time
+import argparse
+import numpy as np
+
+# Training input throughput in samples/s on a fixed number of cores:
+#   generator - ImageDataGenerator.flow over in-memory float32 arrays (what the trainers did)
+#   sequence  - ImageDataGenerator.random_transform per sample over the shards
+#   tfdata    - input_pipeline.make_dataset with batched augmentation
+#
+#   python bench_input_pipeline.py emotion_shards --split train --cores 4 --batches 200
+
+parser = argparse.ArgumentParser(description='Input pipeline throughput benchmark')
+parser.add_argument('shards', help="emotion_shards or face_detection_shards")
+parser.add_argument('--split', default='train')
+parser.add_argument('--cores', type=int, default=os.cpu_count())
+parser.add_argument('--batch-size', type=int, default=32)
+parser.add_argument('--batches', type=int, default=200)
+args = parser.parse_args()
+
+# Pin the process (and TensorFlow's pools) to the same cores for every pipeline
+os.sched_setaffinity(0, set(range(args.cores)))
+import tensorflow as tf
+tf.config.threading.set_inter_op_parallelism_threads(args.cores)
+tf.config.threading.set_intra_op_parallelism_threads(args.cores)
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from dataset_shards import ShardedSplit, ShardSequence
+from input_pipeline import make_dataset, EMOTION_AUGMENTATION, FACE_AUGMENTATION
+
+split = ShardedSplit(args.shards, args.split)
+is_face = split.shape[-1] == 3
+augmentation = FACE_AUGMENTATION if is_face else EMOTION_AUGMENTATION
+datagen = ImageDataGenerator(fill_mode='nearest', **augmentation)
+
+# Time `batches` batches from an iterator after a short warm-up
+def throughput(it, batches):
+    for _ in range(3):
+        next(it)
+    start = time.perf_counter()
+    samples = 0
+    for _ in range(batches):
+        X, _ = next(it)
+        samples += len(X)
+    return samples / (time.perf_counter() - start)
+
+n = min(len(split), args.batch_size * (args.batches + 3))
+X = split.take(np.arange(n))
+y = np.asarray(split.labels[:n])
+
+results = {
+    'generator': throughput(iter(datagen.flow(X, y, batch_size=args.batch_size)), args.batches),
+    'sequence': throughput((s for s in ShardSequence(split, args.batch_size, datagen=datagen)), args.batches),
+    'tfdata': throughput(iter(make_dataset(split, args.batch_size, augmentation=augmentation,
+                                           cache=not is_face).repeat()), args.batches),
+}
+
+print(f"{args.shards}/{args.split}, image {split.shape[1:]}, batch {args.batch_size}, {args.cores} core(s)")
+for name, rate in results.items():
+    print(f"{name:<10} {rate:>10.0f} samples/s  {rate / results['generator']:>5.1f}x")
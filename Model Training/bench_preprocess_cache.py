@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+import numpy as np
+import cv2
+
+# Rebuild time of emotion_preprocessing.py / face_preprocessing.py on a
+# synthetic dataset: full rebuild (INCREMENTAL = False) against incremental
+# rebuilds through the content-hash cache after 1% of the files changed
+# (half modified, a quarter added, a quarter deleted) and after a new emotion
+# folder shifted label_map. Every incremental output is checked against a
+# from-scratch build of the same tree.
+#
+#   python bench_preprocess_cache.py --dataset emotion --images 20000
+#   python bench_preprocess_cache.py --dataset face --images 2000 --workers 4
+
+parser = argparse.ArgumentParser(description='Incremental preprocessing cache benchmark')
+parser.add_argument('--dataset', choices=['emotion', 'face'], default='emotion')
+parser.add_argument('--images', type=int, default=10000)
+parser.add_argument('--change', type=float, default=0.01, help="fraction of files changed")
+parser.add_argument('--workers', type=int, default=None)
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+FACE_SOURCE_SIZE = (640, 480)  # cabin camera frames, before the 224x224 resize
+rng = np.random.default_rng(args.seed)
+
+
+def write_image(path):
+    if args.dataset == 'emotion':
+        img = rng.integers(0, 256, (48, 48), dtype=np.uint8)
+    else:
+        img = cv2.GaussianBlur(rng.integers(0, 256, FACE_SOURCE_SIZE[::-1] + (3,), dtype=np.uint8), (9, 9), 0)
+    cv2.imwrite(path, img)
+
+
+def write_boxes(path):
+    with open(path, "w") as f:
+        for _ in range(rng.integers(0, 3)):
+            f.write("0 " + " ".join(f"{v:.4f}" for v in rng.uniform(0.1, 0.9, 4)) + "\n")
+
+
+# Dataset layout expected by each script, relative to the working directory
+def make_dataset(n):
+    if args.dataset == 'emotion':
+        for i in range(n):
+            split = "test" if i % 5 == 0 else "train"
+            folder = os.path.join("Datasets/emotion_detection", split, EMOTIONS[i % len(EMOTIONS)])
+            os.makedirs(folder, exist_ok=True)
+            write_image(os.path.join(folder, f"{i:06d}.png"))
+        return
+    for i in range(n):
+        split = "val" if i % 5 == 0 else "train"
+        for kind in ("images", "labels"):
+            os.makedirs(os.path.join("Datasets/face_detection", kind, split), exist_ok=True)
+        write_image(os.path.join("Datasets/face_detection/images", split, f"{i:06d}.jpg"))
+        write_boxes(os.path.join("Datasets/face_detection/labels", split, f"{i:06d}.txt"))
+
+
+def image_files():
+    root = "Datasets/emotion_detection" if args.dataset == 'emotion' else "Datasets/face_detection/images"
+    return sorted(os.path.join(d, f) for d, _, files in os.walk(root) for f in files)
+
+
+# Modify half, add a quarter and delete a quarter of `fraction` of the images
+def change_files(fraction):
+    files = image_files()
+    n = max(4, int(len(files) * fraction))
+    picked = rng.choice(len(files), n // 2 + n // 4, replace=False)
+    for i in picked[:n // 2]:
+        write_image(files[i])
+    for i in picked[n // 2:]:
+        os.remove(files[i])
+        if args.dataset == 'face':
+            os.remove(files[i].replace("/images/", "/labels/").rsplit(".", 1)[0] + ".txt")
+    for i in range(n // 4):
+        path = files[rng.integers(len(files))]
+        stem, ext = os.path.splitext(os.path.basename(path))
+        new = os.path.join(os.path.dirname(path), f"new_{time.monotonic_ns()}_{i}{ext}")
+        write_image(new)
+        if args.dataset == 'face':
+            write_boxes(new.replace("/images/", "/labels/").rsplit(".", 1)[0] + ".txt")
+    return n
+
+
+def build(module, out_dir, incremental):
+    module.INCREMENTAL = incremental
+    if args.dataset == 'emotion':
+        module.label_map = {e: i for i, e in enumerate(sorted(os.listdir(module.TRAIN_PATH)))}
+        fn = module.build_shards
+    else:
+        fn = module.build_face_shards
+    start = time.perf_counter()
+    fn(out_dir)
+    return time.perf_counter() - start
+
+
+def same_output(a, b):
+    from dataset_shards import ShardedSplit, read_index
+    for split in read_index(b)['splits']:
+        x, y = ShardedSplit(a, split), ShardedSplit(b, split)
+        if len(x) != len(y) or not np.array_equal(x.take(np.arange(len(x)), normalize=False),
+                                                  y.take(np.arange(len(y)), normalize=False)):
+            return False
+        if not np.array_equal(x.labels, y.labels):
+            return False
+        if hasattr(y, 'box_values') and not np.array_equal(x.box_values, y.box_values):
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    tmp = tempfile.mkdtemp(prefix="bench_preprocess_")
+    os.chdir(tmp)
+    try:
+        make_dataset(args.images)
+        module = importlib.import_module(f"{args.dataset}_preprocessing")
+        module.WORKERS = args.workers
+        out, fresh = "cached_shards", "fresh_shards"
+
+        timings = {'full rebuild': build(module, fresh, False),
+                   'first incremental build': build(module, out, True),
+                   'incremental, nothing changed': build(module, out, True)}
+        changed = change_files(args.change)
+        timings[f'incremental, {changed} files changed'] = build(module, out, True)
+        timings['full rebuild after the change'] = build(module, fresh, False)
+        checks = [same_output(out, fresh)]
+
+        if args.dataset == 'emotion':
+            # A new folder that sorts first shifts every other emotion's label
+            folder = "Datasets/emotion_detection/train/aaa_distracted"
+            os.makedirs(folder)
+            for i in range(max(1, changed // 2)):
+                write_image(os.path.join(folder, f"{i:06d}.png"))
+            timings['incremental, new emotion folder'] = build(module, out, True)
+            build(module, fresh, False)
+            checks.append(same_output(out, fresh))
+
+        print(f"\n{args.dataset}: {args.images} images, {args.workers or os.cpu_count()} worker(s)")
+        full = timings['full rebuild after the change']
+        for name, seconds in timings.items():
+            print(f"{name:<36} {seconds:>8.2f} s  {full / seconds:>6.1f}x")
+        print(f"Incremental output identical to a from-scratch build: {all(checks)}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,251 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from multiprocessing import Pool
+from tqdm import tqdm
+from tensorflow.keras.utils import Sequence, to_categorical
+
+# On-disk layout written by the preprocessing scripts:
+#   <out_dir>/index.json             image shape, label map and per-split shard list
+#   <out_dir>/<split>_00000.npy ...  uint8 image shards, (n, H, W, C)
+#   <out_dir>/<split>_labels.npy     one label row per image, in shard order
+#   <out_dir>/<split>_boxes_*.npy    optional ragged boxes: offsets (n+1,) and values (total, 5)
+#   <out_dir>/<split>_keys.npy       content digest of each image's source file, (n, 16) uint8
+# Images stay uint8 on disk; scaling to [0,1] happens when a batch is read.
+SHARD_SIZE = 4096
+INDEX_FILE = "index.json"
+DIGEST_SIZE = 16  # bytes of BLAKE2b per source file
+
+
+def _shard_path(out_dir, split, i):
+    return os.path.join(out_dir, f"{split}_{i:05d}.npy")
+
+
+def _keys_path(out_dir, split):
+    return os.path.join(out_dir, f"{split}_keys.npy")
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.digest()
+
+
+class ShardCache:
+    """
+    The previous build in `out_dir`, addressed by image content. Images whose
+    source file digest appears there, built with the same `params` (image
+    size, colour mode, ...), are copied from the old shards instead of being
+    decoded again. Labels are never cached: they are recomputed from the
+    current listing on every run, so a changed label map cannot go stale.
+    """
+
+    def __init__(self, out_dir, params):
+        self.params = json.loads(json.dumps(params))  # tuples become lists, as in index.json
+        self.rows = {}
+        self.hits = self.misses = 0
+        if not has_shards(out_dir):
+            return
+        meta = read_index(out_dir)
+        if meta.get('params') != self.params:
+            print(f"Preprocessing parameters changed, rebuilding {out_dir} from scratch")
+            return
+        for split, info in meta['splits'].items():
+            if not os.path.exists(_keys_path(out_dir, split)):
+                continue
+            keys = np.load(_keys_path(out_dir, split))
+            row = 0
+            for s in info['shards']:
+                shard = np.asarray(np.load(os.path.join(out_dir, s['file']), mmap_mode='r'))  # plain view, cheaper rows
+                for i in range(s['count']):
+                    self.rows[keys[row + i].tobytes()] = (shard, i)
+                row += s['count']
+
+    def results(self, pool, items, keys, load_fn, label_fn):
+        # Same sequence as pool.imap(load_fn, items): cached images with fresh
+        # labels, and only the misses decoded by the pool
+        misses = [item for item, key in zip(items, keys) if key not in self.rows]
+        decoded = pool.imap(load_fn, misses, chunksize=64)
+        for item, key in zip(items, keys):
+            if key in self.rows:
+                shard, i = self.rows[key]
+                self.hits += 1
+                yield shard[i], label_fn(item)
+            else:
+                self.misses += 1
+                yield next(decoded)
+
+
+def write_split(out_dir, split, items, load_fn, image_shape, shard_size=SHARD_SIZE, workers=None,
+                cache=None, label_fn=None):
+    """
+    Decode `items` with `load_fn` across a process pool and stream the images
+    into fixed-size uint8 shards. `load_fn(item)` returns (image, label) or
+    None for unreadable files. Only one shard is open at a time, so peak RAM
+    does not grow with the dataset. Returns the shard list and the labels.
+
+    With a ShardCache, each item's image file (`item[0]`) is hashed first,
+    unchanged images are reused with `label_fn(item)` as their label, and the
+    digests are saved alongside the shards for the next build.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    shards, labels, written = [], [], []
+    shard, count = None, 0
+
+    with Pool(workers) as pool:
+        if cache is None:
+            keys = None
+            results = pool.imap(load_fn, items, chunksize=64)
+        else:
+            keys = list(tqdm(pool.imap(file_digest, [item[0] for item in items], chunksize=256),
+                             total=len(items), desc=f"Hashing {split}"))
+            results = cache.results(pool, items, keys, load_fn, label_fn)
+        for n, result in enumerate(tqdm(results, total=len(items), desc=f"Processing {split}")):
+            if result is None:
+                continue
+            image, label = result
+            if keys is not None:
+                written.append(keys[n])
+            if shard is None:
+                path = _shard_path(out_dir, split, len(shards))
+                size = min(shard_size, len(items) - sum(s['count'] for s in shards))
+                shard = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(size,) + tuple(image_shape))
+                shards.append({'file': os.path.basename(path), 'count': 0})
+                count = 0
+            shard[count] = image
+            count += 1
+            labels.append(label)
+            shards[-1]['count'] = count
+            if count == len(shard):
+                shard.flush()
+                shard = None
+
+    if shard is not None:
+        shard.flush()
+        del shard
+    if keys is not None:
+        np.save(_keys_path(out_dir, split), np.frombuffer(b"".join(written), dtype=np.uint8).reshape(-1, DIGEST_SIZE))
+
+    return shards, labels
+
+
+def staging_dir(out_dir):
+    """Empty sibling directory to build into while `out_dir` serves as the cache."""
+    staging = out_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    return staging
+
+
+def replace_dir(staging, out_dir):
+    old = out_dir.rstrip(os.sep) + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old)
+    os.rename(staging, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def write_ragged(out_dir, split, rows, width):
+    """Store a list of variable-length rows as offsets + values arrays."""
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(r) for r in rows])
+    values = np.array([v for r in rows for v in r], dtype=np.float32).reshape(-1, width)
+    files = {'offsets': f"{split}_boxes_offsets.npy", 'values': f"{split}_boxes_values.npy"}
+    np.save(os.path.join(out_dir, files['offsets']), offsets)
+    np.save(os.path.join(out_dir, files['values']), values)
+    return files
+
+
+def write_index(out_dir, meta):
+    with open(os.path.join(out_dir, INDEX_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_index(out_dir):
+    with open(os.path.join(out_dir, INDEX_FILE)) as f:
+        return json.load(f)
+
+
+class ShardedSplit:
+    """Read-only, memory-mapped view of one split (e.g. 'train')."""
+
+    def __init__(self, out_dir, split):
+        self.meta = read_index(out_dir)
+        info = self.meta['splits'][split]
+        self.shards = [np.load(os.path.join(out_dir, s['file']), mmap_mode='r')[:s['count']] for s in info['shards']]
+        self.labels = np.load(os.path.join(out_dir, info['labels']), mmap_mode='r')
+        if 'boxes' in info:
+            self.box_offsets = np.load(os.path.join(out_dir, info['boxes']['offsets']), mmap_mode='r')
+            self.box_values = np.load(os.path.join(out_dir, info['boxes']['values']), mmap_mode='r')
+        self.offsets = np.cumsum([0] + [len(s) for s in self.shards])
+        self.shape = (int(self.offsets[-1]),) + tuple(self.meta['image_shape'])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def boxes(self, i):
+        """Every box of image i as a (k, 5) array of class_id, x, y, w, h."""
+        return self.box_values[self.box_offsets[i]:self.box_offsets[i + 1]]
+
+    def take(self, indices, normalize=True):
+        """Gather images by global index; float32 in [0,1] unless normalize=False."""
+        indices = np.asarray(indices)
+        out = np.empty((len(indices),) + self.shape[1:], dtype=np.float32 if normalize else np.uint8)
+        shard_ids = np.searchsorted(self.offsets, indices, side='right') - 1
+        for i, (s, idx) in enumerate(zip(shard_ids, indices)):
+            out[i] = self.shards[s][idx - self.offsets[s]]
+        if normalize:
+            out *= 1 / 255.0
+        return out
+
+    def batches(self, batch_size, shuffle=False, seed=None):
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        for start in range(0, len(order), batch_size):
+            idx = np.sort(order[start:start + batch_size])  # sorted reads are friendlier to the page cache
+            yield self.take(idx), self.labels[idx]
+
+
+class ShardSequence(Sequence):
+    """
+    Keras input for a ShardedSplit: reads one batch at a time from the
+    memory-mapped shards, optionally augmented with an ImageDataGenerator.
+    """
+
+    def __init__(self, split, batch_size, num_classes=None, datagen=None, shuffle=True, seed=None):
+        super().__init__()
+        self.split = split
+        self.batch_size = batch_size
+        self.num_classes = num_classes
+        self.datagen = datagen
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.order = np.arange(len(split))
+        self.on_epoch_end()
+
+    def __len__(self):
+        return (len(self.split) + self.batch_size - 1) // self.batch_size
+
+    def __getitem__(self, i):
+        idx = np.sort(self.order[i * self.batch_size:(i + 1) * self.batch_size])
+        X = self.split.take(idx)
+        if self.datagen is not None:
+            X = np.stack([self.datagen.random_transform(x) for x in X])
+        y = np.asarray(self.split.labels[idx])
+        if self.num_classes:
+            y = to_categorical(y, num_classes=self.num_classes)
+        return X, y
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+
+def has_shards(out_dir):
+    return os.path.exists(os.path.join(out_dir, INDEX_FILE))
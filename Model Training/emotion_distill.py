@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# Knowledge distillation of the emotion DCNN (model1.h5) into compact students
+# (architectures.build_emotion_student). Each student is trained on the same
+# 48x48 data against the hard labels and the teacher's temperature-softened
+# outputs. Teacher and students are then exported to float16 TFLite, the
+# format the Pi runs, and compared in a Pareto table of accuracy against
+# latency and size. The fastest student within ACCURACY_MARGIN of the teacher
+# is saved as model1_student.h5 / model1_student_float16.tflite.
+#
+#   python3 emotion_distill.py
+#   python3 emotion_distill.py --students sep-32-64-128 narrow-32-64-128 --epochs 40
+import argparse
+import csv
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+import numpy as np
+
+# Constants
+TEACHER_PATH = "model1.h5"
+OUT_DIR = "students"
+RESULTS_FILE = "distill_results.csv"
+STUDENT_PATH = "model1_student.h5"
+STUDENT_TFLITE = "model1_student_float16.tflite"
+TEMPERATURE = 4.0         # softens the teacher's distribution so the non-argmax classes carry signal
+ALPHA = 0.1               # weight of the hard-label loss; the rest goes to matching the teacher
+ACCURACY_MARGIN = 0.02    # a student may trail the teacher by at most 2 accuracy points
+SPEEDUP_TARGET = 3.0
+EPOCHS = 60
+BATCH_SIZE = 64
+LEARNING_RATE = 1e-3
+
+# Student name -> build_emotion_student arguments
+STUDENTS = {
+    'sep-64-128-256': {'filters': (64, 128, 256), 'separable': True, 'dense': 128},
+    'sep-32-64-128-256': {'filters': (32, 64, 128, 256), 'separable': True, 'dense': 64},
+    'sep-32-64-128': {'filters': (32, 64, 128), 'separable': True, 'dense': 64},
+    'sep-16-32-64': {'filters': (16, 32, 64), 'separable': True, 'dense': 0},
+    'narrow-32-64-128': {'filters': (32, 64, 128), 'separable': False, 'dense': 64},
+}
+
+# Setup logging
+log_dir = Path("logs")
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=str(log_dir / "distill.log"),
+    level=logging.INFO,
+    format='%(asctime)s - %(message)s'
+)
+
+
+def make_distiller(student, teacher):
+    import tensorflow as tf
+
+    class Distiller(tf.keras.Model):
+        """Trains `student` (logits) on hard labels plus the softened teacher."""
+
+        def __init__(self):
+            super().__init__()
+            self.student = student
+            self.teacher = teacher
+            self.teacher.trainable = False
+
+        def call(self, x, training=False):
+            return self.student(x, training=training)
+
+        def compute_loss(self, x=None, y=None, y_pred=None, sample_weight=None, **kwargs):
+            # The teacher ends in a softmax; its log-probabilities are logits
+            # up to a per-sample constant, which the softmax below cancels
+            teacher_logits = tf.math.log(self.teacher(x, training=False) + 1e-7)
+            hard = tf.keras.losses.categorical_crossentropy(y, y_pred, from_logits=True)
+            soft = tf.keras.losses.kl_divergence(tf.nn.softmax(teacher_logits / TEMPERATURE),
+                                                 tf.nn.softmax(y_pred / TEMPERATURE))
+            # T^2 keeps the soft-target gradients on the same scale as the hard ones
+            return tf.reduce_mean(ALPHA * hard + (1 - ALPHA) * TEMPERATURE ** 2 * soft)
+
+    return Distiller()
+
+
+# Student with the softmax head the Pi backends expect
+def deployable(student):
+    import tensorflow as tf
+    return tf.keras.Model(student.inputs, tf.keras.layers.Softmax()(student.outputs[0]), name=student.name)
+
+
+def export_float16(model, path):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    Path(path).write_bytes(converter.convert())
+
+
+def accuracy(model, dataset):
+    correct = total = 0
+    for x, y in dataset:
+        pred = model(x, training=False).numpy()
+        correct += int(np.sum(np.argmax(pred, axis=1) == np.argmax(y.numpy(), axis=1)))
+        total += len(pred)
+    return correct / total
+
+
+# Rows not beaten on all of accuracy, latency and size by another row
+def pareto_front(rows):
+    def dominates(a, b):
+        no_worse = (a['accuracy'] >= b['accuracy'] and a['latency_ms'] <= b['latency_ms']
+                    and a['size_mb'] <= b['size_mb'])
+        better = (a['accuracy'] > b['accuracy'] or a['latency_ms'] < b['latency_ms']
+                  or a['size_mb'] < b['size_mb'])
+        return no_worse and better
+    for r in rows:
+        r['pareto'] = not any(dominates(other, r) for other in rows if other is not r)
+
+
+def print_table(rows, teacher):
+    header = (f"{'model':<20} {'params':>10} {'size MB':>8} {'accuracy':>9} {'drop':>7} {'ms/img':>7} "
+              f"{'speedup':>8} {'pareto':>7} {'margin':>7}")
+    print("\n" + header)
+    logging.info(header)
+    for r in sorted(rows, key=lambda r: r['latency_ms']):
+        line = (f"{r['name']:<20} {r['parameters']:>10,} {r['size_mb']:>8.2f} {r['accuracy']:>9.4f} "
+                f"{teacher['accuracy'] - r['accuracy']:>7.4f} {r['latency_ms']:>7.2f} "
+                f"{teacher['latency_ms'] / r['latency_ms']:>7.1f}x {'*' if r['pareto'] else '':>7} "
+                f"{'ok' if r['within_margin'] else '-':>7}")
+        print(line)
+        logging.info(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Distil model1.h5 into compact students')
+    parser.add_argument('--students', nargs='+', choices=sorted(STUDENTS), default=list(STUDENTS))
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.optimizers import Adam
+    from architectures import build_emotion_student
+    from dataset_shards import ShardedSplit
+    from input_pipeline import make_dataset, EMOTION_AUGMENTATION
+    from sweep import dataset_dir, measure_latency
+
+    # Same 48x48 data as emotion_trainer.py / sweep.py
+    data_dir = dataset_dir('emotion')
+    train_split = ShardedSplit(data_dir, 'train')
+    valid_split = ShardedSplit(data_dir, 'test')
+    num_classes = len(train_split.meta['label_map'])
+    input_shape = train_split.shape[1:]
+    valid_data = make_dataset(valid_split, batch_size=256, num_classes=num_classes, shuffle=False)
+    print(f"Training Data: {train_split.shape}, Validation Data: {valid_split.shape}, classes: {num_classes}")
+
+    teacher = load_model(TEACHER_PATH)
+    os.makedirs(OUT_DIR, exist_ok=True)
+    rows = [{'name': 'teacher', 'model': teacher, 'h5': TEACHER_PATH, 'tflite': os.path.join(OUT_DIR, "teacher.tflite"),
+             'accuracy': accuracy(teacher, valid_data), 'parameters': int(teacher.count_params())}]
+    print(f"[{time.ctime()}] teacher {TEACHER_PATH}: accuracy {rows[0]['accuracy']:.4f}")
+    logging.info(f"Teacher {TEACHER_PATH}: accuracy {rows[0]['accuracy']:.4f}")
+
+    for name in args.students:
+        student = build_emotion_student(input_shape, num_classes, **STUDENTS[name])
+        distiller = make_distiller(student, teacher)
+        distiller.compile(optimizer=Adam(learning_rate=LEARNING_RATE), metrics=['accuracy'])
+        train_data = make_dataset(train_split, batch_size=BATCH_SIZE, num_classes=num_classes,
+                                  augmentation=EMOTION_AUGMENTATION)
+        start = time.time()
+        history = distiller.fit(train_data, validation_data=valid_data, epochs=args.epochs, verbose=2, callbacks=[
+            EarlyStopping(monitor='val_accuracy', patience=11, restore_best_weights=True),
+            ReduceLROnPlateau(monitor='val_accuracy', factor=0.5, patience=5, min_lr=1e-6)])
+        model = deployable(student)
+        h5_path = os.path.join(OUT_DIR, f"{name}.h5")
+        model.save(h5_path)
+        rows.append({'name': name, 'model': model, 'h5': h5_path, 'tflite': os.path.join(OUT_DIR, f"{name}.tflite"),
+                     'accuracy': accuracy(model, valid_data), 'parameters': int(model.count_params())})
+        print(f"[{time.ctime()}] {name}: accuracy {rows[-1]['accuracy']:.4f} after {len(history.epoch)} epochs "
+              f"({time.time() - start:.0f} s)")
+        logging.info(f"{name} {STUDENTS[name]}: accuracy {rows[-1]['accuracy']:.4f} after {len(history.epoch)} epochs")
+
+    for r in rows:
+        export_float16(r['model'], r['tflite'])
+        r['size_mb'] = os.path.getsize(r['tflite']) / 1e6
+    # measure_latency pins this process to the Pi's core count; nothing trains after this
+    for r, ms in zip(rows, measure_latency([r['tflite'] for r in rows], input_shape)):
+        r['latency_ms'] = ms
+    teacher_row = rows[0]
+    for r in rows:
+        r['within_margin'] = teacher_row['accuracy'] - r['accuracy'] <= ACCURACY_MARGIN
+    pareto_front(rows)
+    print_table(rows, teacher_row)
+
+    with open(RESULTS_FILE, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(['model', 'parameters', 'size_mb', 'accuracy', 'latency_ms', 'speedup', 'pareto', 'within_margin'])
+        for r in rows:
+            writer.writerow([r['name'], r['parameters'], f"{r['size_mb']:.3f}", f"{r['accuracy']:.4f}",
+                             f"{r['latency_ms']:.3f}", f"{teacher_row['latency_ms'] / r['latency_ms']:.2f}",
+                             int(r['pareto']), int(r['within_margin'])])
+    print(f"\nResults saved to {RESULTS_FILE}")
+
+    candidates = [r for r in rows[1:] if r['within_margin']]
+    if not candidates:
+        print(f"No student within {ACCURACY_MARGIN:.0%} of the teacher; nothing saved")
+        logging.info("No student within the accuracy margin")
+    else:
+        best = min(candidates, key=lambda r: r['latency_ms'])
+        speedup = teacher_row['latency_ms'] / best['latency_ms']
+        shutil.copyfile(best['h5'], STUDENT_PATH)
+        shutil.copyfile(best['tflite'], STUDENT_TFLITE)
+        message = (f"Best student {best['name']}: {speedup:.1f}x the teacher's throughput, "
+                   f"accuracy {best['accuracy']:.4f} vs {teacher_row['accuracy']:.4f} "
+                   f"(margin {ACCURACY_MARGIN:.0%}); saved as {STUDENT_PATH} and {STUDENT_TFLITE}")
+        if speedup < SPEEDUP_TARGET:
+            message += f" - below the {SPEEDUP_TARGET:.0f}x target"
+        print(message)
+        logging.info(message)
@@ -0,0 +1,131 @@
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+import os
+import time
+import logging
+from pathlib import Path
+from dataset_shards import ShardedSplit, has_shards
+
+# Export the trained DCNN (model1.h5 from emotion_trainer.py) to TFLite for the Pi:
+#   model1_float16.tflite - float16 weights, float32 compute
+#   model1_int8.tflite    - full integer quantization, calibrated on training images
+MODEL_PATH = "model1.h5"
+SHARDS_PATH = "emotion_shards"  # Output of emotion_preprocessing.py (default 'shards' format)
+DATA_PATH = "preprocessed_image_data.npz"  # Its 'npz' output, used only when there are no shards
+FLOAT16_PATH = "model1_float16.tflite"
+INT8_PATH = "model1_int8.tflite"
+CALIBRATION_SAMPLES = 500
+EVAL_SAMPLES = 2000
+LATENCY_RUNS = 200
+
+# Setup logging
+log_dir = Path("logs")
+log_dir.mkdir(exist_ok=True)
+logging.basicConfig(
+    filename=str(log_dir / "export.log"),
+    level=logging.INFO,
+    format='%(asctime)s - %(message)s'
+)
+
+# Resident memory of this process in MB
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+# Load model and data
+rss_start = rss_mb()
+model = load_model(MODEL_PATH)
+keras_rss = rss_mb() - rss_start
+# Calibration images: a fixed random subset of the training images
+rng = np.random.default_rng(0)
+if has_shards(SHARDS_PATH) or not os.path.exists(DATA_PATH):
+    # Only the sampled rows are read from the memory-mapped shards
+    train, test = ShardedSplit(SHARDS_PATH, 'train'), ShardedSplit(SHARDS_PATH, 'test')
+    indices = rng.choice(len(train), size=min(CALIBRATION_SAMPLES, len(train)), replace=False)
+    X_calib = train.take(indices)
+    n = min(EVAL_SAMPLES, len(test))
+    X_test, y_test = test.take(np.arange(n)), test.labels[:n].astype(np.int64)
+    print(f"Calibration pool: {len(train)} images in {SHARDS_PATH}/, evaluation: {X_test.shape}")
+else:
+    data = np.load(DATA_PATH)
+    X_train, X_test, y_test = data['X_train'], data['X_test'], data['y_test']
+    indices = rng.choice(len(X_train), size=min(CALIBRATION_SAMPLES, len(X_train)), replace=False)
+    X_calib = X_train[indices].astype('float32')
+    X_test = X_test[:EVAL_SAMPLES].astype('float32')
+    y_test = np.argmax(y_test[:EVAL_SAMPLES], axis=1)
+    print(f"Calibration pool: {X_train.shape}, evaluation: {X_test.shape}")
+
+# Representative dataset for the int8 calibration
+def representative_dataset():
+    for i in range(len(X_calib)):
+        yield [X_calib[i:i+1]]
+
+# Convert
+converter = tf.lite.TFLiteConverter.from_keras_model(model)
+converter.optimizations = [tf.lite.Optimize.DEFAULT]
+converter.target_spec.supported_types = [tf.float16]
+Path(FLOAT16_PATH).write_bytes(converter.convert())
+print(f"Saved {FLOAT16_PATH}")
+
+converter = tf.lite.TFLiteConverter.from_keras_model(model)
+converter.optimizations = [tf.lite.Optimize.DEFAULT]
+converter.representative_dataset = representative_dataset
+converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+converter.inference_input_type = tf.int8
+converter.inference_output_type = tf.int8
+Path(INT8_PATH).write_bytes(converter.convert())
+print(f"Saved {INT8_PATH}")
+
+# Run a TFLite model over a batch, one sample per invoke as on the Pi
+def tflite_predict(interpreter, X):
+    inp = interpreter.get_input_details()[0]
+    out = interpreter.get_output_details()[0]
+    preds = []
+    for x in X:
+        x = x[np.newaxis]
+        if inp['dtype'] == np.int8:
+            scale, zero_point = inp['quantization']
+            x = np.clip(np.round(x / scale + zero_point), -128, 127).astype(np.int8)
+        interpreter.set_tensor(inp['index'], x)
+        interpreter.invoke()
+        y = interpreter.get_tensor(out['index'])
+        if out['dtype'] == np.int8:
+            scale, zero_point = out['quantization']
+            y = (y.astype(np.float32) - zero_point) * scale
+        preds.append(y[0])
+    return np.array(preds)
+
+# Median single-image latency in ms
+def latency_ms(fn):
+    fn()
+    samples = []
+    for i in range(LATENCY_RUNS):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return np.median(samples) * 1000
+
+# Compare against the .h5 model
+results = []
+keras_acc = np.mean(np.argmax(model.predict(X_test, verbose=0), axis=1) == y_test)
+keras_lat = latency_ms(lambda: model(X_test[:1], training=False))
+results.append(("keras (.h5)", os.path.getsize(MODEL_PATH), keras_rss, keras_acc, keras_lat))
+
+for name, path in (("tflite float16", FLOAT16_PATH), ("tflite int8", INT8_PATH)):
+    rss_before = rss_mb()
+    interpreter = tf.lite.Interpreter(model_path=path, num_threads=4)
+    interpreter.allocate_tensors()
+    rss = rss_mb() - rss_before
+    acc = np.mean(np.argmax(tflite_predict(interpreter, X_test), axis=1) == y_test)
+    lat = latency_ms(lambda: tflite_predict(interpreter, X_test[:1]))
+    results.append((name, os.path.getsize(path), rss, acc, lat))
+
+header = f"{'model':<16} {'size MB':>8} {'RSS MB':>8} {'accuracy':>9} {'drop':>7} {'ms/img':>8} {'speedup':>8}"
+print(header)
+logging.info(header)
+for name, size, rss, acc, lat in results:
+    line = (f"{name:<16} {size / 1e6:>8.2f} {rss:>8.1f} {acc:>9.4f} {keras_acc - acc:>7.4f}"
+            f" {lat:>8.2f} {keras_lat / lat:>7.1f}x")
+    print(line)
+    logging.info(line)
@@ -3,6 +3,7 @@ import numpy as np
 import cv2
 import tensorflow as tf
 from tqdm import tqdm
+from dataset_shards import write_split, write_index, ShardCache, staging_dir, replace_dir
 
 # Define Image Size and Paths
 IMG_SIZE = (48, 48)  # Resize images to 48x48
@@ -10,6 +11,16 @@ DATASET_PATH = "Datasets/emotion_detection"  # Change this to your dataset path
 TRAIN_PATH = os.path.join(DATASET_PATH, "train")
 TEST_PATH = os.path.join(DATASET_PATH, "test")
 
+# 'shards' streams uint8 images into memory-mapped shards across a process pool;
+# 'npz' keeps the original single float64 .npz
+OUTPUT_FORMAT = 'shards'
+SHARDS_PATH = "emotion_shards"
+WORKERS = None  # None uses every core
+# Reuse images whose file content is unchanged since the last build in SHARDS_PATH;
+# bump PREPROCESS_VERSION whenever load_image changes what it produces
+INCREMENTAL = True
+PREPROCESS_VERSION = 1
+
 # Label Mapping
 label_map = {emotion: idx for idx, emotion in enumerate(sorted(os.listdir(TRAIN_PATH)))}
 
@@ -37,11 +48,57 @@ def load_dataset(dataset_path):
 
     return X, y
 
-# Load Train and Test Data
-X_train, y_train = load_dataset(TRAIN_PATH)
-X_test, y_test = load_dataset(TEST_PATH)
+# List (image path, label) pairs without decoding anything
+def list_dataset(dataset_path):
+    items = []
+    for emotion in sorted(os.listdir(dataset_path)):
+        emotion_path = os.path.join(dataset_path, emotion)
+        for file in sorted(os.listdir(emotion_path)):
+            items.append((os.path.join(emotion_path, file), label_map[emotion]))
+    return items
+
+# Worker: decode and resize one image, kept as uint8
+def load_image(item):
+    img_path, label = item
+    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)  # Load in grayscale
+    if img is None:
+        return None
+    img = cv2.resize(img, IMG_SIZE)  # Resize
+    return img[..., np.newaxis], label
+
+# Label of a cached image: taken from the current listing, never from the cache
+def item_label(item):
+    return item[1]
+
+# Write train/test as uint8 shards plus an index
+def build_shards(out_dir=SHARDS_PATH):
+    image_shape = (IMG_SIZE[1], IMG_SIZE[0], 1)
+    params = {'version': PREPROCESS_VERSION, 'img_size': IMG_SIZE, 'color': 'grayscale'}
+    cache = ShardCache(out_dir, params) if INCREMENTAL else None
+    staging = staging_dir(out_dir)
+    meta = {'image_shape': image_shape, 'label_map': label_map, 'params': params, 'splits': {}}
+    for split, path in (("train", TRAIN_PATH), ("test", TEST_PATH)):
+        shards, labels = write_split(staging, split, list_dataset(path), load_image, image_shape, workers=WORKERS,
+                                     cache=cache, label_fn=item_label)
+        labels_file = f"{split}_labels.npy"
+        np.save(os.path.join(staging, labels_file), np.array(labels, dtype=np.int16))
+        meta['splits'][split] = {'shards': shards, 'labels': labels_file}
+        print(f"{split}: {len(labels)} images in {len(shards)} shard(s)")
+    write_index(staging, meta)
+    replace_dir(staging, out_dir)
+    if cache is not None:
+        print(f"Reused {cache.hits} unchanged images, decoded {cache.misses}")
+
+if __name__ == "__main__":
+    if OUTPUT_FORMAT == 'shards':
+        build_shards()
+        print(f"Preprocessing Complete. Shards Saved to {SHARDS_PATH}/")
+    else:
+        # Load Train and Test Data
+        X_train, y_train = load_dataset(TRAIN_PATH)
+        X_test, y_test = load_dataset(TEST_PATH)
 
-# Save Preprocessed Data
-np.savez('preprocessed_image_data.npz', X_train=X_train, X_test=X_test, y_train=y_train, y_test=y_test)
+        # Save Preprocessed Data
+        np.savez('preprocessed_image_data.npz', X_train=X_train, X_test=X_test, y_train=y_train, y_test=y_test)
 
-print("Preprocessing Complete. Data Saved.")
+        print("Preprocessing Complete. Data Saved.")
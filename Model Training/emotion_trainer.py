@@ -1,16 +1,22 @@
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout, BatchNormalization
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, Callback
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.utils import to_categorical
 import tensorflow as tf
 import os
 import logging
 from pathlib import Path
+from dataset_shards import ShardedSplit, ShardSequence, has_shards
+from input_pipeline import make_dataset, EMOTION_AUGMENTATION
+from architectures import build_emotion_net
+
+# Shards written by emotion_preprocessing.py are memory-mapped when present;
+# otherwise the whole preprocessed .npz is loaded
+SHARDS_PATH = "emotion_shards"
+USE_SHARDS = has_shards(SHARDS_PATH)
+INPUT_PIPELINE = 'tfdata'  # with shards: 'tfdata' (batched augmentation) or 'generator' (ImageDataGenerator)
 
 # Setup logging
 log_dir = Path("logs")
@@ -28,45 +34,29 @@ class LoggingCallback(Callback):
         logging.info(f"Epoch {epoch+1} - loss: {logs.get('loss', 'N/A'):.4f} - accuracy: {logs.get('accuracy', 'N/A'):.4f} - val_loss: {logs.get('val_loss', 'N/A'):.4f} - val_accuracy: {logs.get('val_accuracy', 'N/A'):.4f}")
 
 # Load preprocessed data
-data = np.load('preprocessed_data.npz')
-X_train, X_valid, y_train, y_valid = data['X_train'], data['X_valid'], data['y_train'], data['y_valid']
+if USE_SHARDS:
+    train_split = ShardedSplit(SHARDS_PATH, 'train')
+    valid_split = ShardedSplit(SHARDS_PATH, 'test')
+    num_classes = len(train_split.meta['label_map'])
+    train_shape, valid_shape = train_split.shape, valid_split.shape
+    label_shapes = (len(train_split), num_classes), (len(valid_split), num_classes)
+else:
+    data = np.load('preprocessed_data.npz')
+    X_train, X_valid, y_train, y_valid = data['X_train'], data['X_valid'], data['y_train'], data['y_valid']
+    num_classes = y_train.shape[1]
+    train_shape, valid_shape = X_train.shape, X_valid.shape
+    label_shapes = y_train.shape, y_valid.shape
 # Print dataset shapes
-print(f"Training Data: {X_train.shape}, Labels: {y_train.shape}")
-print(f"Validation Data: {X_valid.shape}, Labels: {y_valid.shape}")
-logging.info(f"Training Data: {X_train.shape}, Labels: {y_train.shape}")
-logging.info(f"Validation Data: {X_valid.shape}, Labels: {y_valid.shape}")
+print(f"Training Data: {train_shape}, Labels: {label_shapes[0]}")
+print(f"Validation Data: {valid_shape}, Labels: {label_shapes[1]}")
+logging.info(f"Training Data: {train_shape}, Labels: {label_shapes[0]}")
+logging.info(f"Validation Data: {valid_shape}, Labels: {label_shapes[1]}")
 
 # Model parameters
-img_width, img_height, img_depth = X_train.shape[1], X_train.shape[2], X_train.shape[3]
-num_classes = y_train.shape[1]
+img_width, img_height, img_depth = train_shape[1], train_shape[2], train_shape[3]
 # Define Model
 def build_net():
-    model = Sequential(name='DCNN')
-    model.add(Conv2D(64, (5,5), activation='elu', padding='same', input_shape=(img_width, img_height, img_depth), kernel_initializer='he_normal'))
-    model.add(BatchNormalization())
-    model.add(Conv2D(64, (5,5), activation='elu', padding='same', kernel_initializer='he_normal'))
-    model.add(BatchNormalization())
-    model.add(MaxPooling2D(pool_size=(2,2)))
-    model.add(Dropout(0.4))
-    model.add(Conv2D(128, (3,3), activation='elu', padding='same', kernel_initializer='he_normal'))
-    model.add(BatchNormalization())
-    model.add(Conv2D(128, (3,3), activation='elu', padding='same', kernel_initializer='he_normal'))
-    model.add(BatchNormalization())
-    model.add(MaxPooling2D(pool_size=(2,2)))
-    model.add(Dropout(0.4))
-    model.add(Conv2D(256, (3,3), activation='elu', padding='same', kernel_initializer='he_normal'))
-    model.add(BatchNormalization())
-    model.add(Conv2D(256, (3,3), activation='elu', padding='same', kernel_initializer='he_normal'))
-    model.add(BatchNormalization())
-    model.add(MaxPooling2D(pool_size=(2,2)))
-    model.add(Dropout(0.5))
-    model.add(Flatten())
-    model.add(Dense(128, activation='elu', kernel_initializer='he_normal'))
-    model.add(BatchNormalization())
-    model.add(Dropout(0.6))
-    model.add(Dense(num_classes, activation='softmax'))
-    model.compile(loss='categorical_crossentropy', optimizer=Adam(learning_rate=0.001), metrics=['accuracy'])
-    return model
+    return build_emotion_net((img_width, img_height, img_depth), num_classes)
 
 # Log model architecture
 logging.info("Building model...")
@@ -89,7 +79,8 @@ train_datagen = ImageDataGenerator(
     zoom_range=0.15,
     horizontal_flip=True
 )
-train_datagen.fit(X_train)
+if not USE_SHARDS:
+    train_datagen.fit(X_train)
 
 # Log training start
 logging.info("Starting model training with the following parameters:")
@@ -97,9 +88,18 @@ logging.info(f"Batch size: 32, Learning rate: 0.001, Epochs: 50")
 logging.info(f"Data augmentation: rotation=15°, width_shift=0.15, height_shift=0.15, shear=0.15, zoom=0.15, horizontal_flip=True")
 
 # Train Model
+if USE_SHARDS and INPUT_PIPELINE == 'tfdata':
+    train_data = make_dataset(train_split, batch_size=32, num_classes=num_classes, augmentation=EMOTION_AUGMENTATION)
+    validation_data = make_dataset(valid_split, batch_size=256, num_classes=num_classes, shuffle=False)
+elif USE_SHARDS:
+    train_data = ShardSequence(train_split, batch_size=32, num_classes=num_classes, datagen=train_datagen)
+    validation_data = ShardSequence(valid_split, batch_size=256, num_classes=num_classes, shuffle=False)
+else:
+    train_data = train_datagen.flow(X_train, y_train, batch_size=32)
+    validation_data = (X_valid, y_valid)
 history = model.fit(
-    train_datagen.flow(X_train, y_train, batch_size=32),
-    validation_data=(X_valid, y_valid),
+    train_data,
+    validation_data=validation_data,
     epochs=50,
     callbacks=[early_stopping, lr_scheduler, logging_callback]
 )
@@ -112,6 +112,7 @@ logging.info(f"Best validation accuracy: {max(history.history['val_accuracy']):.
 model.save("model1.h5")
 print("Model saved as model.h5")
 logging.info("Model saved as model1.h5")
+print("Run emotion_export.py to produce the float16/int8 TFLite models for the Pi")
 
 # Plot Training History
 sns.set()
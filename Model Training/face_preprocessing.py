@@ -4,6 +4,7 @@ import cv2
 import tensorflow as tf
 from tqdm import tqdm
 from sklearn.model_selection import train_test_split
+from dataset_shards import write_split, write_ragged, write_index, ShardCache, staging_dir, replace_dir
 
 # Define Image Size and Paths
 IMG_SIZE = (224, 224)  # Resize images to 224x224 for face detection (larger than emotion)
@@ -13,6 +14,16 @@ LABELS_PATH = os.path.join(DATASET_PATH, "labels")
 TRAIN_IMAGES_PATH = os.path.join(IMAGES_PATH, "train")
 VAL_IMAGES_PATH = os.path.join(IMAGES_PATH, "val")
 
+# 'shards' writes uint8 image chunks plus every bounding box (ragged) using a
+# process pool; 'npz' keeps the original in-memory float32 / first-box-only output
+OUTPUT_FORMAT = 'shards'
+SHARDS_PATH = "face_detection_shards"
+WORKERS = None  # None uses every core
+# Reuse images whose file content is unchanged since the last build in SHARDS_PATH;
+# bump PREPROCESS_VERSION whenever load_face_example changes what it produces
+INCREMENTAL = True
+PREPROCESS_VERSION = 1
+
 # Function to parse YOLO format label file
 def parse_yolo_label(label_path, image_width, image_height):
     """
@@ -94,23 +105,75 @@ def load_face_dataset(images_dir, labels_dir):
     
     return X, y
 
-# Load Train and Val Data
-print("Loading training data...")
-X_train, y_train = load_face_dataset(TRAIN_IMAGES_PATH, os.path.join(LABELS_PATH, "train"))
-print("Loading validation data...")
-X_val, y_val = load_face_dataset(VAL_IMAGES_PATH, os.path.join(LABELS_PATH, "val"))
+# List (image path, label path) pairs without decoding anything
+def list_face_dataset(images_dir, labels_dir):
+    image_files = sorted(f for f in os.listdir(images_dir) if f.endswith(('.jpg', '.jpeg', '.png')))
+    return [(os.path.join(images_dir, f), os.path.join(labels_dir, os.path.splitext(f)[0] + '.txt'))
+            for f in image_files]
+
+# Worker: decode one image and parse all of its boxes
+def load_face_example(item):
+    img_path, label_path = item
+    img = cv2.imread(img_path)
+    if img is None:
+        return None
+    orig_height, orig_width = img.shape[:2]
+    img = cv2.resize(img, IMG_SIZE)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)  # Convert to RGB
+    return img, parse_yolo_label(label_path, orig_width, orig_height)
+
+# Boxes of a cached image: the label file is always re-read (boxes are normalized,
+# so the image size parse_yolo_label takes is not needed)
+def load_face_label(item):
+    return parse_yolo_label(item[1], 0, 0)
+
+# Write train/val as uint8 image chunks with ragged boxes
+def build_face_shards(out_dir=SHARDS_PATH):
+    image_shape = (IMG_SIZE[1], IMG_SIZE[0], 3)
+    params = {'version': PREPROCESS_VERSION, 'img_size': IMG_SIZE, 'color': 'rgb'}
+    cache = ShardCache(out_dir, params) if INCREMENTAL else None
+    staging = staging_dir(out_dir)
+    meta = {'image_shape': image_shape, 'params': params, 'splits': {}}
+    for split, images_dir in (("train", TRAIN_IMAGES_PATH), ("val", VAL_IMAGES_PATH)):
+        items = list_face_dataset(images_dir, os.path.join(LABELS_PATH, split))
+        shards, boxes = write_split(staging, split, items, load_face_example, image_shape, workers=WORKERS,
+                                    cache=cache, label_fn=load_face_label)
+
+        # Same per-image target as the .npz format: first box, or zeros for no face
+        labels_file = f"{split}_labels.npy"
+        first = np.array([b[0] if b else [0, 0, 0, 0, 0] for b in boxes], dtype='float32').reshape(-1, 5)
+        np.save(os.path.join(staging, labels_file), first)
+
+        meta['splits'][split] = {'shards': shards, 'labels': labels_file,
+                                 'boxes': write_ragged(staging, split, boxes, 5)}
+        print(f"{split}: {len(boxes)} images, {sum(len(b) for b in boxes)} boxes in {len(shards)} chunk(s)")
+    write_index(staging, meta)
+    replace_dir(staging, out_dir)
+    if cache is not None:
+        print(f"Reused {cache.hits} unchanged images, decoded {cache.misses}")
+
+if __name__ == "__main__":
+    if OUTPUT_FORMAT == 'shards':
+        build_face_shards()
+        print(f"Preprocessing Complete. Data Saved to {SHARDS_PATH}/")
+    else:
+        # Load Train and Val Data
+        print("Loading training data...")
+        X_train, y_train = load_face_dataset(TRAIN_IMAGES_PATH, os.path.join(LABELS_PATH, "train"))
+        print("Loading validation data...")
+        X_val, y_val = load_face_dataset(VAL_IMAGES_PATH, os.path.join(LABELS_PATH, "val"))
 
-# Print dataset information
-print(f"Training images: {len(X_train)}, shape: {X_train.shape}")
-print(f"Validation images: {len(X_val)}, shape: {X_val.shape}")
-print(f"Training labels shape: {y_train.shape}")
-print(f"Validation labels shape: {y_val.shape}")
+        # Print dataset information
+        print(f"Training images: {len(X_train)}, shape: {X_train.shape}")
+        print(f"Validation images: {len(X_val)}, shape: {X_val.shape}")
+        print(f"Training labels shape: {y_train.shape}")
+        print(f"Validation labels shape: {y_val.shape}")
 
-# Save Preprocessed Data
-np.savez('face_detection_preprocessed.npz', 
-         X_train=X_train, 
-         X_valid=X_val, 
-         y_train=y_train, 
-         y_valid=y_val)
+        # Save Preprocessed Data
+        np.savez('face_detection_preprocessed.npz',
+                 X_train=X_train,
+                 X_valid=X_val,
+                 y_train=y_train,
+                 y_valid=y_val)
 
-print("Preprocessing Complete. Data Saved to face_detection_preprocessed.npz")
+        print("Preprocessing Complete. Data Saved to face_detection_preprocessed.npz")
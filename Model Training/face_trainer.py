@@ -1,16 +1,21 @@
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout, BatchNormalization
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, Callback, ModelCheckpoint
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.regularizers import l2
 import tensorflow as tf
 import os
 import logging
 from pathlib import Path
+from dataset_shards import ShardedSplit, ShardSequence, has_shards
+from input_pipeline import make_dataset, FACE_AUGMENTATION
+from architectures import build_face_net
+
+# Chunks written by face_preprocessing.py are streamed when present;
+# otherwise the whole preprocessed .npz is loaded
+SHARDS_PATH = "face_detection_shards"
+USE_SHARDS = has_shards(SHARDS_PATH)
+INPUT_PIPELINE = 'tfdata'  # with shards: 'tfdata' (batched augmentation) or 'generator' (ImageDataGenerator)
 
 # Setup logging
 log_dir = Path("logs")
@@ -28,81 +33,28 @@ class LoggingCallback(Callback):
         logging.info(f"Epoch {epoch+1} - loss: {logs.get('loss', 'N/A'):.4f} - accuracy: {logs.get('accuracy', 'N/A'):.4f} - val_loss: {logs.get('val_loss', 'N/A'):.4f} - val_accuracy: {logs.get('val_accuracy', 'N/A'):.4f}")
 
 # Load preprocessed data
-data = np.load('face_detection_preprocessed.npz')
-X_train, X_valid, y_train, y_valid = data['X_train'], data['X_valid'], data['y_train'], data['y_valid']
-print(f"Training Data: {X_train.shape}, Labels: {y_train.shape}")
-print(f"Validation Data: {X_valid.shape}, Labels: {y_valid.shape}")
-logging.info(f"Training Data: {X_train.shape}, Labels: {y_train.shape}")
-logging.info(f"Validation Data: {X_valid.shape}, Labels: {y_valid.shape}")
+if USE_SHARDS:
+    train_split = ShardedSplit(SHARDS_PATH, 'train')
+    valid_split = ShardedSplit(SHARDS_PATH, 'val')
+    train_shape, valid_shape = train_split.shape, valid_split.shape
+    label_shapes = train_split.labels.shape, valid_split.labels.shape
+else:
+    data = np.load('face_detection_preprocessed.npz')
+    X_train, X_valid, y_train, y_valid = data['X_train'], data['X_valid'], data['y_train'], data['y_valid']
+    train_shape, valid_shape = X_train.shape, X_valid.shape
+    label_shapes = y_train.shape, y_valid.shape
+print(f"Training Data: {train_shape}, Labels: {label_shapes[0]}")
+print(f"Validation Data: {valid_shape}, Labels: {label_shapes[1]}")
+logging.info(f"Training Data: {train_shape}, Labels: {label_shapes[0]}")
+logging.info(f"Validation Data: {valid_shape}, Labels: {label_shapes[1]}")
 
 # Model parameters
-img_width, img_height, img_depth = X_train.shape[1], X_train.shape[2], X_train.shape[3]
-num_classes = y_train.shape[1]  # For face detection, this is typically 1 (face or no face)
+img_width, img_height, img_depth = train_shape[1], train_shape[2], train_shape[3]
+num_classes = label_shapes[0][1]  # For face detection, this is typically 1 (face or no face)
 
 # Define Model with L2 regularization added to convolutional and dense layers
 def build_face_detection_net():
-    model = Sequential(name='FaceDetectionCNN')
-    reg = l2(1e-4)  # L2 regularization factor
-    
-    # First block
-    model.add(Conv2D(32, (3,3), activation='relu', padding='same',
-                     input_shape=(img_width, img_height, img_depth),
-                     kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(Conv2D(32, (3,3), activation='relu', padding='same',
-                     kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(MaxPooling2D(pool_size=(2,2)))
-    model.add(Dropout(0.35))
-    
-    # Second block
-    model.add(Conv2D(64, (3,3), activation='relu', padding='same',
-                     kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(Conv2D(64, (3,3), activation='relu', padding='same',
-                     kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(MaxPooling2D(pool_size=(2,2)))
-    model.add(Dropout(0.35))
-    
-    # Third block
-    model.add(Conv2D(128, (3,3), activation='relu', padding='same',
-                     kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(Conv2D(128, (3,3), activation='relu', padding='same',
-                     kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(MaxPooling2D(pool_size=(2,2)))
-    model.add(Dropout(0.45))
-    
-    # Fourth block
-    model.add(Conv2D(256, (3,3), activation='relu', padding='same',
-                     kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(Conv2D(256, (3,3), activation='relu', padding='same',
-                     kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(MaxPooling2D(pool_size=(2,2)))
-    model.add(Dropout(0.45))
-    
-    # Flatten and dense layers
-    model.add(Flatten())
-    model.add(Dense(256, activation='relu', kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(Dropout(0.55))
-    model.add(Dense(128, activation='relu', kernel_initializer='he_normal', kernel_regularizer=reg))
-    model.add(BatchNormalization())
-    model.add(Dropout(0.55))
-    
-    # Output layer
-    model.add(Dense(num_classes, activation='sigmoid'))
-    
-    model.compile(
-        loss='binary_crossentropy',  # Change to 'mse' if doing bounding box regression
-        optimizer=Adam(learning_rate=0.0005),  # Lower learning rate for finer tuning
-        metrics=['accuracy']
-    )
-    return model
+    return build_face_net((img_width, img_height, img_depth), num_classes)
 
 # Log model architecture
 logging.info("Building face detection model with enhanced augmentation, early stopping, and L2 regularization...")
@@ -129,12 +81,22 @@ train_datagen = ImageDataGenerator(
     brightness_range=[0.7, 1.3],     # enhanced brightness variation
     fill_mode='nearest'
 )
-train_datagen.fit(X_train)
+if USE_SHARDS and INPUT_PIPELINE == 'tfdata':
+    # 224x224x3 images are too large to cache in RAM; the shards are already decoded
+    train_data = make_dataset(train_split, batch_size=16, augmentation=FACE_AUGMENTATION, cache=False)
+    validation_data = make_dataset(valid_split, batch_size=64, shuffle=False, cache=False)
+elif USE_SHARDS:
+    train_data = ShardSequence(train_split, batch_size=16, datagen=train_datagen)
+    validation_data = ShardSequence(valid_split, batch_size=64, shuffle=False)
+else:
+    train_datagen.fit(X_train)
+    train_data = train_datagen.flow(X_train, y_train, batch_size=16)
+    validation_data = (X_valid, y_valid)
 
 logging.info("Starting training with enhanced data augmentation, early stopping, and improved regularization...")
 history = model.fit(
-    train_datagen.flow(X_train, y_train, batch_size=16),
-    validation_data=(X_valid, y_valid),
+    train_data,
+    validation_data=validation_data,
     epochs=50,
     callbacks=[early_stopping, lr_scheduler, model_checkpoint, logging_callback]
 )
@@ -0,0 +1,153 @@
+import math
+import numpy as np
+import tensorflow as tf
+
+# tf.data input pipeline over the uint8 shards from dataset_shards.py.
+# Augmentation matches the ImageDataGenerator settings in the trainers but is
+# applied to a whole batch at once: one random affine matrix per image, all
+# warped in a single ImageProjectiveTransformV3 call.
+AUTOTUNE = tf.data.AUTOTUNE
+READ_CHUNK = 256  # images per sequential read from a shard, at most...
+READ_BYTES = 4 * 1024 * 1024  # ...and at most this much (27 224x224x3 faces)
+INTERLEAVE_CHUNKS = 16  # chunks read round-robin while shuffling
+SHUFFLE_BUFFER = 8192  # images held for shuffling, at most...
+SHUFFLE_BYTES = 128 * 1024 * 1024  # ...and at most this much uint8 image data (891 224x224x3 faces, not 1.2 GB)
+
+# Same ranges as emotion_trainer.py's ImageDataGenerator
+EMOTION_AUGMENTATION = {
+    'rotation_range': 15,
+    'width_shift_range': 0.15,
+    'height_shift_range': 0.15,
+    'shear_range': 0.15,
+    'zoom_range': 0.15,
+    'horizontal_flip': True,
+}
+
+# Same ranges as face_trainer.py's ImageDataGenerator
+FACE_AUGMENTATION = {
+    'rotation_range': 40,
+    'width_shift_range': 0.4,
+    'height_shift_range': 0.4,
+    'shear_range': 0.4,
+    'zoom_range': 0.4,
+    'horizontal_flip': True,
+    'brightness_range': (0.7, 1.3),
+}
+
+
+def _affine_transforms(batch_size, height, width, aug):
+    # Output->input pixel mapping per image, composed as
+    # center . rotation . shift . shear . zoom . uncenter (as Keras does)
+    def uniform(lo, hi):
+        return tf.random.uniform([batch_size], lo, hi)
+
+    theta = uniform(-aug.get('rotation_range', 0), aug.get('rotation_range', 0)) * (math.pi / 180)
+    ws, hs = aug.get('width_shift_range', 0), aug.get('height_shift_range', 0)
+    tx = uniform(-ws, ws) * width
+    ty = uniform(-hs, hs) * height
+    shear = uniform(-aug.get('shear_range', 0), aug.get('shear_range', 0)) * (math.pi / 180)
+    zoom = aug.get('zoom_range', 0)
+    zx = uniform(1 - zoom, 1 + zoom)
+    zy = uniform(1 - zoom, 1 + zoom)
+
+    zeros, ones = tf.zeros([batch_size]), tf.ones([batch_size])
+
+    def matrix(rows):
+        return tf.stack([tf.stack(r, axis=-1) for r in rows], axis=1)
+
+    cx, cy = (width - 1) / 2.0, (height - 1) / 2.0
+    rotation = matrix([[tf.cos(theta), -tf.sin(theta), zeros], [tf.sin(theta), tf.cos(theta), zeros], [zeros, zeros, ones]])
+    shift = matrix([[ones, zeros, tx], [zeros, ones, ty], [zeros, zeros, ones]])
+    shear_m = matrix([[ones, -tf.sin(shear), zeros], [zeros, tf.cos(shear), zeros], [zeros, zeros, ones]])
+    zoom_m = matrix([[zx, zeros, zeros], [zeros, zy, zeros], [zeros, zeros, ones]])
+    center = matrix([[ones, zeros, ones * cx], [zeros, ones, ones * cy], [zeros, zeros, ones]])
+    uncenter = matrix([[ones, zeros, -ones * cx], [zeros, ones, -ones * cy], [zeros, zeros, ones]])
+
+    m = center @ rotation @ shift @ shear_m @ zoom_m @ uncenter
+    return tf.reshape(m, [batch_size, 9])[:, :8]
+
+
+def augment_batch(images, aug):
+    """Randomly augment a float32 [B,H,W,C] batch in [0,1]."""
+    shape = tf.shape(images)
+    batch_size, height, width = shape[0], shape[1], shape[2]
+    transforms = _affine_transforms(batch_size, tf.cast(height, tf.float32), tf.cast(width, tf.float32), aug)
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images, transforms=transforms, output_shape=tf.stack([height, width]),
+        fill_value=0.0, interpolation="BILINEAR", fill_mode="NEAREST")
+
+    if aug.get('horizontal_flip'):
+        flip = tf.random.uniform([batch_size]) < 0.5
+        images = tf.where(flip[:, None, None, None], tf.reverse(images, axis=[2]), images)
+
+    if aug.get('brightness_range'):
+        lo, hi = aug['brightness_range']
+        images = tf.clip_by_value(images * tf.random.uniform([batch_size, 1, 1, 1], lo, hi), 0.0, 1.0)
+    return images
+
+
+def make_dataset(split, batch_size, num_classes=None, augmentation=None, shuffle=True,
+                 shuffle_buffer=SHUFFLE_BUFFER, shuffle_bytes=SHUFFLE_BYTES, cache=True, seed=None):
+    """
+    Stream a ShardedSplit as (images, labels) batches.
+
+    Images are read from the memory-mapped shards in sequential chunks, kept
+    as uint8 (and cached in memory after the first epoch when `cache` is
+    True, or in a file when it is a path), shuffled, batched, normalized and
+    augmented per batch in parallel, then prefetched. The shuffle buffer holds
+    at most `shuffle_buffer` images and `shuffle_bytes` bytes of them.
+
+    The shards are written sorted by class, so when shuffling the chunk
+    order is reshuffled every epoch (after the cache, which stores chunks in
+    file order) and INTERLEAVE_CHUNKS chunks are drawn from at once, before
+    the shuffle buffer mixes their images.
+    """
+    n = len(split)
+    image_shape = split.shape[1:]
+    label_shape = split.labels.shape[1:]
+    label_dtype = tf.as_dtype(split.labels.dtype)
+
+    image_bytes = int(np.prod(image_shape))
+    chunk = max(1, min(READ_CHUNK, READ_BYTES // image_bytes))
+    num_chunks = (n + chunk - 1) // chunk
+
+    def read_chunk(start):
+        idx = np.arange(start, min(start + chunk, n))
+        return split.take(idx, normalize=False), np.asarray(split.labels[idx])
+
+    def load(start):
+        images, labels = tf.numpy_function(read_chunk, [start], [tf.uint8, label_dtype])
+        images.set_shape((None,) + image_shape)
+        labels.set_shape((None,) + label_shape)
+        return images, labels
+
+    starts = tf.data.Dataset.range(0, n, chunk)
+    if cache:
+        chunks = starts.map(load, num_parallel_calls=AUTOTUNE)
+        chunks = chunks.cache() if cache is True else chunks.cache(cache)
+        if shuffle:
+            # An in-memory cache hands out references, so every chunk can sit
+            # in the buffer; read back from a file they are copies, so bound it
+            chunk_buffer = num_chunks if cache is True else max(INTERLEAVE_CHUNKS, shuffle_bytes // (chunk * image_bytes))
+            chunks = chunks.shuffle(chunk_buffer, seed=seed, reshuffle_each_iteration=True)
+    else:
+        if shuffle:
+            starts = starts.shuffle(num_chunks, seed=seed, reshuffle_each_iteration=True)
+        chunks = starts.map(load, num_parallel_calls=AUTOTUNE)
+    ds = chunks.interleave(lambda images, labels: tf.data.Dataset.from_tensor_slices((images, labels)),
+                           cycle_length=INTERLEAVE_CHUNKS if shuffle else 1)
+    if shuffle:
+        buffer = min(shuffle_buffer, max(1, shuffle_bytes // image_bytes), n)
+        ds = ds.shuffle(buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+
+    def prepare(images, labels):
+        images = tf.cast(images, tf.float32) * (1 / 255.0)
+        if augmentation:
+            images = augment_batch(images, augmentation)
+        if num_classes:
+            labels = tf.one_hot(tf.cast(labels, tf.int32), num_classes)
+        return images, labels
+
+    ds = ds.map(prepare, num_parallel_calls=AUTOTUNE, deterministic=False)
+    return ds.prefetch(AUTOTUNE)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# Hyperparameter sweep for the emotion and face networks (architectures.py).
+# Trials run in a process pool. Every worker memory-maps the same read-only
+# uint8 shards, so the dataset sits in the page cache once, not once per
+# worker. Each worker gets its own cores and a matching thread cap. Trials
+# that fall below the median of the others are stopped early, and the
+# survivors are timed as single-image float32 TFLite on Pi-class thread
+# counts.
+#
+#   python3 sweep.py emotion --trials 12 --workers 3 --epochs 20
+#   python3 sweep.py face --trials 6 --workers 2
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+import numpy as np
+
+# Constants
+CACHE_DIR = "sweep_cache"          # shards converted from an .npz when the preprocessing shards are missing
+OUT_DIR = "sweep_runs"
+RESULTS_FILE = "sweep_results.csv"
+PI_THREADS = 4                     # Raspberry Pi 5 cores, for the latency measurement
+LATENCY_RUNS = 100
+GRACE_EPOCHS = 3                   # a trial can be stopped for trailing the median only after this
+PATIENCE = 5
+
+# 'monitor' is the validation metric trials are ranked, median-stopped and
+# early-stopped on, with whether higher ('max') or lower ('min') is better.
+# The face network regresses a box, so its accuracy means nothing.
+TASKS = {
+    'emotion': {
+        'shards': "emotion_shards", 'npz': "preprocessed_data.npz", 'splits': ('train', 'test'),
+        'monitor': ('val_accuracy', 'max'),
+        'space': {
+            'filters': [(64, 128, 256), (32, 64, 128), (16, 32, 64)],
+            'dropout': [(0.4, 0.4, 0.5, 0.6), (0.25, 0.25, 0.4, 0.5)],
+            'dense': [128, 64],
+            'learning_rate': [1e-3, 5e-4],
+            'batch_size': [32, 64],
+        },
+    },
+    'face': {
+        'shards': "face_detection_shards", 'npz': "face_detection_preprocessed.npz", 'splits': ('train', 'val'),
+        'monitor': ('val_loss', 'min'),
+        'space': {
+            'filters': [(32, 64, 128, 256), (16, 32, 64, 128)],
+            'dropout': [(0.35, 0.35, 0.45, 0.45, 0.55), (0.25, 0.25, 0.35, 0.35, 0.45)],
+            'dense': [(256, 128), (128,)],
+            'learning_rate': [5e-4, 1e-3],
+            'batch_size': [16, 32],
+        },
+    },
+}
+
+
+# Convert a preprocessed .npz (float images in [0,1]) into the shard layout once
+def npz_to_shards(npz_path, out_dir, splits):
+    from dataset_shards import write_index
+    os.makedirs(out_dir, exist_ok=True)
+    data = np.load(npz_path)
+    meta = {'splits': {}}
+    for split, suffix in zip(splits, ('train', 'valid')):
+        X = data[f'X_{suffix}'] if f'X_{suffix}' in data else data['X_test']
+        y = data[f'y_{suffix}'] if f'y_{suffix}' in data else data['y_test']
+        shard = np.lib.format.open_memmap(os.path.join(out_dir, f"{split}_00000.npy"), mode='w+',
+                                          dtype=np.uint8, shape=X.shape)
+        for start in range(0, len(X), 4096):
+            shard[start:start + 4096] = np.round(X[start:start + 4096] * 255)
+        shard.flush()
+        if y.ndim == 2 and y.shape[1] > 1:  # one-hot -> class index, as the shards store it
+            meta['label_map'] = {str(i): i for i in range(y.shape[1])}
+            y = np.argmax(y, axis=1).astype(np.int16)
+        np.save(os.path.join(out_dir, f"{split}_labels.npy"), y)
+        meta['image_shape'] = list(X.shape[1:])
+        meta['splits'][split] = {'shards': [{'file': f"{split}_00000.npy", 'count': len(X)}],
+                                 'labels': f"{split}_labels.npy"}
+    write_index(out_dir, meta)
+
+
+def dataset_dir(task):
+    info = TASKS[task]
+    if os.path.exists(os.path.join(info['shards'], "index.json")):
+        return info['shards']
+    cache = os.path.join(CACHE_DIR, task)
+    if not os.path.exists(os.path.join(cache, "index.json")):
+        print(f"Converting {info['npz']} to memory-mappable shards in {cache}...")
+        npz_to_shards(info['npz'], cache, info['splits'])
+    return cache
+
+
+# Best of a metric's values under a task's monitor mode, and whether `a` is worse than `b`
+def best_of(values, mode):
+    return max(values) if mode == 'max' else min(values)
+
+
+def worse(a, b, mode):
+    return a < b if mode == 'max' else a > b
+
+
+def sample_trials(space, n, seed=0):
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    random.Random(seed).shuffle(grid)
+    return grid[:n]
+
+
+# ── worker side ──────────────────────────────────────────────────────────────
+_worker = {}
+
+
+def init_worker(threads, progress, task, data_dir, epochs):
+    # Pin to a disjoint block of cores and cap every thread pool to match,
+    # before TensorFlow is imported
+    slot = (mp.current_process()._identity or (1,))[0] - 1
+    cores = sorted(os.sched_getaffinity(0))
+    mine = cores[(slot * threads) % len(cores):][:threads] or cores[:threads]
+    os.sched_setaffinity(0, mine)
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+        os.environ[var] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    _worker.update(progress=progress, task=task, data_dir=data_dir, epochs=epochs)
+
+
+def run_trial(args):
+    trial, params = args
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import Callback, EarlyStopping
+    from architectures import build_emotion_net, build_face_net
+    from dataset_shards import ShardedSplit
+    from input_pipeline import make_dataset, EMOTION_AUGMENTATION, FACE_AUGMENTATION
+
+    task, progress = _worker['task'], _worker['progress']
+    monitor, mode = TASKS[task]['monitor']
+    train_name, valid_name = TASKS[task]['splits']
+    train_split = ShardedSplit(_worker['data_dir'], train_name)
+    valid_split = ShardedSplit(_worker['data_dir'], valid_name)
+    if task == 'emotion':
+        num_classes = len(train_split.meta['label_map'])
+        build, augmentation, onehot = build_emotion_net, EMOTION_AUGMENTATION, num_classes
+    else:
+        num_classes = train_split.labels.shape[1]
+        build, augmentation, onehot = build_face_net, FACE_AUGMENTATION, None
+
+    arch = {k: v for k, v in params.items() if k != 'batch_size'}
+    model = build(train_split.shape[1:], num_classes, **arch)
+
+    class MedianStop(Callback):
+        # Stop when the best monitored value so far trails the median of the
+        # other trials at the same epoch
+        stopped = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            history = progress.get(trial, []) + [float(logs[monitor])]
+            progress[trial] = history
+            if epoch + 1 < GRACE_EPOCHS:
+                return
+            peers = [best_of(h[:epoch + 1], mode) for t, h in progress.items() if t != trial and len(h) > epoch]
+            if len(peers) >= 2 and worse(best_of(history, mode), np.median(peers), mode):
+                self.stopped = True
+                self.model.stop_training = True
+
+    median_stop = MedianStop()
+    patience = EarlyStopping(monitor=monitor, mode=mode, patience=PATIENCE, restore_best_weights=True)
+    # No in-memory cache: the shards are already shared through the page cache
+    train_data = make_dataset(train_split, batch_size=params['batch_size'], num_classes=onehot,
+                              augmentation=augmentation, cache=False, seed=trial)
+    valid_data = make_dataset(valid_split, batch_size=256, num_classes=onehot, shuffle=False, cache=False)
+    start = time.time()
+    history = model.fit(train_data, validation_data=valid_data, epochs=_worker['epochs'],
+                        callbacks=[median_stop, patience], verbose=0)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    tflite_path = os.path.join(OUT_DIR, f"{task}_trial{trial:03d}.tflite")
+    with open(tflite_path, "wb") as f:
+        f.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+    model.save(os.path.join(OUT_DIR, f"{task}_trial{trial:03d}.keras"))
+
+    epochs_run = len(history.epoch)
+    stop = 'median' if median_stop.stopped else ('patience' if epochs_run < _worker['epochs'] else None)
+    return {'trial': trial, 'params': params, 'score': float(best_of(history.history[monitor], mode)),
+            'epochs': epochs_run, 'stopped': stop, 'parameters': int(model.count_params()),
+            'train_s': time.time() - start, 'tflite': tflite_path}
+
+
+# Single-image latency on PI_THREADS cores, one model at a time
+def measure_latency(paths, input_shape):
+    import tensorflow as tf
+    os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:PI_THREADS])
+    x = np.random.default_rng(0).random((1,) + tuple(input_shape), dtype=np.float32)
+    latencies = []
+    for path in paths:
+        interpreter = tf.lite.Interpreter(model_path=path, num_threads=PI_THREADS)
+        interpreter.allocate_tensors()
+        inp = interpreter.get_input_details()[0]['index']
+        times = []
+        for i in range(LATENCY_RUNS + 10):
+            start = time.perf_counter()
+            interpreter.set_tensor(inp, x)
+            interpreter.invoke()
+            if i >= 10:  # skip warm-up invokes
+                times.append(time.perf_counter() - start)
+        latencies.append(float(np.median(times)) * 1000)
+    return latencies
+
+
+# Best trial first, by the task's monitored metric
+def ranked(results, mode):
+    return sorted(results, key=lambda r: -r['score'] if mode == 'max' else r['score'])
+
+
+def print_table(results, monitor, mode):
+    print(f"\n{'trial':>5} {monitor:>12} {'params':>10} {'ms/img':>7} {'epochs':>6} {'stop':>8}  hyperparameters")
+    for r in ranked(results, mode):
+        print(f"{r['trial']:>5} {r['score']:>12.4f} {r['parameters']:>10,} {r['latency_ms']:>7.2f} "
+              f"{r['epochs']:>6} {r['stopped'] or '-':>8}  {json.dumps(r['params'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Parallel hyperparameter sweep')
+    parser.add_argument('task', choices=sorted(TASKS))
+    parser.add_argument('--trials', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data_dir = dataset_dir(args.task)
+    monitor, mode = TASKS[args.task]['monitor']
+    with open(os.path.join(data_dir, "index.json")) as f:
+        input_shape = json.load(f)['image_shape']
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    trials = list(enumerate(sample_trials(TASKS[args.task]['space'], args.trials, args.seed)))
+    print(f"{len(trials)} trials on {args.workers} workers x {threads} threads, data in {data_dir}")
+
+    # TensorFlow must not be forked; workers are fresh interpreters
+    ctx = mp.get_context('spawn')
+    with ctx.Manager() as manager:
+        progress = manager.dict()
+        with ctx.Pool(args.workers, initializer=init_worker,
+                      initargs=(threads, progress, args.task, data_dir, args.epochs)) as pool:
+            results = []
+            for r in pool.imap_unordered(run_trial, trials):
+                print(f"[{time.ctime()}] trial {r['trial']}: {monitor} {r['score']:.4f} after {r['epochs']} epochs"
+                      f"{' (stopped: ' + r['stopped'] + ')' if r['stopped'] else ''}")
+                results.append(r)
+
+    with ctx.Pool(1) as pool:
+        latencies = pool.apply(measure_latency, ([r['tflite'] for r in results], input_shape))
+    for r, ms in zip(results, latencies):
+        r['latency_ms'] = ms
+
+    print_table(results, monitor, mode)
+    with open(RESULTS_FILE, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(['trial', monitor, 'parameters', 'latency_ms', 'epochs', 'stopped', 'train_s']
+                        + list(TASKS[args.task]['space']))
+        for r in sorted(results, key=lambda r: r['trial']):
+            writer.writerow([r['trial'], f"{r['score']:.4f}", r['parameters'], f"{r['latency_ms']:.3f}",
+                             r['epochs'], r['stopped'] or '', f"{r['train_s']:.0f}"]
+                            + [json.dumps(r['params'][k]) for k in TASKS[args.task]['space']])
+    print(f"\nResults saved to {RESULTS_FILE}")
@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import threading
+import time
+import metrics
+import servo_control
+
+# Constants
+OPEN_ANGLE = 180
+CLOSED_ANGLE = 0
+RAMP_SPEED = 180.0     # degrees per second for smooth moves (None moves in one step)
+STEP_INTERVAL = 0.02   # one duty update per 50 Hz PWM period
+SPIN_HOLD = 2.0        # how long spin() keeps the window open, as servo_control.spin does
+
+# Submission to first duty-cycle change, per command
+FIRST_MOTION_LATENCY = metrics.histogram('actuation_latency_seconds', "Command submission to first servo motion")
+COMMANDS = metrics.counter('actuator_commands_total', "Actuator commands finished, preempted or cancelled")
+
+# Priorities: lower runs first; a command preempts and cancels anything less urgent
+EMERGENCY, NORMAL, LOW = 0, 1, 2
+
+
+class Command:
+    """A queued actuator command; wait() blocks until it finished, was preempted or cancelled."""
+
+    def __init__(self, kind, angle=None, priority=NORMAL, duration=0.0, speed=RAMP_SPEED):
+        self.kind = kind            # 'move' or 'hold'
+        self.angle = angle
+        self.priority = priority
+        self.duration = duration
+        self.speed = speed
+        self.state = 'pending'      # -> running -> done | preempted, or cancelled
+        self.submitted = time.monotonic()
+        self.started = None
+        self.first_motion = None    # time of the first duty-cycle change
+        self.finished = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def _finish(self, state):
+        self.state = state
+        self.finished = time.monotonic()
+        COMMANDS.inc()
+        self.done.set()
+
+
+class ServoActuator:
+    """
+    Long-lived servo service: the PWM channel is set up once and commands run
+    on a worker thread, so callers never block on GPIO setup or movement.
+
+    Commands are ordered by priority, then submission. A new command cancels
+    every pending command of lower priority and interrupts a running one, so
+    an emergency open wins over a close that is queued or already moving.
+    Ramps update the duty cycle once per PWM period and wait on a condition
+    between steps, which is also how preemption wakes them.
+    """
+
+    def __init__(self, pin=servo_control.SERVO_PIN, gpio=None, step_interval=STEP_INTERVAL):
+        self.pin = pin
+        self.gpio = gpio or servo_control.GPIO
+        self.step_interval = step_interval
+        self.angle = CLOSED_ANGLE
+        self.pwm = None
+        self.queue = []
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        self.running = None
+        self.preempt = False
+        self.stopping = False
+        self.thread = None
+
+    def start(self):
+        self.pwm = servo_control.setup_servo(self.pin, self.gpio)  # rests at 0°
+        self.angle = CLOSED_ANGLE
+        self.thread = threading.Thread(target=self._worker, name="actuator", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+        for _, _, cmd in self.queue:
+            cmd._finish('cancelled')
+        self.queue = []
+        servo_control.release_servo(self.pwm, self.gpio)
+
+    # ── commands ────────────────────────────────────────────────────────────
+    def submit(self, cmd):
+        with self.cond:
+            kept = []
+            for item in self.queue:
+                if item[2].priority > cmd.priority:
+                    item[2]._finish('cancelled')
+                else:
+                    kept.append(item)
+            self.queue = kept
+            heapq.heapify(self.queue)
+            heapq.heappush(self.queue, (cmd.priority, next(self.counter), cmd))
+            if self.running is not None and self.running.priority > cmd.priority:
+                self.preempt = True
+            self.cond.notify_all()
+        return cmd
+
+    def move(self, angle, priority=NORMAL, speed=RAMP_SPEED):
+        return self.submit(Command('move', angle, priority, speed=speed))
+
+    def open(self, priority=EMERGENCY, speed=None):
+        # Emergencies go straight to the target; the servo travels at its own top speed
+        return self.move(OPEN_ANGLE, priority, speed)
+
+    def close(self, priority=NORMAL, speed=RAMP_SPEED):
+        return self.move(CLOSED_ANGLE, priority, speed)
+
+    def hold(self, seconds, priority=NORMAL):
+        return self.submit(Command('hold', priority=priority, duration=seconds))
+
+    def spin(self, priority=EMERGENCY):
+        # Non-blocking equivalent of servo_control.spin(): open urgently, then
+        # hold and close at normal priority so the next emergency cancels them.
+        # Returns the open command.
+        opening = self.open(priority)
+        self.hold(SPIN_HOLD)
+        self.close()
+        return opening
+
+    # ── worker ──────────────────────────────────────────────────────────────
+    def _worker(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.queue or self.stopping)
+                if self.stopping:
+                    return
+                _, _, cmd = heapq.heappop(self.queue)
+                self.running, self.preempt = cmd, False
+            cmd.state, cmd.started = 'running', time.monotonic()
+            completed = self._ramp(cmd) if cmd.kind == 'move' else self._pause(cmd.duration)
+            with self.cond:
+                self.running = None
+            cmd._finish('done' if completed else 'preempted')
+
+    def _pause(self, seconds):
+        # Sleep that returns early (False) when a more urgent command arrives
+        with self.cond:
+            return not self.cond.wait_for(lambda: self.preempt or self.stopping, timeout=seconds)
+
+    def _set_angle(self, cmd, angle):
+        self.pwm.ChangeDutyCycle(servo_control.angle_to_duty(angle))
+        self.angle = angle
+        if cmd.first_motion is None:
+            cmd.first_motion = time.monotonic()
+            FIRST_MOTION_LATENCY.observe(cmd.first_motion - cmd.submitted)
+
+    def _ramp(self, cmd):
+        start, target = self.angle, cmd.angle
+        if not cmd.speed or start == target:
+            self._set_angle(cmd, target)
+            return True
+        duration = abs(target - start) / cmd.speed
+        t0 = time.monotonic()
+        while True:
+            # Position follows the clock, so a late wake-up doesn't slow the ramp down
+            frac = min(1.0, (time.monotonic() - t0) / duration)
+            self._set_angle(cmd, start + (target - start) * frac)
+            if frac >= 1.0:
+                return True
+            if not self._pause(self.step_interval):
+                return False
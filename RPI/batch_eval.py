@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# Offline evaluation of the emotion model over a directory tree of images or a
+# video file. Worker processes decode frames and find faces; the main process
+# collects the 48x48 crops from many frames and classifies them BATCH_SIZE at a
+# time. Results go to a columnar .npz, one row per face (or per frame without
+# a face), together with the confusion matrix. Images in a folder named after
+# an emotion (e.g. .../happy/0001.jpg) count as labelled.
+#
+#   python3 batch_eval.py /data/cabin_frames --backend tflite-int8
+#   python3 batch_eval.py drive.mp4 --stride 5 --out drive.npz
+#   python3 batch_eval.py fer2013/test --cropped     # images are already face crops
+import argparse
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+
+# Constants
+IMG_SIZE = (48, 48)
+BATCH_SIZE = 64          # face crops per forward pass
+IMAGES_PER_TASK = 32     # image files handed to a worker at a time
+FRAMES_PER_TASK = 240    # consecutive video frames handed to a worker at a time
+DETECT_WIDTH = 1152      # frames are downscaled to at most this width for the Haar scan
+VIDEO_RESCAN = 10        # within a video chunk, faces are tracked between full scans
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+OUTPUT_FILE = "batch_results.npz"
+
+
+# Work units: ('images', [paths]) or ('video', path, first frame, frame count, stride)
+def make_tasks(spec, stride=1):
+    if os.path.isdir(spec):
+        paths = sorted(os.path.join(root, f) for root, _, files in os.walk(spec)
+                       for f in files if f.lower().endswith(EXTENSIONS))
+        if not paths:
+            raise IOError(f"No images found under: {spec}")
+        return [('images', paths[i:i + IMAGES_PER_TASK]) for i in range(0, len(paths), IMAGES_PER_TASK)]
+    import cv2
+    cap = cv2.VideoCapture(spec)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    cap.release()
+    if total <= 0:
+        raise IOError(f"Couldn't open video: {spec}")
+    return [('video', spec, start, min(FRAMES_PER_TASK, total - start), stride)
+            for start in range(0, total, FRAMES_PER_TASK)]
+
+
+# ── worker side ──────────────────────────────────────────────────────────────
+_worker = {}
+
+
+def init_worker(cropped):
+    import cv2
+    cv2.setNumThreads(1)  # one process per core already
+    _worker['cropped'] = cropped
+    if not cropped:
+        _worker['cascade'] = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+
+def read_frames(task):
+    # Yields (source, frame index, grayscale frame or None)
+    import cv2
+    if task[0] == 'images':
+        for path in task[1]:
+            yield path, 0, cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        return
+    _, path, start, count, stride = task
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    try:
+        for index in range(start, start + count):
+            if index % stride:
+                if not cap.grab():  # advance without decoding
+                    return
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                return
+            yield path, index, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    finally:
+        cap.release()
+
+
+def process_task(task):
+    # Returns ([(source, index, boxes (N,4), crops (N,48,48) uint8)], unreadable paths, CPU seconds)
+    import cv2
+    from face_tracker import FaceTracker
+    cpu = time.process_time()
+    records, unreadable, tracker = [], [], None
+    for source, index, gray in read_frames(task):
+        if gray is None:
+            unreadable.append(source)
+            continue
+        if _worker['cropped']:
+            boxes = np.array([[0, 0, gray.shape[1], gray.shape[0]]])
+        else:
+            # Stills are unrelated, so every image gets a fresh scan; video frames are tracked
+            if tracker is None or task[0] == 'images':
+                tracker = FaceTracker(_worker['cascade'], scale=min(1.0, DETECT_WIDTH / gray.shape[1]),
+                                      rescan_interval=1 if task[0] == 'images' else VIDEO_RESCAN)
+            boxes = np.asarray(tracker.detect(gray), dtype=int).reshape(-1, 4)
+        crops = np.empty((len(boxes), IMG_SIZE[1], IMG_SIZE[0]), dtype=np.uint8)
+        for i, (x, y, w, h) in enumerate(boxes):
+            crops[i] = cv2.resize(gray[y:y+h, x:x+w], IMG_SIZE)
+        records.append((source, index, boxes, crops))
+    return records, unreadable, time.process_time() - cpu
+
+
+# ── main process ─────────────────────────────────────────────────────────────
+class Results:
+    """Column lists, one entry per face; frames without a face get one row with emotion -1."""
+
+    COLUMNS = ('source', 'frame', 'faces', 'x', 'y', 'w', 'h', 'emotion', 'confidence', 'truth')
+
+    def __init__(self, labels):
+        self.labels = [label.lower() for label in labels]
+        self.columns = {name: [] for name in self.COLUMNS}
+        self.pending_rows, self.pending_crops = [], []
+        self.frames = 0
+        self.inference_s = 0.0
+
+    def truth(self, source):
+        # Emotion named by the image's folder, or -1
+        folder = os.path.basename(os.path.dirname(source)).lower()
+        return self.labels.index(folder) if folder in self.labels else -1
+
+    def add_frame(self, source, index, boxes, crops, truth):
+        self.frames += 1
+        for i, box in enumerate(boxes if len(boxes) else [(-1, -1, -1, -1)]):
+            row = len(self.columns['source'])
+            for name, value in zip(self.COLUMNS, (source, index, len(boxes), *box, -1, np.nan, truth)):
+                self.columns[name].append(value)
+            if len(boxes):
+                self.pending_rows.append(row)
+                self.pending_crops.append(crops[i])
+
+    def flush(self, classify, final=False):
+        # Fixed-size batches, so a TFLite backend is not resized on every call
+        while len(self.pending_rows) >= BATCH_SIZE or (final and self.pending_rows):
+            rows, crops = self.pending_rows[:BATCH_SIZE], self.pending_crops[:BATCH_SIZE]
+            del self.pending_rows[:BATCH_SIZE], self.pending_crops[:BATCH_SIZE]
+            batch = np.multiply(np.stack(crops), np.float32(1 / 255.0))[..., np.newaxis]
+            start = time.perf_counter()
+            predictions = classify(batch)
+            self.inference_s += time.perf_counter() - start
+            for row, p in zip(rows, predictions):
+                self.columns['emotion'][row] = int(np.argmax(p))
+                self.columns['confidence'][row] = float(np.max(p))
+
+    def arrays(self):
+        c = self.columns
+        out = {'source': np.array(c['source']), 'frame': np.array(c['frame'], dtype=np.int64),
+               'faces': np.array(c['faces'], dtype=np.int16),
+               'emotion': np.array(c['emotion'], dtype=np.int8), 'truth': np.array(c['truth'], dtype=np.int8),
+               'confidence': np.array(c['confidence'], dtype=np.float32)}
+        for name in ('x', 'y', 'w', 'h'):
+            out[name] = np.array(c[name], dtype=np.int32)
+        return out
+
+    def confusion(self, arrays):
+        matrix = np.zeros((len(self.labels), len(self.labels)), dtype=np.int64)
+        scored = (arrays['truth'] >= 0) & (arrays['emotion'] >= 0)
+        np.add.at(matrix, (arrays['truth'][scored], arrays['emotion'][scored]), 1)
+        return matrix
+
+
+def print_confusion(matrix, labels):
+    width = max(len(label) for label in labels) + 1
+    print(f"\nConfusion matrix (rows: true, columns: predicted), accuracy "
+          f"{np.trace(matrix) / matrix.sum():.4f} over {matrix.sum()} labelled faces")
+    print(" " * width + "".join(f"{label[:7]:>8}" for label in labels))
+    for label, row in zip(labels, matrix):
+        print(f"{label:<{width}}" + "".join(f"{n:>8}" for n in row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Offline batch evaluation over an image tree or a video')
+    parser.add_argument('input', help="directory of images or a video file")
+    parser.add_argument('--backend', help="'keras', 'tflite-float' or 'tflite-int8' (default: model_eval's)")
+    parser.add_argument('--model', help="model file for the backend")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) - 1))
+    parser.add_argument('--stride', type=int, default=1, help="video: classify every Nth frame")
+    parser.add_argument('--cropped', action='store_true', help="inputs are face crops; skip detection")
+    parser.add_argument('--out', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.input, max(1, args.stride))
+    # Workers never import TensorFlow; spawn them before the model is loaded here
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(args.workers, initializer=init_worker, initargs=(args.cropped,)) as pool:
+        frames_in = pool.imap(process_task, tasks)
+        if args.backend:
+            os.environ['CARTAKER_BACKEND'] = args.backend
+        if args.model:
+            os.environ['CARTAKER_MODEL'] = args.model
+        import model_eval as me
+        print(f"[{time.ctime()}] {len(tasks)} tasks on {args.workers} workers, backend {me.BACKEND}")
+
+        results = Results(me.LABELS)
+        labelled = os.path.isdir(args.input)
+        worker_cpu, unreadable = 0.0, 0
+        start = time.perf_counter()
+        for records, bad, cpu in frames_in:
+            for source, index, boxes, crops in records:
+                truth = results.truth(source) if labelled else -1
+                results.add_frame(source, index, boxes, crops, truth)
+            for path in bad:
+                print(f"[{time.ctime()}] Error: Couldn't load image: {path}")
+            unreadable += len(bad)
+            worker_cpu += cpu
+            results.flush(me.classify_batch)
+        results.flush(me.classify_batch, final=True)
+        elapsed = time.perf_counter() - start
+
+    arrays = results.arrays()
+    matrix = results.confusion(arrays)
+    np.savez(args.out, labels=np.array(me.LABELS), confusion=matrix, backend=me.BACKEND, **arrays)
+    faces = int(np.sum(arrays['emotion'] >= 0))
+    print(f"\n{results.frames} frames, {faces} faces, {unreadable} unreadable in {elapsed:.1f} s: "
+          f"{results.frames / elapsed:.1f} frames/s ({me.BACKEND})")
+    print(f"  inference {results.inference_s:.1f} s ({results.inference_s / max(faces, 1) * 1000:.2f} ms/face), "
+          f"decode + detect {worker_cpu:.1f} CPU s across {args.workers} workers")
+    if matrix.sum():
+        print_confusion(matrix, me.LABELS)
+    print(f"\nResults saved to {args.out}")
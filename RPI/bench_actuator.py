@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Command-to-motion latency of the actuator service against the one-shot
+# servo_control.py, on any Linux box (RPi.GPIO is mocked and timestamps every
+# duty-cycle change).
+#
+#   python3 bench_actuator.py --commands 50
+import argparse
+import time
+import numpy as np
+import hw_mocks
+
+gpio = hw_mocks.install()
+import servo_control
+from actuator import ServoActuator, EMERGENCY, NORMAL
+
+
+def one_shot():
+    # What master.sh pays per danger event: setup, blocking spin, cleanup
+    start = time.monotonic()
+    pwm = servo_control.setup_servo()
+    setup_done = time.monotonic()
+    servo_control.spin(pwm)
+    servo_control.release_servo(pwm)
+    return setup_done - start, time.monotonic() - start
+
+
+def service_latency(actuator, n):
+    submit, motion = [], []
+    for i in range(n):
+        t0 = time.monotonic()
+        cmd = actuator.move(90 if i % 2 else 45, speed=None)
+        submit.append(time.monotonic() - t0)
+        cmd.wait()
+        motion.append(cmd.first_motion - cmd.submitted)
+    return np.array(submit) * 1000, np.array(motion) * 1000
+
+
+def preemption(actuator):
+    # A slow close is moving and another is queued when the emergency open arrives
+    actuator.move(180, speed=None).wait()
+    closing = actuator.close(speed=30.0)
+    queued = actuator.close(priority=NORMAL)
+    time.sleep(0.5)
+    opening = actuator.open(priority=EMERGENCY)
+    opening.wait()
+    return closing.state, queued.state, (opening.first_motion - opening.submitted) * 1000
+
+
+def ramp_steps(actuator):
+    actuator.move(0, speed=None).wait()
+    first = len(gpio.events)
+    actuator.move(180, speed=180.0).wait()
+    times = [t for t, _, event, _ in gpio.events[first:] if event == 'duty']
+    return len(times), np.diff(times).max() * 1000 if len(times) > 1 else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Actuator latency benchmark')
+    parser.add_argument('--commands', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_s, total_s = one_shot()
+    print(f"one-shot servo_control: setup {setup_s * 1000:.2f} ms, caller blocked {total_s:.2f} s per spin")
+
+    actuator = ServoActuator(gpio=gpio).start()
+    try:
+        submit_ms, motion_ms = service_latency(actuator, args.commands)
+        print(f"service submit():      p50 {np.percentile(submit_ms, 50):.3f} ms  max {submit_ms.max():.3f} ms")
+        print(f"command-to-motion:     p50 {np.percentile(motion_ms, 50):.3f} ms  p99 {np.percentile(motion_ms, 99):.3f} ms")
+        closing, queued, open_ms = preemption(actuator)
+        print(f"emergency open:        {open_ms:.3f} ms to motion; running close {closing}, queued close {queued}")
+        steps, max_step_ms = ramp_steps(actuator)
+        print(f"0->180° ramp at 180°/s: {steps} duty updates, longest step {max_step_ms:.1f} ms")
+    finally:
+        actuator.stop()
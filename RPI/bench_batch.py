@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# Per-frame classification latency for 1-8 faces: the old loop of one
+# forward pass per face against one batched forward pass. Both go through
+# backend.predict, so this works with any backend, including the fast-load
+# .tflite copy that stands in for 'keras' under CARTAKER_FAST_LOAD=1.
+#
+#   python3 bench_batch.py --repeats 30
+import argparse
+import time
+import numpy as np
+import model_eval as me
+
+
+def time_call(fn, repeats):
+    fn()  # warm-up (graph tracing, allocator)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return np.median(samples) * 1000
+
+
+def per_face_loop(gray, faces):
+    for (x, y, w, h) in faces:
+        face_input = me.preprocess_face(gray[y:y+h, x:x+w])
+        me.backend.predict(face_input.astype(np.float32))
+
+
+def batched(gray, faces):
+    me.classify_frames([gray], [faces])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Batched emotion inference benchmark')
+    parser.add_argument('--repeats', type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"Backend: {me.BACKEND}")
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, (720, 1280), dtype=np.uint8)
+    print(f"{'faces':>5} {'loop ms':>10} {'batch ms':>10} {'speedup':>8}")
+    for n in range(1, 9):
+        faces = np.array([[40 + 150 * i, 200, 120, 120] for i in range(n)])
+        loop_ms = time_call(lambda: per_face_loop(gray, faces), args.repeats)
+        batch_ms = time_call(lambda: batched(gray, faces), args.repeats)
+        print(f"{n:>5} {loop_ms:>10.2f} {batch_ms:>10.2f} {loop_ms / batch_ms:>7.1f}x")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# CPU time and latency from "camera buffer ready" to "grayscale frame ready
+# for detection in model_eval", for three capture modes:
+#   still + JPEG   - the original cam_qual.py: full RGB still, JPEG file, imread
+#   full-res ring  - full RGB still through the shared-memory ring
+#   dual-stream    - low-res luma view through the ring (frame_sources.DualStreamSource)
+# Picamera2 is mocked (hw_mocks.py); its buffers are pre-rendered, so only the
+# work the Pi's CPU would do is timed. Also reports the cost of an on-demand
+# evidence still and the frame pacing of the dual-stream source.
+#
+#   python3 bench_camera.py --frames 30
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import hw_mocks
+
+hw_mocks.install()
+import cv2
+import frame_sources
+from frame_ring import FrameRing
+from frame_sources import DualStreamSource
+
+RING_NAME = 'cartaker_bench_camera'
+DETECT_WIDTH = 1152  # model_eval.DETECT_WIDTH (importing model_eval would load the model)
+
+
+# Same downscale model_eval's tracker applies before the Haar scan
+def detection_input(gray):
+    scale = min(1.0, DETECT_WIDTH / gray.shape[1])
+    if scale == 1.0:
+        return gray
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def timed(samples, fn, *args):
+    cpu, wall = time.process_time(), time.perf_counter()
+    fn(*args)
+    samples.append(((time.process_time() - cpu) * 1000, (time.perf_counter() - wall) * 1000))
+
+
+def full_res_modes(source, frames, tmp):
+    # Requests straight from the (mock) camera; make_array copies, as capture_array does
+    cam = source.picam2
+    cam.start()
+    ring = FrameRing.create(source.size[::-1] + (3,), name=RING_NAME)
+    out = np.empty(ring.shape, dtype=np.uint8)
+    path = os.path.join(tmp, 'frame.jpg')
+
+    def still_jpeg(request):
+        frame = request.make_array('main')
+        cv2.imwrite(path, frame)
+        detection_input(cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY))
+
+    def full_ring(request):
+        ring.write(request.make_array('main'))
+        _, _, frame = ring.latest(out=out)
+        detection_input(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+    results = {}
+    try:
+        for name, step in (('still + JPEG', still_jpeg), ('full-res ring', full_ring)):
+            samples = []
+            for _ in range(frames):
+                request = cam.capture_request()
+                timed(samples, step, request)
+                request.release()
+            results[name] = (samples, int(np.prod(ring.shape)))
+    finally:
+        ring.close()
+        cam.stop()
+    return results
+
+
+def dual_mode(source, frames):
+    ring = FrameRing.create(source.shape, name=RING_NAME)
+    out = np.empty(source.shape, dtype=np.uint8)
+
+    def luma_ring(luma):
+        ring.write(luma)
+        _, _, frame = ring.latest(out=out)
+        detection_input(frame)
+
+    samples, stills, timestamps = [], [], []
+    try:
+        for i, (timestamp, luma) in zip(range(frames), source):
+            timed(samples, luma_ring, luma)
+            timestamps.append(timestamp)
+            if i % 10 == 0:  # an occasional evidence still of the same frame
+                timed(stills, source.still)
+    finally:
+        ring.close()
+    return samples, int(np.prod(source.shape)), stills, np.diff(timestamps)
+
+
+def row(name, samples, nbytes):
+    cpu, wall = np.array(samples).T
+    print(f"{name:<16} {np.median(cpu):>9.2f} {np.median(wall):>9.2f} {np.percentile(wall, 95):>9.2f} "
+          f"{nbytes / 1e6:>9.2f}")
+    return np.median(cpu), np.median(wall)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Capture mode CPU and latency benchmark')
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.2, help="dual-stream frame interval (s)")
+    parser.add_argument('--frame-rate', type=float, default=30.0, help="mock sensor frame rate")
+    args = parser.parse_args()
+
+    frame_sources.SETTLE_SECONDS = 0.0
+    source = DualStreamSource(interval=args.interval, frame_rate=args.frame_rate)
+    print(f"main {source.size[0]}x{source.size[1]}, lores {source.lores_size[0]}x{source.lores_size[1]}, "
+          f"{args.frames} frames per mode")
+    with tempfile.TemporaryDirectory() as tmp:
+        results = full_res_modes(source, args.frames, tmp)
+    samples, nbytes, stills, intervals = dual_mode(source, args.frames)
+    results['dual-stream'] = (samples, nbytes)
+
+    print(f"\n{'mode':<16} {'CPU ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'MB/frame':>9}")
+    medians = {name: row(name, s, n) for name, (s, n) in results.items()}
+    dual_cpu, dual_wall = medians['dual-stream']
+    for name in ('still + JPEG', 'full-res ring'):
+        cpu, wall = medians[name]
+        print(f"dual-stream vs {name}: {cpu / dual_cpu:.0f}x less CPU, {wall - dual_wall:.1f} ms less latency per frame")
+    cpu, wall = np.array(stills).T
+    print(f"\nEvidence still (full-resolution JPEG, on demand): {np.median(cpu):.1f} ms CPU, {np.median(wall):.1f} ms")
+    print(f"Frame pacing: interval {np.mean(intervals) * 1000:.1f} ms (target {args.interval * 1000:.0f}), "
+          f"jitter {np.std(intervals) * 1000:.2f} ms")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Throughput of the streaming footage encryption (segment_crypto.py) on one
+# core, against the recorder's 5 Mbit/s, for both ciphers. Measures
+# in-process encryption, the same through a pipe from another process as in
+# recording, and decrypting a 10 s range of a segment against the whole segment.
+#
+#   python3 bench_crypto.py --megabytes 200
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import segment_crypto
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+from segment_crypto import CIPHERS, EncryptedSegment, StreamEncryptor
+
+BITRATE = 5_000_000  # libcamera-vid --bitrate in segment_recorder.py
+
+
+def fake_h264(megabytes, sps_every=625_000):
+    # Random payload with an SPS start code about once a second of 5 Mbit/s video
+    block = bytearray(os.urandom(sps_every))
+    block[:5] = b'\x00\x00\x00\x01\x67'
+    return bytes(block) * max(1, megabytes * 1_000_000 // sps_every)
+
+
+def encrypt_in_process(data, public_key, cipher, tmp):
+    encryptor = StreamEncryptor(os.path.join(tmp, f"mem_{cipher}_%03d.enc"), public_key, segment_seconds=1e9, cipher=cipher)
+    view = memoryview(data)
+    cpu, start = time.process_time(), time.perf_counter()
+    for i in range(0, len(data), segment_crypto.READ_SIZE):
+        encryptor.feed(view[i:i + segment_crypto.READ_SIZE])
+    encryptor.close()
+    return len(data) / (time.perf_counter() - start) / 1e6, len(data) / (time.process_time() - cpu) / 1e6
+
+
+def encrypt_through_pipe(megabytes, public_key, cipher, tmp):
+    writer = ("import os, sys\n"
+              "block = bytearray(os.urandom(625000)); block[:5] = b'\\x00\\x00\\x00\\x01\\x67'\n"
+              f"for _ in range({megabytes * 1_000_000 // 625_000}):\n"
+              "    sys.stdout.buffer.write(block)\n")
+    encryptor = StreamEncryptor(os.path.join(tmp, f"pipe_{cipher}_%03d.enc"), public_key, segment_seconds=1e9, cipher=cipher)
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-c', writer], stdout=subprocess.PIPE)
+    encryptor.run(proc.stdout)
+    proc.wait()
+    return megabytes / (time.perf_counter() - start)
+
+
+def range_decrypt(private_key, tmp, seconds=60, window=10):
+    # A 60 s segment at 5 Mbit/s, fed at its real timestamps
+    encryptor = StreamEncryptor(os.path.join(tmp, "range_%03d.enc"), private_key.public_key(), segment_seconds=1e9)
+    t0 = 1_700_000_000.0
+    step = segment_crypto.READ_SIZE
+    data = fake_h264(seconds * BITRATE // 8 // 1_000_000 + 1)[:seconds * BITRATE // 8]
+    for i in range(0, len(data), step):
+        encryptor.feed(data[i:i + step], now=t0 + i * 8 / BITRATE)
+    encryptor.close()
+    path = os.path.join(tmp, "range_000.enc")
+
+    class Sink:
+        n = 0
+
+        def write(self, b):
+            self.n += len(b)
+
+    timings = {}
+    for label, bounds in (('whole segment', (None, None)), (f'{window} s range', (t0 + 30, t0 + 30 + window))):
+        segment, sink = EncryptedSegment(path, private_key), Sink()
+        start = time.perf_counter()
+        segment.decrypt(sink, *bounds)
+        timings[label] = ((time.perf_counter() - start) * 1000, sink.n)
+        segment.close()
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Streaming encryption throughput benchmark')
+    parser.add_argument('--megabytes', type=int, default=100)
+    args = parser.parse_args()
+
+    os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:1])  # one core, as one Pi core would do it
+    private_key = X25519PrivateKey.generate()
+    public_key = private_key.public_key()
+    data = fake_h264(args.megabytes)
+    need = BITRATE / 8 / 1e6
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f"{'cipher':<18} {'MB/s':>8} {'CPU MB/s':>9} {'pipe MB/s':>10} {'x 5 Mbit/s':>11} {'CPU at 5 Mbit/s':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for cipher in CIPHERS:
+            wall, cpu = encrypt_in_process(data, public_key, cipher, tmp)
+            pipe = encrypt_through_pipe(args.megabytes, public_key, cipher, tmp)
+            print(f"{cipher:<18} {wall:>8.1f} {cpu:>9.1f} {pipe:>10.1f} {min(wall, pipe) / need:>10.0f}x "
+                  f"{need / cpu:>15.2%}")
+            for f in os.listdir(tmp):
+                os.remove(os.path.join(tmp, f))
+        growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+        timings = range_decrypt(private_key, tmp)
+
+    print(f"\nPeak RSS growth while encrypting {args.megabytes} MB: {growth:.1f} MB")
+    for label, (ms, n) in timings.items():
+        print(f"Decrypt {label} of a 60 s segment: {ms:.1f} ms ({n / 1e6:.1f} MB)")
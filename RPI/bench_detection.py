@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Detection time and recall of the multi-resolution tracker against the
+# full-resolution Haar scan. Recall treats the full scan's boxes as ground
+# truth (IoU >= 0.5), so run it on real cabin footage:
+#
+#   python3 bench_detection.py /home/thala/Videos/cabin.mp4 --scale 0.25 --interval 10
+#   python3 bench_detection.py /path/to/frames/
+import argparse
+import time
+import numpy as np
+import cv2
+from face_tracker import FaceTracker
+from frame_sources import open_source
+
+IOU_THRESHOLD = 0.5
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter) if inter else 0.0
+
+
+def matched(truth, boxes):
+    return sum(1 for t in truth if any(iou(t, b) >= IOU_THRESHOLD for b in boxes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Multi-resolution detection benchmark')
+    parser.add_argument('source', help="video file, image directory or 'synthetic'")
+    parser.add_argument('--scale', type=float, default=0.25)
+    parser.add_argument('--interval', type=int, default=10)
+    parser.add_argument('--frames', type=int, default=300)
+    args = parser.parse_args()
+
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    tracker = FaceTracker(cascade, scale=args.scale, rescan_interval=args.interval)
+    kwargs = {'count': args.frames} if args.source == 'synthetic' else {}
+    source = open_source(args.source, **kwargs)
+
+    full_times, multi_times = [], []
+    truth_total = found_total = 0
+    for n, (_, frame) in enumerate(source):
+        if n >= args.frames:
+            break
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        start = time.perf_counter()
+        truth = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        boxes = tracker.detect(gray)
+        multi_times.append(time.perf_counter() - start)
+
+        truth_total += len(truth)
+        found_total += matched(truth, boxes)
+
+    full_ms, multi_ms = np.array(full_times) * 1000, np.array(multi_times) * 1000
+    print(f"{len(full_ms)} frames at {gray.shape[1]}x{gray.shape[0]}, scale {args.scale}, rescan every {args.interval}")
+    print(f"full scan  p50 {np.percentile(full_ms, 50):8.1f} ms  p95 {np.percentile(full_ms, 95):8.1f} ms")
+    print(f"multires   p50 {np.percentile(multi_ms, 50):8.1f} ms  p95 {np.percentile(multi_ms, 95):8.1f} ms"
+          f"  ({tracker.scans} scans, {tracker.tracked} tracked frames)")
+    print(f"speedup    {full_ms.mean() / multi_ms.mean():.1f}x mean")
+    if truth_total:
+        print(f"recall     {found_total / truth_total:.3f} ({found_total}/{truth_total} faces)")
+    else:
+        print("recall     n/a (full scan found no faces; use real footage)")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Compare the JPEG-on-disk frame handoff (cam_qual.py -> model_eval.py) with the
+# shared-memory ring. Runs on any Linux box; frames are synthetic.
+#
+#   python3 bench_handoff.py --width 4608 --height 2592 --frames 20
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import cv2
+from frame_ring import FrameRing
+from frame_sources import SyntheticSource
+
+CAPTURE_INTERVAL = 3.0  # cam_qual.py capture period
+POLL_INTERVAL = 2.0     # watch_image() check_interval
+
+
+def bench_file(frames, path):
+    latencies, written = [], 0
+    last_modified = None
+    for frame in frames:
+        start = time.perf_counter()
+        cv2.imwrite(path, frame)
+        # Reader side: mtime check and re-decode
+        current_modified = os.path.getmtime(path)
+        if current_modified != last_modified:
+            last_modified = current_modified
+            image = cv2.imread(path)
+            assert image is not None
+        latencies.append(time.perf_counter() - start)
+        written += os.path.getsize(path)
+    return np.array(latencies), written
+
+
+def bench_ring(frames, name):
+    ring = FrameRing.create(frames[0].shape, name=name)
+    reader = FrameRing.attach(name)
+    latencies, out, last_seq = [], None, 0
+    try:
+        for frame in frames:
+            start = time.perf_counter()
+            ring.write(frame)
+            last_seq, _, out = reader.latest(after=last_seq, out=out)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        reader.close()
+        ring.close()
+    return np.array(latencies)
+
+
+def report(name, latencies, poll_delay, written_per_frame):
+    ms = latencies * 1000
+    print(f"{name:<6} handoff p50 {np.percentile(ms, 50):8.1f} ms  p95 {np.percentile(ms, 95):8.1f} ms"
+          f"  + mean poll delay {poll_delay * 1000:6.0f} ms"
+          f"  | SD writes {written_per_frame / 1e6:6.2f} MB/frame,"
+          f" {written_per_frame * 3600 / CAPTURE_INTERVAL / 1e9:6.2f} GB/h")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Frame handoff benchmark')
+    parser.add_argument('--width', type=int, default=4608)
+    parser.add_argument('--height', type=int, default=2592)
+    parser.add_argument('--frames', type=int, default=20)
+    args = parser.parse_args()
+
+    source = SyntheticSource(size=(args.width, args.height), faces=2, count=args.frames)
+    frames = [frame for _, frame in source]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_lat, written = bench_file(frames, os.path.join(tmp, 'high_quality_image.jpg'))
+    ring_lat = bench_ring(frames, f"cartaker_bench_{os.getpid()}")
+
+    print(f"{args.frames} frames at {args.width}x{args.height}")
+    # watch_image() notices a new file on average half a poll interval late;
+    # the ring reader polls every 5 ms
+    report('file', file_lat, POLL_INTERVAL / 2, written / len(frames))
+    report('ring', ring_lat, 0.0025, 0)
+    print(f"speedup (handoff only): {np.median(file_lat) / np.median(ring_lat):.1f}x")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Cost of the metrics.py instruments per call, disabled (the default no-op
+# objects) and enabled, plus the cost of a /metrics scrape and of one binary
+# log snapshot. The per-frame figure assumes the calls model_eval makes for
+# one frame with faces: 2 timers, 1 histogram, 3 counters.
+#
+#   python3 bench_metrics.py --calls 200000
+import argparse
+import os
+import tempfile
+import time
+import metrics
+
+PER_FRAME = {'timer': 2, 'histogram': 1, 'counter': 3}
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    loop = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(calls):
+        pass
+    return (loop - (time.perf_counter() - start)) / calls * 1e9
+
+
+def instrument_calls(counter, histogram, timer):
+    def use_timer():
+        with timer:
+            pass
+    return {'counter': counter.inc, 'histogram': lambda: histogram.observe(0.003), 'timer': use_timer}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='metrics.py overhead benchmark')
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    null = metrics._NULL
+    # Instances built directly, so the registry works whatever CARTAKER_METRICS says
+    live = (metrics.Counter('bench_total'), metrics.Histogram('bench_value'), metrics.Timer('bench_seconds'))
+    results = {}
+    for mode, instruments in (('disabled', (null, null, null)), ('enabled', live)):
+        results[mode] = {name: per_call_ns(fn, args.calls) for name, fn in instrument_calls(*instruments).items()}
+
+    print(f"{'instrument':<12} {'disabled ns':>12} {'enabled ns':>12}")
+    for name in PER_FRAME:
+        print(f"{name:<12} {results['disabled'][name]:>12.0f} {results['enabled'][name]:>12.0f}")
+    for mode in ('disabled', 'enabled'):
+        frame_us = sum(results[mode][name] * n for name, n in PER_FRAME.items()) / 1000
+        print(f"per frame, {mode}: {frame_us:.2f} µs ({frame_us / 40000:.4%} of a 40 ms frame)")
+
+    # Exporter side: scrape and log snapshot with a realistic number of metrics
+    metrics._registry.clear()
+    for i in range(8):
+        metrics._registry[f'cartaker_t{i}_seconds'] = metrics.Timer(f'cartaker_t{i}_seconds')
+        metrics._registry[f'cartaker_c{i}_total'] = metrics.Counter(f'cartaker_c{i}_total')
+    metrics._registry['cartaker_soc_temperature_celsius'] = metrics.Gauge(
+        'cartaker_soc_temperature_celsius', fn=lambda: metrics._read_number(metrics.SOC_TEMP_PATH) / 1000)
+    start = time.perf_counter()
+    for _ in range(100):
+        metrics.prometheus_text()
+    print(f"\n/metrics body for {len(metrics._registry)} metrics: {(time.perf_counter() - start) * 10:.2f} ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        log = metrics.BinaryLog(os.path.join(tmp, 'metrics_bench.bin'))
+        start = time.perf_counter()
+        for _ in range(100):
+            log.write_snapshot()
+        print(f"binary log snapshot: {(time.perf_counter() - start) * 10:.2f} ms, "
+              f"{os.path.getsize(log.path) // 100} bytes")
+        records, names = metrics.read_log(log.path)
+        print(f"read back {len(records)} records of {len(names)} metrics")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# End-to-end latency of the in-car detection pipeline, stage by stage, on any
+# Linux box. Picamera2 and GPIO are mocked (hw_mocks.py); frames are synthetic
+# or come from a recorded video / image directory.
+#
+#   python3 bench_pipeline.py --resolutions 1280x720,4608x2592 --faces 0,1,4 --save baseline.json
+#   python3 bench_pipeline.py --compare baseline.json          # diff against an earlier run
+#   CARTAKER_BACKEND=tflite-int8 python3 bench_pipeline.py ...  # any model_eval backend
+#
+# Synthetic faces are plain ellipses that Haar will not find; when detection
+# returns nothing the known ellipse boxes are classified instead, so the
+# preprocess/classify stages still see the requested face count.
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import numpy as np
+import hw_mocks
+
+hw_mocks.install()
+import cv2
+import model_eval as me
+from frame_sources import SyntheticSource, open_source
+
+STAGES = ['capture', 'imread', 'cvtColor', 'detect', 'preprocess', 'classify', 'total']
+REGRESSION_THRESHOLD = 0.10  # flag p50/p95 changes above 10%
+
+
+# ru_maxrss is the lifetime peak, so every configuration after the largest
+# would report the largest one's. On Linux the peak (VmHWM) is reset before
+# each configuration; elsewhere the current RSS after it is reported instead.
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb(reset):
+    if reset:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # lifetime peak, last resort
+
+
+def run_config(frames, boxes_for, file_handoff, tmp):
+    timings = {stage: [] for stage in STAGES}
+    reset = reset_peak_rss()
+    me.tracker.reset()
+    path = os.path.join(tmp, 'frame.jpg')
+    wall_start = time.perf_counter()
+
+    for i, capture in enumerate(frames):
+        t0 = time.perf_counter()
+        image = capture()
+        t1 = time.perf_counter()
+        if file_handoff:
+            cv2.imwrite(path, image)
+            image = cv2.imread(path)
+        t2 = time.perf_counter()
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        t3 = time.perf_counter()
+        faces = me.detect_faces(gray)
+        t4 = time.perf_counter()
+        if len(faces) == 0:
+            faces = boxes_for(i)
+        batch = me.preprocess_faces(gray, faces)
+        t5 = time.perf_counter()
+        me.classify_batch(batch)
+        t6 = time.perf_counter()
+
+        for stage, dt in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5, t6 - t0)):
+            timings[stage].append(dt * 1000)
+
+    elapsed = time.perf_counter() - wall_start
+    stats = {stage: {p: float(np.percentile(v, int(p[1:]))) for p in ('p50', 'p95', 'p99')}
+             for stage, v in timings.items()}
+    return {'stages': stats, 'fps': len(timings['total']) / elapsed, 'peak_rss_mb': peak_rss_mb(reset)}
+
+
+def synthetic_frames(size, faces, count):
+    # Mocked Picamera2 capture, as cam_qual.py would do it
+    from picamera2 import Picamera2
+    cam = Picamera2(camera_num=1)
+    cam.faces = faces
+    cam.configure(cam.create_still_configuration(main={"size": size}))
+    cam.start()
+    boxes = SyntheticSource(size=size, faces=faces).boxes()
+    return [lambda: cam.capture_array("main")] * count, (lambda i: boxes)
+
+
+def recorded_frames(spec, count):
+    loaded = [frame for _, frame in zip(range(count), open_source(spec))]
+    return [lambda f=f: f.copy() for f in loaded], (lambda i: np.empty((0, 4), dtype=int))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    print(f"\nComparison against {baseline.get('commit') or 'baseline'}:")
+    old = {r['name']: r for r in baseline['results']}
+    for r in current['results']:
+        if r['name'] not in old:
+            continue
+        for stage in STAGES:
+            for p in ('p50', 'p95'):
+                before, after = old[r['name']]['stages'][stage][p], r['stages'][stage][p]
+                change = (after - before) / before if before else 0.0
+                flag = '  <-- regression' if change > REGRESSION_THRESHOLD else ''
+                print(f"{r['name']:<24} {stage:<10} {p} {before:9.2f} -> {after:9.2f} ms ({change:+.0%}){flag}")
+
+
+def print_result(r):
+    print(f"\n{r['name']}: {r['fps']:.2f} frames/s, peak RSS {r['peak_rss_mb']:.0f} MB")
+    print(f"  {'stage':<10} {'p50':>9} {'p95':>9} {'p99':>9}  (ms)")
+    for stage in STAGES:
+        s = r['stages'][stage]
+        print(f"  {stage:<10} {s['p50']:>9.2f} {s['p95']:>9.2f} {s['p99']:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pipeline latency benchmark')
+    parser.add_argument('--resolutions', default='640x480,1920x1080,4608x2592')
+    parser.add_argument('--faces', default='0,1,4')
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--source', help="recorded video or image directory instead of synthetic frames")
+    parser.add_argument('--file-handoff', action='store_true', help="include JPEG write + imread per frame")
+    parser.add_argument('--save', help="write results as JSON")
+    parser.add_argument('--compare', help="JSON from an earlier run")
+    args = parser.parse_args()
+    if args.source:
+        args.source = os.path.abspath(args.source)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)  # keep model_eval's face.status out of the tree
+        try:
+            if args.source:
+                configs = [(os.path.basename(args.source.rstrip('/')), recorded_frames(args.source, args.frames))]
+            else:
+                configs = []
+                for res in args.resolutions.split(','):
+                    size = tuple(int(v) for v in res.split('x'))
+                    for n in (int(v) for v in args.faces.split(',')):
+                        configs.append((f"{res}/{n}faces", synthetic_frames(size, n, args.frames)))
+
+            for name, (frames, boxes_for) in configs:
+                result = run_config(frames, boxes_for, args.file_handoff, tmp)
+                result['name'] = name
+                results.append(result)
+                print_result(result)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'backend': me.BACKEND,
+        'detection': me.DETECTION,
+        'file_handoff': args.file_handoff,
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
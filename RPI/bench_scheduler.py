@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Fixed-rate inference vs the adaptive scheduler on a scripted cabin timeline:
+# empty car, a passenger gets in and moves, sits still while the cabin heats
+# up, then leaves. Time is simulated (one frame per capture interval); the
+# CPU cost of each inference is real, using a full-frame Haar scan as stand-in
+# for model_eval's detect + classify.
+#
+#   python3 bench_scheduler.py --minutes 30 --interval 3
+import argparse
+import time
+import cv2
+import numpy as np
+from frame_sources import SyntheticSource
+from inference_scheduler import InferenceScheduler
+
+SIZE = (1280, 720)
+cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+
+def timeline(minutes):
+    # (start, end) in seconds of each phase, as fractions of the run
+    total = minutes * 60
+    return {'enter': 0.3 * total, 'still': 0.3 * total + 30, 'heat': (0.5 * total, 0.7 * total),
+            'leave': 0.85 * total, 'end': total}
+
+
+def scene(t, phases, background, rng):
+    frame = background.copy()
+    present = phases['enter'] <= t < phases['leave']
+    if present:
+        cx, cy = SIZE[0] // 2, SIZE[1] // 2
+        if t < phases['still']:
+            cx += int(rng.integers(-80, 80))
+            cy += int(rng.integers(-40, 40))
+        cv2.ellipse(frame, (cx, cy), (64, 84), 0, 0, 360, (180, 170, 160), -1)
+    # Sensor noise on top of the static background
+    frame = cv2.add(frame, rng.integers(0, 8, frame.shape, dtype=np.uint8))
+    heat_start, heat_end = phases['heat']
+    temperature = 30.0 + (min(max(t, heat_start), heat_end) - heat_start) / 60.0
+    rising = 1.0 if heat_start <= t < heat_end else 0.0
+    return frame, present, temperature, rising
+
+
+def inference(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+
+
+def run(minutes, interval, adaptive):
+    phases = timeline(minutes)
+    rng = np.random.default_rng(0)
+    background = SyntheticSource(size=SIZE, faces=0).make_frame() // 2
+    scheduler = InferenceScheduler() if adaptive else None
+    cpu, inferred, frames = 0.0, 0, 0
+    inference_times = []
+    t = 0.0
+    while t < phases['end']:
+        frame, present, temperature, rising = scene(t, phases, background, rng)
+        frames += 1
+        run_now = True
+        if scheduler is not None:
+            scheduler.update_temperature(temperature, rising)
+            run_now = scheduler.should_infer(frame, now=t)[0]
+        if run_now:
+            start = time.process_time()
+            inference(frame)
+            spent = time.process_time() - start
+            cpu += spent
+            inferred += 1
+            inference_times.append(t)
+            if scheduler is not None:
+                scheduler.record(present, spent, now=t)
+        t += interval
+
+    # Detection delay: time from an event to the first inference that could see it
+    times = np.array(inference_times)
+    delays = {}
+    for event in ('enter', 'leave'):
+        after = times[times >= phases[event]]
+        delays[event] = after[0] - phases[event] if len(after) else float('inf')
+    gaps = np.diff(times) if len(times) > 1 else np.array([0.0])
+    return {'frames': frames, 'inferred': inferred, 'cpu': cpu, 'delays': delays, 'max_gap': gaps.max()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Adaptive inference scheduling benchmark')
+    parser.add_argument('--minutes', type=float, default=30)
+    parser.add_argument('--interval', type=float, default=3.0, help="seconds between captures")
+    args = parser.parse_args()
+
+    print(f"{'schedule':<10} {'inferred':>12} {'skip':>6} {'CPU s':>8} {'enter delay':>12} {'leave delay':>12} {'max gap':>9}")
+    for name, adaptive in (('fixed', False), ('adaptive', True)):
+        r = run(args.minutes, args.interval, adaptive)
+        skip = 1 - r['inferred'] / r['frames']
+        print(f"{name:<10} {r['inferred']:>5}/{r['frames']:<6} {skip:>6.0%} {r['cpu']:>8.2f} "
+              f"{r['delays']['enter']:>10.1f} s {r['delays']['leave']:>10.1f} s {r['max_gap']:>7.1f} s")
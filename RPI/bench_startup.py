@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Time from process start to the first published decision of model_eval.py,
+# for each start-up mode. Each run is a fresh interpreter that imports
+# model_eval and classifies one synthetic frame; the numbers come from the
+# startup timeline model_eval logs (startup.py).
+#
+#   python3 bench_startup.py --runs 5
+#   sudo python3 bench_startup.py --drop-caches   # closer to a cold boot
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+RPI_DIR = os.path.dirname(os.path.abspath(__file__))
+CHILD = f"""
+import sys
+sys.path.insert(0, {RPI_DIR!r})
+import model_eval as me
+from frame_sources import SyntheticSource
+me.scheduled_predict(SyntheticSource(size=(1280, 720)).make_frame())
+"""
+
+CONFIGS = [
+    ('sequential, .h5', {'CARTAKER_STARTUP': 'sequential', 'CARTAKER_FAST_LOAD': '0'}),
+    ('parallel, .h5', {'CARTAKER_STARTUP': 'parallel', 'CARTAKER_FAST_LOAD': '0'}),
+    ('parallel, fast-load', {'CARTAKER_STARTUP': 'parallel', 'CARTAKER_FAST_LOAD': '1'}),
+    ('parallel, tflite-int8', {'CARTAKER_STARTUP': 'parallel', 'CARTAKER_BACKEND': 'tflite-int8'}),
+]
+
+
+def drop_caches():
+    subprocess.run(['sync'])
+    with open('/proc/sys/vm/drop_caches', 'w') as f:
+        f.write('3\n')
+
+
+def ensure_fast_load_model():
+    # The fast-load copy is normally written in the background on the first start
+    sys.path.insert(0, RPI_DIR)
+    from inference_backends import MODEL_PATHS, fast_load_path, fast_load_current, model_key, export_fast_load
+    model_path = MODEL_PATHS['keras']
+    path = fast_load_path(model_path)
+    if not fast_load_current(model_path, path):
+        from tensorflow.keras.models import load_model
+        export_fast_load(load_model(model_path), path, model_key(model_path))
+
+
+def run_once(env, cold):
+    if cold:
+        drop_caches()
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run([sys.executable, '-c', CHILD], cwd=tmp, env={**os.environ, **env},
+                       check=True, stdout=subprocess.DEVNULL)
+        with open(os.path.join(tmp, 'startup_history.jsonl')) as f:
+            return json.loads(f.readline())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Start-up time benchmark')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--drop-caches', action='store_true', help="drop the page cache before every run (root)")
+    args = parser.parse_args()
+    ensure_fast_load_model()
+
+    for name, env in CONFIGS:
+        records = [run_once(env, args.drop_caches) for _ in range(args.runs)]
+        stages = {}
+        for r in records:
+            for s in r['stages']:
+                stages.setdefault(s['label'], []).append((s['start'], s['end']))
+        first = np.median([r['first_decision'] for r in records])
+        print(f"\n{name}: first decision after {first:.2f} s (median of {args.runs})")
+        for label, spans in stages.items():
+            spans = np.array(spans)
+            print(f"  {np.median(spans[:, 0]):6.2f} -> {np.median(spans[:, 1]):6.2f} s  {label}")
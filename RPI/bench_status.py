@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Publish/consume latency of detection status: face.status rewritten on every
+# frame and polled by the consumer (the master.sh approach) vs status_bus.py
+# (shared-memory seqlock + socket wake-up).
+#
+#   python3 bench_status.py --events 500 --interval 0.02 --poll 0.01
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import tempfile
+import time
+import numpy as np
+from status_bus import StatusBus
+
+FACES = [((120, 80, 96, 96), 'Happy', 0.91), ((400, 60, 88, 88), 'Neutral', 0.77)]
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+# ── file handoff ─────────────────────────────────────────────────────────────
+def file_publish(path, value, ts):
+    with open(path, "w") as f:
+        f.write(f"{value} {ts!r}\n")
+
+
+def file_subscriber(path, events, poll, results):
+    latencies, last = [], None
+    cpu = cpu_seconds()
+    while len(latencies) < events:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime != last:
+                last = mtime
+                with open(path) as f:
+                    fields = f.read().split()
+                if len(fields) == 2:  # skip a read that raced the truncating write
+                    latencies.append(time.time() - float(fields[1]))
+        except FileNotFoundError:
+            pass
+        time.sleep(poll)
+    results.put((latencies, cpu_seconds() - cpu))
+
+
+# ── status bus ───────────────────────────────────────────────────────────────
+def bus_subscriber(events, results, ready):
+    bus = StatusBus.attach()
+    bus.fileno()  # register for wake-ups before the publisher starts
+    ready.set()
+    latencies, last = [], 0
+    cpu = cpu_seconds()
+    while len(latencies) < events:
+        status = bus.wait(after=last, timeout=5)
+        if status is None:
+            break
+        received = time.time()
+        # Several publishes may land between wake-ups; count each one seen
+        latencies.append(received - status['ts'])
+        last = status['seq']
+    results.put((latencies, cpu_seconds() - cpu))
+    bus.close()
+
+
+def publish_loop(publish, events, interval):
+    costs = []
+    for i in range(events):
+        t0 = time.perf_counter()
+        publish(i)
+        costs.append(time.perf_counter() - t0)
+        time.sleep(interval)
+    return costs
+
+
+def read_cost(read, n=20000):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        read()
+    return (time.perf_counter() - t0) / n
+
+
+def report(name, publish_costs, latencies, cpu, events, read_s):
+    us = np.array(publish_costs) * 1e6
+    ms = np.array(latencies) * 1e3
+    print(f"\n{name}")
+    print(f"  publish      p50 {np.percentile(us, 50):8.1f} us   p99 {np.percentile(us, 99):8.1f} us")
+    print(f"  delivery     p50 {np.percentile(ms, 50):8.3f} ms   p99 {np.percentile(ms, 99):8.3f} ms"
+          f"   ({len(ms)}/{events} events seen)")
+    print(f"  latest read  {read_s * 1e6:8.2f} us")
+    print(f"  consumer CPU {cpu * 1000:8.1f} ms total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Status publish/consume benchmark')
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--interval', type=float, default=0.02, help="seconds between publishes")
+    parser.add_argument('--poll', type=float, default=0.01, help="file consumer poll interval (master.sh uses 1 s)")
+    args = parser.parse_args()
+    ctx = mp.get_context('fork')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'face.status')
+        results = ctx.Queue()
+        sub = ctx.Process(target=file_subscriber, args=(path, args.events, args.poll, results))
+        sub.start()
+        time.sleep(0.2)
+        costs = publish_loop(lambda i: file_publish(path, 1, time.time()), args.events, args.interval)
+        # The poller can miss rewrites that land within one poll interval; top up so it finishes
+        while sub.is_alive() and results.empty():
+            file_publish(path, 1, time.time())
+            time.sleep(args.interval)
+        latencies, cpu = results.get()
+        sub.join()
+
+        def file_read():
+            with open(path) as f:
+                return f.read()
+        report(f"face.status (poll every {args.poll * 1000:.0f} ms)", costs, latencies, cpu, args.events,
+               read_cost(file_read))
+
+    bus = StatusBus.create()
+    results, ready = ctx.Queue(), ctx.Event()
+    sub = ctx.Process(target=bus_subscriber, args=(args.events, results, ready))
+    sub.start()
+    ready.wait()
+    costs = publish_loop(lambda i: bus.publish(FACES), args.events, args.interval)
+    latencies, cpu = results.get()
+    sub.join()
+    report("status bus (seqlock + wake-up)", costs, latencies, cpu, args.events, read_cost(bus.latest))
+    bus.close()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Detection latency and idle CPU of the input watcher: inotify vs the old
+# 2 s mtime polling in watch_image(). A writer replaces the watched file (as
+# cam_qual.py does with HANDOFF='file'); the watcher runs in its own process.
+#
+#   python3 bench_watch.py --frames 10 --interval 3.0 --idle 30
+import argparse
+import multiprocessing as mp
+import os
+import random
+import resource
+import tempfile
+import time
+import numpy as np
+from file_watcher import InotifyWatcher, PollingWatcher, write_atomic
+
+POLL_INTERVAL = 2.0  # watch_image() check_interval
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def watcher_process(kind, path, frames, idle, results, ready):
+    watcher = InotifyWatcher([path]) if kind == 'inotify' else PollingWatcher([path], POLL_INTERVAL)
+    ready.set()
+
+    # Idle: nothing is written, only the watcher's own overhead counts
+    cpu = cpu_seconds()
+    watcher.wait(timeout=idle)
+    idle_cpu = cpu_seconds() - cpu
+    results.put(('idle', idle_cpu))
+
+    latencies = []
+    while len(latencies) < frames:
+        changed = watcher.wait(timeout=30)
+        if not changed:
+            break
+        seen = time.time()
+        with open(changed[os.path.abspath(path)]) as f:
+            latencies.append(seen - float(f.read()))
+    watcher.close()
+    results.put(('latency', latencies))
+
+
+def run(kind, frames, interval, idle):
+    ctx = mp.get_context('fork')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'high_quality_image.jpg')
+        results, ready = ctx.Queue(), ctx.Event()
+        proc = ctx.Process(target=watcher_process, args=(kind, path, frames, idle, results, ready))
+        proc.start()
+        ready.wait()
+        _, idle_cpu = results.get()
+
+        def write(tmp_path):
+            with open(tmp_path, 'w') as f:
+                f.write(repr(time.time()))
+        for _ in range(frames):
+            # Jitter the capture phase so polling is not accidentally aligned with it
+            time.sleep(interval * random.uniform(0.8, 1.2))
+            write_atomic(path, write)
+        _, latencies = results.get()
+        proc.join()
+    return np.array(latencies) * 1000, idle_cpu
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Input watcher benchmark')
+    parser.add_argument('--frames', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=3.0, help="seconds between captures (cam_qual.py: 3)")
+    parser.add_argument('--idle', type=float, default=30.0, help="seconds of idle CPU measurement")
+    args = parser.parse_args()
+
+    print(f"{'watcher':<16} {'p50 ms':>9} {'max ms':>9} {'idle CPU ms/min':>16}")
+    for kind in ('polling', 'inotify'):
+        ms, idle_cpu = run(kind, args.frames, args.interval, args.idle)
+        label = f"polling {POLL_INTERVAL:g} s" if kind == 'polling' else kind
+        print(f"{label:<16} {np.percentile(ms, 50):>9.2f} {ms.max():>9.2f} {idle_cpu / args.idle * 60 * 1000:>16.2f}")
@@ -1,5 +1,12 @@
-from picamera2 import Picamera2
+import os
+import signal
+import sys
 import time
+import cv2
+import metrics
+from frame_ring import FrameRing, RING_NAME
+from frame_sources import open_source
+from file_watcher import write_atomic
 
 # (Optional) print all detected cameras and their indices:
 # print(Picamera2.global_camera_info())
@@ -7,38 +14,67 @@ import time
 # [{'Id': '.../imx708@...','Num': 0, ...},
 #  {'Id': '.../imx219@...','Num': 1, ...}]
 
-# Initialize camera on CSI port 1
-picam2 = Picamera2(camera_num=1)
+# Frames are handed to model_eval.py through a shared-memory ring ("ring").
+# "file" keeps the old behaviour of overwriting a JPEG on the SD card.
+HANDOFF = 'ring'
+IMAGE_PATH = "high_quality_image.jpg"
 
-# Configure the camera for highest quality
-camera_config = picam2.create_still_configuration(
-    main={"size": (4608, 2592)}  # Your camera's max resolution
-)
+# "dual" (camera: full-resolution main stream + low-res luma for inference),
+# "camera" (full-resolution RGB stills), "synthetic" or a path to a recorded video
+SOURCE = sys.argv[1] if len(sys.argv) > 1 else 'dual'
 
-# Apply configuration
-picam2.configure(camera_config)
+# In "dual" mode, full-resolution evidence stills are only encoded on request:
+#   kill -USR1 $(pgrep -f cam_qual.py)
+EVIDENCE_DIR = "evidence"
+evidence_requested = False
 
-# Start the camera
-picam2.start()
+def request_evidence(signum, frame):
+    global evidence_requested
+    evidence_requested = True
 
-# Allow auto-exposure and AWB to settle
-time.sleep(2)
+signal.signal(signal.SIGUSR1, request_evidence)
+
+FRAMES = metrics.counter('frames_captured_total', "Frames handed to model_eval")
+HANDOFF_TIME = metrics.timer('handoff_seconds', "Ring write or JPEG file write per frame")
+FRAME_INTERVAL = metrics.histogram('capture_interval_seconds', "Time between captured frames")
+STILLS = metrics.timer('evidence_still_seconds', "Full-resolution evidence JPEG encode")
+metrics_log = metrics.start('cam_qual')
+
+# Initialize camera on CSI port 1 at its max resolution, capturing every 3 s
+source = open_source(SOURCE, interval=3.0)
+ring = FrameRing.create(source.shape, name=RING_NAME) if HANDOFF == 'ring' else None
 
 try:
     print("Starting continuous capture. Press Ctrl+C to stop.")
-    while True:
-        # Capture image, overwriting the previous one
-        picam2.capture_file("high_quality_image.jpg")
+    last_timestamp = None
+    for timestamp, frame in source:
+        with HANDOFF_TIME:
+            if ring is not None:
+                ring.write(frame, timestamp)
+            else:
+                # Capture image, replacing the previous one in a single rename
+                write_atomic(IMAGE_PATH, lambda tmp: cv2.imwrite(tmp, frame))
+        FRAMES.inc()
+        if last_timestamp is not None:
+            FRAME_INTERVAL.observe(timestamp - last_timestamp)
+        last_timestamp = timestamp
         print(f"Image captured at {time.strftime('%H:%M:%S')}")
-        
-        # Wait 1 second before the next capture
-        time.sleep(3)
+        # After the hand-off, so inference never waits for the encode
+        if evidence_requested and hasattr(source, 'still'):
+            evidence_requested = False
+            os.makedirs(EVIDENCE_DIR, exist_ok=True)
+            path = os.path.join(EVIDENCE_DIR, time.strftime('%Y%m%d_%H%M%S', time.localtime(timestamp)) + '.jpg')
+            with STILLS:
+                source.still(path)
+            print(f"Evidence still saved to {path}")
 
 except KeyboardInterrupt:
     print("\nCapture stopped by user")
 
 finally:
-    # Clean up
-    picam2.stop()
-    picam2.close()
+    # Clean up (the camera itself is closed by the source)
+    if ring is not None:
+        ring.close()
+    if metrics_log is not None:
+        metrics_log.close()
     print("Camera closed")
@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+# Constants
+DETECT_SCALE = 0.25     # Haar scan runs on a copy this size (4608x2592 -> 1152x648)
+RESCAN_INTERVAL = 10    # Full Haar scan at least every N frames
+MIN_TRACK_SCORE = 0.6   # Normalized correlation below this counts as a lost face
+SEARCH_MARGIN = 0.5     # Search window around the last box, as a fraction of its size
+
+
+class FaceTracker:
+    """
+    Multi-resolution face detection for large frames.
+
+    Haar runs on a downscaled copy of the frame and boxes are mapped back to
+    full resolution, so only the face crops are taken at full quality. Between
+    scans each face is followed by template matching in a small window around
+    its last position; a scan is forced every `rescan_interval` frames, when
+    any face is lost, and whenever no face is being tracked.
+    """
+
+    def __init__(self, cascade, scale=DETECT_SCALE, rescan_interval=RESCAN_INTERVAL,
+                 min_score=MIN_TRACK_SCORE, search_margin=SEARCH_MARGIN,
+                 scale_factor=1.1, min_neighbors=5):
+        self.cascade = cascade
+        self.scale = scale
+        self.rescan_interval = rescan_interval
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.boxes = []       # (x, y, w, h) in downscaled coordinates
+        self.templates = []
+        self.frames_since_scan = 0
+        self.scans = 0
+        self.tracked = 0
+
+    def _downscale(self, gray):
+        if self.scale == 1.0:
+            return gray
+        return cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def _scan(self, small):
+        faces = self.cascade.detectMultiScale(small, scaleFactor=self.scale_factor,
+                                              minNeighbors=self.min_neighbors)
+        self.boxes = [tuple(int(v) for v in f) for f in faces]
+        self.templates = [small[y:y+h, x:x+w].copy() for (x, y, w, h) in self.boxes]
+        self.frames_since_scan = 0
+        self.scans += 1
+
+    def _track(self, small):
+        # Returns False as soon as one face can't be found again
+        H, W = small.shape[:2]
+        boxes, templates = [], []
+        for (x, y, w, h), template in zip(self.boxes, self.templates):
+            mx, my = int(w * self.search_margin), int(h * self.search_margin)
+            x0, y0 = max(x - mx, 0), max(y - my, 0)
+            x1, y1 = min(x + w + mx, W), min(y + h + my, H)
+            window = small[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                return False
+            result = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(result)
+            if score < self.min_score:
+                return False
+            nx, ny = x0 + dx, y0 + dy
+            boxes.append((nx, ny, w, h))
+            templates.append(small[ny:ny+h, nx:nx+w].copy())
+        self.boxes, self.templates = boxes, templates
+        return True
+
+    def detect(self, gray):
+        """Return face boxes as an (N, 4) int array in full-resolution coordinates."""
+        small = self._downscale(gray)
+        self.frames_since_scan += 1
+        if not self.boxes or self.frames_since_scan >= self.rescan_interval or not self._track(small):
+            self._scan(small)
+        else:
+            self.tracked += 1
+
+        if not self.boxes:
+            return np.empty((0, 4), dtype=int)
+        boxes = np.round(np.array(self.boxes, dtype=np.float64) / self.scale).astype(int)
+        # Keep the mapped boxes inside the frame
+        H, W = gray.shape[:2]
+        boxes[:, 2] = np.minimum(boxes[:, 2], W - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], H - boxes[:, 1])
+        return boxes
+
+    def reset(self):
+        self.boxes, self.templates = [], []
+        self.frames_since_scan = 0
@@ -0,0 +1,168 @@
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# Constants
+IN_CLOSE_WRITE = 0x00000008  # a file opened for writing was closed
+IN_MOVED_TO = 0x00000080     # a file was renamed into the directory (atomic replace)
+IN_Q_OVERFLOW = 0x00004000
+POLL_INTERVAL = 2.0          # fallback when inotify is unavailable
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+_EVENT = struct.Struct('iIII')  # struct inotify_event: wd, mask, cookie, len (+ name)
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, 'inotify_init1') else None
+
+
+# Each input is either a single image file (replaced by the camera on every
+# capture) or a directory that new frames are written into. Hidden files are
+# ignored so writers can stage a frame as ".name.jpg" and rename it in place.
+def _matches(input_path, name):
+    if name.startswith('.'):
+        return False
+    if os.path.isdir(input_path):
+        return name.lower().endswith(EXTENSIONS)
+    return name == os.path.basename(input_path)
+
+
+class InotifyWatcher:
+    """
+    Waits for finished writes (close-write or rename) on one or more inputs.
+
+    wait() returns {input: newest changed file}, so a burst of frames on one
+    input collapses to the last one and a slow consumer never works through
+    a backlog.
+    """
+
+    def __init__(self, paths, libc=None):
+        self.libc = libc or _load_libc()
+        if self.libc is None:
+            raise OSError("inotify is not available")
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # wd -> (directory, [inputs in it])
+        by_dir = {}
+        for path in self.paths:
+            directory = path if os.path.isdir(path) else os.path.dirname(path)
+            by_dir.setdefault(directory, []).append(path)
+        for directory, inputs in by_dir.items():
+            wd = self.libc.inotify_add_watch(self.fd, directory.encode(), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self.watches[wd] = (directory, inputs)
+
+    def fileno(self):
+        return self.fd
+
+    def _read_events(self, changed):
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0').decode()
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped: fall back to the newest file of every input
+                    changed.update((p, _newest(p)) for p in self.paths)
+                    continue
+                directory, inputs = self.watches.get(wd, (None, ()))
+                for path in inputs:
+                    if _matches(path, name):
+                        changed[path] = os.path.join(directory, name)
+
+    def wait(self, timeout=None):
+        """Block until at least one input changes; returns {} on timeout."""
+        changed = {}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not changed:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not select.select([self.fd], [], [], remaining)[0]:
+                break
+            self._read_events(changed)
+        return {p: f for p, f in changed.items() if f is not None}
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Same interface as InotifyWatcher, checking mtimes every `interval` seconds."""
+
+    def __init__(self, paths, interval=POLL_INTERVAL):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.interval = interval
+        self.seen = {p: self._state(p) for p in self.paths}
+
+    def _state(self, path):
+        newest = _newest(path)
+        try:
+            return newest, os.stat(newest).st_mtime_ns if newest else None
+        except FileNotFoundError:
+            return None, None
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = {}
+            for path in self.paths:
+                state = self._state(path)
+                if state != self.seen[path] and state[0] is not None:
+                    changed[path] = state[0]
+                self.seen[path] = state
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return {}
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def _newest(path):
+    # The input file itself, or the most recently modified frame in a directory
+    if not os.path.isdir(path):
+        return path if os.path.exists(path) else None
+    newest, newest_mtime = None, -1
+    for entry in os.scandir(path):
+        if entry.is_file() and _matches(path, entry.name):
+            mtime = entry.stat().st_mtime_ns
+            if mtime > newest_mtime:
+                newest, newest_mtime = entry.path, mtime
+    return newest
+
+
+def open_watcher(paths, poll_interval=POLL_INTERVAL):
+    # inotify on Linux; polling elsewhere (or when the watch limit is exhausted)
+    if isinstance(paths, str):
+        paths = [paths]
+    try:
+        return InotifyWatcher(paths)
+    except OSError as e:
+        print(f"[{time.ctime()}] inotify unavailable ({e}), polling every {poll_interval} s")
+        return PollingWatcher(paths, poll_interval)
+
+
+# Write an image so watchers only ever see it complete: stage it as a hidden
+# file next to the target and rename it over the target.
+def write_atomic(path, write_fn):
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, '.' + name)
+    write_fn(tmp)
+    os.replace(tmp, path)
@@ -0,0 +1,150 @@
+import time
+import numpy as np
+import shm_segments
+
+# Constants
+RING_NAME = 'cartaker_frames'
+RING_SLOTS = 3
+MAGIC = 0xCA7F4A3E
+REATTACH_INTERVAL = 0.5  # seconds without a new frame between checks for a restarted writer
+
+# Header layout (uint64 words): magic, slots, height, width, channels, write_seq, generation
+_HEADER_WORDS = 8
+_META_DTYPE = np.dtype([('seq', '<u8'), ('ts', '<f8')])
+
+
+class FrameRing:
+    """
+    Bounded ring of raw uint8 frames in POSIX shared memory.
+
+    One writer (the camera loop) and any number of readers. The writer never
+    blocks: it overwrites the oldest slot, so readers always see the newest
+    frame. Each slot carries its own sequence number, which is cleared while
+    the slot is being written so a reader can detect a torn copy and retry.
+
+    A restarted writer creates a new segment with a new generation and
+    numbers its frames from 1 again; wait() notices and reattaches.
+    """
+
+    def __init__(self, shm, owner):
+        self._map(shm)
+        self.owner = owner
+
+    def _map(self, shm):
+        self.shm = shm
+        self.inode = shm_segments.inode(shm)
+        self.header = np.ndarray((_HEADER_WORDS,), dtype='<u8', buffer=shm.buf)
+        if int(self.header[0]) != MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a frame ring")
+        self.slots = int(self.header[1])
+        self.shape = tuple(int(v) for v in self.header[2:5])
+        meta_offset = self.header.nbytes
+        self.meta = np.ndarray((self.slots,), dtype=_META_DTYPE, buffer=shm.buf, offset=meta_offset)
+        frames_offset = meta_offset + self.meta.nbytes
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=frames_offset)
+
+    @classmethod
+    def create(cls, shape, slots=RING_SLOTS, name=RING_NAME):
+        if len(shape) == 2:
+            shape = (shape[0], shape[1], 1)
+        frame_bytes = int(np.prod(shape))
+        size = _HEADER_WORDS * 8 + slots * _META_DTYPE.itemsize + slots * frame_bytes
+
+        shm = shm_segments.create(name, size)
+        header = np.ndarray((_HEADER_WORDS,), dtype='<u8', buffer=shm.buf)
+        header[:] = 0
+        header[1] = slots
+        header[2:5] = shape
+        header[6] = time.time_ns()
+        header[0] = MAGIC
+        ring = cls(shm, owner=True)
+        ring.meta[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name=RING_NAME, timeout=None):
+        # Wait for the camera process to create the ring
+        return cls(shm_segments.attach(name, timeout), owner=False)
+
+    @property
+    def write_seq(self):
+        return int(self.header[5])
+
+    @property
+    def generation(self):
+        return int(self.header[6])
+
+    def reattach(self):
+        """Map the writer's new segment if it was replaced; returns True if it was."""
+        if self.owner or not shm_segments.replaced(self.shm.name, self.inode):
+            return False
+        try:
+            shm = shm_segments.open_existing(self.shm.name)
+        except (FileNotFoundError, ValueError):
+            return False  # writer not back yet; keep the old mapping until it is
+        if shm.size < _HEADER_WORDS * 8 or int(np.ndarray((1,), dtype='<u8', buffer=shm.buf)[0]) != MAGIC:
+            shm.close()  # writer still filling in the header
+            return False
+        self.header = self.meta = self.frames = None
+        self.shm.close()
+        self._map(shm)
+        print(f"[{time.ctime()}] Frame ring '{shm.name}' was recreated by its writer, reattached")
+        return True
+
+    def write(self, frame, timestamp=None):
+        """Copy a frame into the next slot and return its sequence number."""
+        seq = self.write_seq + 1
+        idx = (seq - 1) % self.slots
+        self.meta['seq'][idx] = 0  # mark slot as being written
+        self.frames[idx].reshape(frame.shape)[...] = frame
+        self.meta['ts'][idx] = time.time() if timestamp is None else timestamp
+        self.meta['seq'][idx] = seq
+        self.header[5] = seq
+        return seq
+
+    def latest(self, after=0, out=None):
+        """
+        Return (seq, timestamp, frame) for the newest frame newer than `after`,
+        or None. The frame is copied into `out` (allocated if not given) so the
+        writer can reuse the slot while the caller is still using it.
+        """
+        for _ in range(3):
+            seq = self.write_seq
+            if seq == 0 or seq <= after:
+                return None
+            idx = (seq - 1) % self.slots
+            if int(self.meta['seq'][idx]) != seq:
+                continue
+            if out is None or out.size != self.frames[idx].size:
+                out = np.empty(self.shape[:2] if self.shape[2] == 1 else self.shape, dtype=np.uint8)
+            out.reshape(self.shape)[...] = self.frames[idx]
+            ts = float(self.meta['ts'][idx])
+            if int(self.meta['seq'][idx]) == seq:
+                return seq, ts, out
+        return None
+
+    def wait(self, after=0, poll_interval=0.005, timeout=None, out=None):
+        # Block until a frame newer than `after` is available. If the writer
+        # restarted, follow it to its new segment and start again from 0;
+        # callers spot the restart by `generation` changing.
+        start = checked = time.monotonic()
+        while True:
+            if self.write_seq < after:
+                after = 0  # same segment, but the writer started counting again
+            item = self.latest(after, out=out)
+            if item is not None:
+                return item
+            now = time.monotonic()
+            if now - checked >= REATTACH_INTERVAL:
+                checked = now
+                if self.reattach():
+                    after = 0
+                    continue
+            if timeout is not None and now - start > timeout:
+                return None
+            time.sleep(poll_interval)
+
+    def close(self):
+        # Drop numpy views before closing the mapping
+        self.header = self.meta = self.frames = None
+        shm_segments.release(self.shm, self.owner)
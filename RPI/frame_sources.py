@@ -0,0 +1,227 @@
+import os
+import time
+import numpy as np
+import cv2
+
+# Constants
+CAMERA_NUM = 1
+STILL_SIZE = (4608, 2592)  # Camera's max resolution (width, height)
+LORES_SIZE = (1152, 648)   # dual-stream luma for detection: the old 0.25 detection scale of a full still
+FRAME_RATE = 5.0           # sensor frame rate in dual-stream mode; frames are picked from this cadence
+SETTLE_SECONDS = 2.0       # auto-exposure and AWB settling after start
+JPEG_QUALITY = 90
+
+
+# Each source is an iterable of (timestamp, frame) with BGR uint8 frames, so the
+# capture loop does not care whether frames come from the camera or elsewhere.
+
+class PicameraSource:
+    def __init__(self, camera_num=CAMERA_NUM, size=STILL_SIZE, interval=3.0):
+        from picamera2 import Picamera2  # only available on the Pi
+
+        self.interval = interval
+        self.picam2 = Picamera2(camera_num=camera_num)
+        # RGB888 is laid out as BGR in memory, which is what OpenCV expects
+        config = self.picam2.create_still_configuration(main={"size": size, "format": "RGB888"})
+        self.picam2.configure(config)
+        self.shape = (size[1], size[0], 3)
+
+    def __iter__(self):
+        self.picam2.start()
+        time.sleep(2)  # Allow auto-exposure and AWB to settle
+        try:
+            while True:
+                frame = self.picam2.capture_array("main")
+                yield time.time(), frame
+                time.sleep(self.interval)
+        finally:
+            self.picam2.stop()
+            self.picam2.close()
+
+
+class DualStreamSource:
+    """
+    Full-resolution main stream plus a low-resolution YUV420 stream of the same frames.
+
+    Iterating yields (timestamp, luma): the Y plane of the low-res stream as a
+    numpy view into the camera's buffer, with no copy and no colour
+    conversion. The view is valid until the next frame is requested. still()
+    JPEG-encodes the full-resolution image of that same frame, only when an
+    event asks for it. Frames are picked by their sensor timestamps from a
+    camera running at `frame_rate`, so the camera does the pacing.
+    """
+
+    def __init__(self, camera_num=CAMERA_NUM, size=STILL_SIZE, lores_size=LORES_SIZE, interval=3.0,
+                 frame_rate=FRAME_RATE):
+        from picamera2 import Picamera2  # only available on the Pi
+
+        self.interval = interval
+        self.picam2 = Picamera2(camera_num=camera_num)
+        duration = int(1e6 / frame_rate)
+        config = self.picam2.create_video_configuration(
+            main={"size": size, "format": "RGB888"}, lores={"size": lores_size, "format": "YUV420"},
+            buffer_count=3, controls={"FrameDurationLimits": (duration, duration)})
+        self.picam2.configure(config)
+        # The ISP may align the sizes; use what was actually configured
+        configured = self.picam2.camera_configuration()
+        self.size = tuple(configured['main']['size'])
+        self.lores_size = tuple(configured['lores']['size'])
+        self.shape = (self.lores_size[1], self.lores_size[0])
+        self.request = None
+
+    def __iter__(self):
+        from picamera2 import MappedArray
+
+        w, h = self.lores_size
+        self.picam2.start()
+        due = None
+        try:
+            while True:
+                request = self.picam2.capture_request()  # blocks until the sensor delivers a frame
+                sensor_time = request.get_metadata()['SensorTimestamp'] / 1e9  # CLOCK_BOOTTIME
+                if due is None:
+                    due = sensor_time + SETTLE_SECONDS
+                if sensor_time < due:
+                    request.release()
+                    continue
+                # Keep the cadence, but don't try to catch up after a slow consumer
+                due = max(due + self.interval, sensor_time + self.interval / 2)
+                timestamp = time.time() - (time.clock_gettime(time.CLOCK_BOOTTIME) - sensor_time)
+                try:
+                    with MappedArray(request, 'lores') as mapped:
+                        self.request = request
+                        yield timestamp, mapped.array[:h, :w]
+                finally:
+                    self.request = None
+                    request.release()
+        finally:
+            self.picam2.stop()
+            self.picam2.close()
+
+    def still(self, path=None, quality=JPEG_QUALITY):
+        """JPEG of the current frame at full resolution; written to `path` if given. Returns the bytes."""
+        from picamera2 import MappedArray
+
+        if self.request is None:
+            raise RuntimeError("still() needs a frame from the iterator")
+        w, h = self.size
+        with MappedArray(self.request, 'main') as mapped:
+            ok, jpeg = cv2.imencode('.jpg', mapped.array[:h, :w], [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise IOError("JPEG encoding failed")
+        if path is not None:
+            from file_watcher import write_atomic
+            write_atomic(path, lambda tmp: jpeg.tofile(tmp))
+        return jpeg.tobytes()
+
+
+class SyntheticSource:
+    """Noise background with a few bright face-sized ellipses; for tests and benchmarks."""
+
+    def __init__(self, size=(1280, 720), faces=1, interval=0.0, count=None, seed=0):
+        self.shape = (size[1], size[0], 3)
+        self.faces = faces
+        self.interval = interval
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+
+    def _ellipses(self):
+        h, w = self.shape[:2]
+        fw = max(w // 10, 24)
+        axes = (fw // 2, int(fw * 0.65))
+        return [((int((i + 1) * w / (self.faces + 1)), h // 2), axes) for i in range(self.faces)]
+
+    def boxes(self):
+        """Bounding boxes (x, y, w, h) of the drawn faces."""
+        return np.array([(cx - ax, cy - ay, 2 * ax, 2 * ay) for (cx, cy), (ax, ay) in self._ellipses()],
+                        dtype=int).reshape(-1, 4)
+
+    def make_frame(self):
+        frame = self.rng.integers(0, 64, self.shape, dtype=np.uint8)
+        for center, axes in self._ellipses():
+            cv2.ellipse(frame, center, axes, 0, 0, 360, (180, 170, 160), -1)
+        return frame
+
+    def __iter__(self):
+        n = 0
+        while self.count is None or n < self.count:
+            yield time.time(), self.make_frame()
+            n += 1
+            if self.interval:
+                time.sleep(self.interval)
+
+
+class VideoSource:
+    """Replays a recorded video file; interval=None paces it at its native frame rate."""
+
+    def __init__(self, path, interval=0.0, loop=False):
+        self.path = path
+        self.interval = interval
+        self.loop = loop
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError(f"Couldn't open video: {path}")
+        w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+        self.shape = (h, w, 3)
+        if self.interval is None:
+            self.interval = 1.0 / self.fps
+
+    def __iter__(self):
+        while True:
+            cap = cv2.VideoCapture(self.path)
+            try:
+                while True:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    yield time.time(), frame
+                    if self.interval:
+                        time.sleep(self.interval)
+            finally:
+                cap.release()
+            if not self.loop:
+                return
+
+
+class ImageDirSource:
+    """Walks a directory tree of still images in sorted order."""
+
+    EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+    def __init__(self, path, interval=0.0):
+        self.interval = interval
+        self.paths = sorted(
+            os.path.join(root, f)
+            for root, _, files in os.walk(path)
+            for f in files if f.lower().endswith(self.EXTENSIONS)
+        )
+        if not self.paths:
+            raise IOError(f"No images found under: {path}")
+        first = cv2.imread(self.paths[0])
+        self.shape = first.shape
+
+    def __iter__(self):
+        for path in self.paths:
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"[{time.ctime()}] Error: Couldn't load image: {path}")
+                continue
+            yield time.time(), frame
+            if self.interval:
+                time.sleep(self.interval)
+
+
+def open_source(spec, **kwargs):
+    # "camera", "dual" (camera, main + luma streams), "synthetic", a directory of images or a path to a video file
+    if spec == 'camera':
+        return PicameraSource(**kwargs)
+    if spec == 'dual':
+        return DualStreamSource(**kwargs)
+    if spec == 'synthetic':
+        return SyntheticSource(**kwargs)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, **kwargs)
+    return VideoSource(spec, **kwargs)
@@ -0,0 +1,268 @@
+import sys
+import time
+import types
+import numpy as np
+
+# Stand-ins for the Pi-only modules (picamera2, RPi.GPIO, board, adafruit_dht)
+# so the RPI scripts can run on a plain Linux box. Call install() before
+# importing anything that uses them.
+
+# Constants
+MOCK_BUFFERS = 4              # distinct frames cycled by capture_request()
+MOCK_FRAME_DURATION = 33333   # µs, when no FrameDurationLimits control is configured
+
+
+class MockPicamera2:
+    """Mimics the parts of Picamera2 the scripts use; frames come from SyntheticSource."""
+
+    def __init__(self, camera_num=0, faces=1, seed=0):
+        self.camera_num = camera_num
+        self.faces = faces
+        self.seed = seed
+        self.config = None
+        self.source = None
+        self.started = False
+        self.frame_times = []
+        self.buffers = None
+        self.next_frame = None
+        self.sequence = 0
+
+    @staticmethod
+    def global_camera_info():
+        return [{'Id': 'mock/imx708', 'Num': 0}, {'Id': 'mock/imx219', 'Num': 1}]
+
+    def create_still_configuration(self, main=None, **kwargs):
+        return {'main': dict(main or {'size': (4608, 2592)}), **kwargs}
+
+    def create_video_configuration(self, main=None, **kwargs):
+        return {'main': dict(main or {'size': (1920, 1080)}), **kwargs}
+
+    def configure(self, config):
+        from frame_sources import SyntheticSource  # needs cv2, only when used
+
+        self.config = config
+        self.source = SyntheticSource(size=config['main']['size'], faces=self.faces, seed=self.seed)
+        self.buffers = None
+
+    def camera_configuration(self):
+        return self.config
+
+    def start(self):
+        self.started = True
+        self.next_frame = None
+
+    def _stream_buffers(self):
+        # The ISP's output for capture_request(): a few pre-rendered frames per
+        # stream, cycled, so requests cost no CPU here, as on the real camera
+        import cv2
+        from frame_sources import SyntheticSource
+
+        if self.buffers is None:
+            self.buffers = []
+            lores = self.config.get('lores')
+            for i in range(MOCK_BUFFERS):
+                main = self.source.make_frame()
+                streams = {'main': main}
+                if lores:
+                    w, h = lores['size']
+                    luma = SyntheticSource(size=(w, h), faces=self.faces, seed=self.seed + i).make_frame()
+                    yuv = np.full((h * 3 // 2, w), 128, dtype=np.uint8)  # neutral chroma
+                    yuv[:h] = cv2.cvtColor(luma, cv2.COLOR_BGR2GRAY)
+                    streams['lores'] = yuv
+                self.buffers.append(streams)
+        return self.buffers[self.sequence % len(self.buffers)]
+
+    def capture_request(self):
+        # Blocks until the next frame boundary set by FrameDurationLimits
+        duration = self.config.get('controls', {}).get('FrameDurationLimits', (MOCK_FRAME_DURATION,) * 2)[0] / 1e6
+        now = time.clock_gettime(time.CLOCK_BOOTTIME)
+        if self.next_frame is None:
+            self.next_frame = now
+        if self.next_frame > now:
+            time.sleep(self.next_frame - now)
+        timestamp = self.next_frame
+        self.next_frame = max(self.next_frame + duration, now)
+        self.sequence += 1
+        self.frame_times.append(time.monotonic())
+        return MockRequest(self._stream_buffers(), {'SensorTimestamp': int(timestamp * 1e9),
+                                                    'FrameDuration': int(duration * 1e6)})
+
+    def capture_array(self, name="main"):
+        frame = self.source.make_frame()
+        self.frame_times.append(time.monotonic())
+        return frame
+
+    def capture_file(self, path):
+        import cv2
+        cv2.imwrite(path, self.capture_array())
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        self.source = None
+
+
+class MockRequest:
+    """A completed capture request holding one buffer per configured stream."""
+
+    def __init__(self, streams, metadata):
+        self.streams = streams
+        self.metadata = metadata
+        self.released = False
+
+    def make_array(self, name):
+        return self.streams[name].copy()
+
+    def get_metadata(self):
+        return self.metadata
+
+    def save(self, name, path):
+        import cv2
+        cv2.imwrite(path, self.streams[name])
+
+    def release(self):
+        self.released = True
+
+
+class MockMappedArray:
+    """picamera2.MappedArray: the request's buffer as an array, without a copy."""
+
+    def __init__(self, request, stream):
+        self.request = request
+        self.stream = stream
+        self.array = None
+
+    def __enter__(self):
+        if self.request.released:
+            raise RuntimeError("Request already released")
+        self.array = self.request.streams[self.stream]
+        return self
+
+    def __exit__(self, *exc):
+        self.array = None
+
+
+class MockPWM:
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty = None
+
+    def _record(self, event, value=None):
+        self.gpio.events.append((time.monotonic(), self.pin, event, value))
+
+    def start(self, duty):
+        self.duty = duty
+        self._record('start', duty)
+
+    def ChangeDutyCycle(self, duty):
+        self.duty = duty
+        self._record('duty', duty)
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+        self._record('frequency', frequency)
+
+    def stop(self):
+        self._record('stop')
+
+
+class MockGPIO(types.ModuleType):
+    """Module-shaped RPi.GPIO replacement; every call is timestamped in `events`."""
+
+    BCM, BOARD = 11, 10
+    OUT, IN = 0, 1
+    HIGH, LOW = 1, 0
+
+    def __init__(self):
+        super().__init__('RPi.GPIO')
+        self.events = []
+        self.pins = {}
+        self.mode = None
+
+    def setmode(self, mode):
+        self.mode = mode
+        self.events.append((time.monotonic(), None, 'setmode', mode))
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, initial=None):
+        self.pins[pin] = initial
+        self.events.append((time.monotonic(), pin, 'setup', direction))
+
+    def output(self, pin, value):
+        self.pins[pin] = value
+        self.events.append((time.monotonic(), pin, 'output', value))
+
+    def input(self, pin):
+        return self.pins.get(pin) or 0
+
+    def PWM(self, pin, frequency):
+        return MockPWM(self, pin, frequency)
+
+    def cleanup(self, pins=None):
+        self.events.append((time.monotonic(), None, 'cleanup', pins))
+        self.pins = {}
+
+
+class MockDHT22:
+    """Temperature follows a slow ramp with a little noise; `fail_rate` of reads raise RuntimeError."""
+
+    def __init__(self, pin=None, start_temp=30.0, rise_per_min=0.0, humidity=40.0, fail_rate=0.0, seed=0):
+        self.pin = pin
+        self.start_temp = start_temp
+        self.rise_per_min = rise_per_min
+        self.base_humidity = humidity
+        self.fail_rate = fail_rate
+        self.rng = np.random.default_rng(seed)
+        self.t0 = time.monotonic()
+
+    def _maybe_fail(self):
+        if self.rng.random() < self.fail_rate:
+            raise RuntimeError("Checksum did not validate. Try again.")
+
+    @property
+    def temperature(self):
+        self._maybe_fail()
+        minutes = (time.monotonic() - self.t0) / 60
+        return self.start_temp + self.rise_per_min * minutes + self.rng.normal(0, 0.1)
+
+    @property
+    def humidity(self):
+        self._maybe_fail()
+        return self.base_humidity + self.rng.normal(0, 0.5)
+
+    def exit(self):
+        pass
+
+
+def install(faces=1):
+    """Register the mocks in sys.modules; returns the shared MockGPIO."""
+    class Picamera2(MockPicamera2):
+        def __init__(self, camera_num=0):
+            super().__init__(camera_num, faces=faces)
+
+    picamera2 = types.ModuleType('picamera2')
+    picamera2.Picamera2 = Picamera2
+    picamera2.MappedArray = MockMappedArray
+    sys.modules['picamera2'] = picamera2
+
+    gpio = MockGPIO()
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = gpio
+    sys.modules['RPi'] = rpi
+    sys.modules['RPi.GPIO'] = gpio
+
+    board = types.ModuleType('board')
+    for n in range(28):
+        setattr(board, f"D{n}", n)
+    sys.modules['board'] = board
+
+    adafruit_dht = types.ModuleType('adafruit_dht')
+    adafruit_dht.DHT22 = MockDHT22
+    adafruit_dht.DHT11 = MockDHT22
+    sys.modules['adafruit_dht'] = adafruit_dht
+    return gpio
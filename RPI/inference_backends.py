@@ -0,0 +1,156 @@
+import os
+import threading
+import numpy as np
+
+# Constants
+IMG_SIZE = (48, 48)
+TFLITE_THREADS = 4  # Raspberry Pi 5 has four cores
+
+# Backend name -> default model file
+MODEL_PATHS = {
+    'keras': '/home/thala/model1.h5',
+    'tflite-float': '/home/thala/model1_float16.tflite',
+    'tflite-int8': '/home/thala/model1_int8.tflite',
+}
+
+
+# Every backend takes a float32 (N,48,48,1) batch scaled to [0,1] and returns
+# (N, num_classes) float32 probabilities. TensorFlow / the TFLite runtime are
+# imported when a backend is created, so only the selected one is paid for.
+
+class KerasBackend:
+    def __init__(self, model_path):
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+
+        self.model = load_model(model_path)
+        self.pending_export = None  # (path, key) of a fast-load copy still to write, see load_backend
+        self._tf = tf
+        # Single graph-compiled forward pass for any number of faces; avoids
+        # the per-call setup cost of model.predict
+        self._infer = tf.function(lambda x: self.model(x, training=False),
+                                  input_signature=[tf.TensorSpec([None, IMG_SIZE[0], IMG_SIZE[1], 1], tf.float32)])
+
+    def predict(self, batch):
+        return self._infer(self._tf.convert_to_tensor(batch, dtype=self._tf.float32)).numpy()
+
+
+def _tflite_interpreter():
+    # Prefer the standalone runtimes; fall back to the one bundled with TensorFlow
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    """Runs a float16 or fully int8-quantized .tflite export of the DCNN."""
+
+    def __init__(self, model_path, num_threads=TFLITE_THREADS):
+        Interpreter = _tflite_interpreter()
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.batch_size = None
+        self._resize(1)
+
+    def _resize(self, n):
+        # The exported graph has a fixed batch of 1; grow it to the face count
+        index = self.interpreter.get_input_details()[0]['index']
+        self.interpreter.resize_tensor_input(index, [n, IMG_SIZE[0], IMG_SIZE[1], 1])
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size = n
+
+    def predict(self, batch):
+        if len(batch) != self.batch_size:
+            self._resize(len(batch))
+
+        x = np.asarray(batch, dtype=np.float32)
+        scale, zero_point = self.input['quantization']
+        if self.input['dtype'] in (np.int8, np.uint8):
+            info = np.iinfo(self.input['dtype'])
+            x = np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(self.input['dtype'])
+        self.interpreter.set_tensor(self.input['index'], x)
+        self.interpreter.invoke()
+
+        out = self.interpreter.get_tensor(self.output['index'])
+        scale, zero_point = self.output['quantization']
+        if self.output['dtype'] in (np.int8, np.uint8):
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+
+# Lossless float32 .tflite copy of a Keras model: loads in milliseconds
+# without importing TensorFlow (given ai_edge_litert or tflite_runtime), and
+# computes the same function as the .h5, unlike the float16/int8 exports.
+def fast_load_path(model_path):
+    return os.path.splitext(model_path)[0] + '_float32.tflite'
+
+
+# The copy is valid for the .h5 whose size and mtime are recorded in
+# <copy>.key; an mtime alone misses a model copied in with its old timestamp.
+def model_key(model_path):
+    st = os.stat(model_path)
+    return f"{st.st_size} {st.st_mtime_ns}"
+
+
+def fast_load_current(model_path, path):
+    try:
+        with open(path + '.key') as f:
+            return f.read().strip() == model_key(model_path) and os.path.exists(path)
+    except FileNotFoundError:
+        return False
+
+
+def export_fast_load(keras_model, path, key):
+    import tensorflow as tf
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(tf.lite.TFLiteConverter.from_keras_model(keras_model).convert())
+    os.replace(tmp, path)
+    # Written last, so an interrupted export never leaves a copy marked current
+    with open(tmp, 'w') as f:
+        f.write(key + '\n')
+    os.replace(tmp, path + '.key')
+
+
+def _export_quietly(keras_model, path, key):
+    try:
+        export_fast_load(keras_model, path, key)
+    except Exception as e:
+        print(f"Could not write fast-load model {path}: {e}")
+
+
+# Write a Keras backend's fast-load copy in the background, if load_backend
+# left one pending. Called once the first decision is out (model_eval's
+# record_first_decision, the supervisor's detector), so the conversion does
+# not compete with start-up inference. Every entry point that loads a
+# backend with fast=True must call it.
+def export_pending(backend):
+    pending = getattr(backend, 'pending_export', None)
+    if pending:
+        backend.pending_export = None
+        threading.Thread(target=_export_quietly, args=(backend.model, *pending), daemon=True).start()
+
+
+def load_backend(name, model_path=None, fast=False):
+    model_path = model_path or MODEL_PATHS[name]
+    if name == 'keras':
+        if fast:
+            cache = fast_load_path(model_path)
+            if fast_load_current(model_path, cache):
+                return TFLiteBackend(cache)
+            key = model_key(model_path)  # of the file about to be loaded
+            backend = KerasBackend(model_path)
+            # Convert once (export_pending); the next start loads the copy
+            backend.pending_export = (cache, key)
+            return backend
+        return KerasBackend(model_path)
+    if name in ('tflite-float', 'tflite-int8'):
+        return TFLiteBackend(model_path)
+    raise ValueError(f"Unknown inference backend: {name}")
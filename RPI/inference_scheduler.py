@@ -0,0 +1,114 @@
+import time
+import cv2
+import numpy as np
+
+# Constants
+THUMB_SIZE = (64, 36)        # frames are compared at this size (width, height)
+PIXEL_DELTA = 12             # grey levels a thumbnail pixel must change by to count
+MOTION_FRACTION = 0.01       # share of changed pixels that counts as motion
+ALERT_INTERVAL = 0.0         # motion or heat: infer on every frame
+OCCUPIED_INTERVAL = 10.0     # someone present but still: re-check at least this often
+EMPTY_INTERVAL = 30.0        # empty cabin: low-power duty cycle
+EMPTY_AFTER = 60.0           # no face for this long counts as an empty cabin
+ALERT_HOLD = 15.0            # stay in alert mode this long after the last motion
+RISE_ALERT = 0.5             # °C/min temperature rise that switches to alert mode
+RISE_WINDOW = 300            # seconds the rise rate is measured over
+TEMP_ALERT = 40.0            # or an absolute cabin temperature
+
+
+class InferenceScheduler:
+    """
+    Decides per frame whether the Haar scan + CNN should run.
+
+    Each frame is shrunk to a small grey thumbnail and compared with the one
+    from the last inference, so a static cabin is skipped for the cost of a
+    resize. Motion or a rising temperature switches to alert mode (every
+    frame); with nobody seen for EMPTY_AFTER seconds the scheduler drops to
+    one inference every EMPTY_INTERVAL. A static but occupied cabin is still
+    re-checked every OCCUPIED_INTERVAL so a sleeping passenger is not lost.
+    """
+
+    def __init__(self, alert_interval=ALERT_INTERVAL, occupied_interval=OCCUPIED_INTERVAL,
+                 empty_interval=EMPTY_INTERVAL, empty_after=EMPTY_AFTER, alert_hold=ALERT_HOLD):
+        self.intervals = {'alert': alert_interval, 'occupied': occupied_interval, 'empty': empty_interval}
+        self.empty_after = empty_after
+        self.alert_hold = alert_hold
+        self.reference = None       # thumbnail at the last inference
+        self.last_inference = None
+        self.last_face = None
+        self.alert_until = 0.0
+        self.heat_alert = False
+        self.started = None
+
+        self.frames = 0
+        self.inferred = 0
+        self.reasons = {}
+        self.inference_cpu = []     # process CPU seconds per inference
+        self.max_gap = 0.0          # longest time between inferences (worst-case detection delay)
+
+    def _thumbnail(self, frame):
+        small = cv2.resize(frame, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        return small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def update_temperature(self, temperature=None, rise_rate=None):
+        self.heat_alert = ((temperature is not None and temperature >= TEMP_ALERT)
+                           or (rise_rate is not None and rise_rate >= RISE_ALERT))
+
+    def mode(self, now):
+        if self.heat_alert or now < self.alert_until:
+            return 'alert'
+        seen = self.last_face if self.last_face is not None else self.started
+        if now - seen >= self.empty_after:
+            return 'empty'
+        return 'occupied'
+
+    def should_infer(self, frame, now=None):
+        """Return (run, reason) for this frame."""
+        now = time.monotonic() if now is None else now
+        if self.started is None:
+            self.started = now
+        self.frames += 1
+        thumb = self._thumbnail(frame)
+
+        if self.reference is None:
+            reason = 'first'
+        else:
+            changed = np.count_nonzero(cv2.absdiff(thumb, self.reference) > PIXEL_DELTA)
+            if changed >= MOTION_FRACTION * thumb.size:
+                self.alert_until = now + self.alert_hold
+                reason = 'motion'
+            else:
+                mode = self.mode(now)
+                reason = mode if now - self.last_inference >= self.intervals[mode] else None
+
+        if reason is None:
+            return False, 'static'
+        self.reference = thumb
+        if self.last_inference is not None:
+            self.max_gap = max(self.max_gap, now - self.last_inference)
+        self.last_inference = now
+        self.inferred += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return True, reason
+
+    def record(self, faces_found, cpu_seconds=None, now=None):
+        # Report the outcome of an inference the scheduler allowed
+        now = time.monotonic() if now is None else now
+        if faces_found:
+            self.last_face = now
+        if cpu_seconds is not None:
+            self.inference_cpu.append(cpu_seconds)
+
+    def stats(self):
+        skipped = self.frames - self.inferred
+        per_inference = float(np.mean(self.inference_cpu)) if self.inference_cpu else 0.0
+        return {'frames': self.frames, 'inferred': self.inferred, 'skipped': skipped,
+                'skip_ratio': skipped / self.frames if self.frames else 0.0,
+                'cpu_saved_s': skipped * per_inference, 'max_gap_s': self.max_gap,
+                'reasons': dict(self.reasons)}
+
+    def report(self):
+        s = self.stats()
+        print(f"[{time.ctime()}] scheduler: {s['inferred']}/{s['frames']} frames inferred "
+              f"(skip ratio {s['skip_ratio']:.0%}), ~{s['cpu_saved_s']:.1f} s CPU saved, "
+              f"worst-case delay {s['max_gap_s']:.1f} s, {s['reasons']}")
@@ -0,0 +1,318 @@
+import json
+import os
+import threading
+import time
+import zlib
+from bisect import bisect_left
+import numpy as np
+
+# Constants
+ENABLED = os.environ.get('CARTAKER_METRICS', '0') == '1'  # read once, when the metrics are created
+PREFIX = 'cartaker_'
+HOST = '127.0.0.1'             # the endpoint is for a local Prometheus / curl only
+PORTS = {'supervisor': 9100, 'cam_qual': 9101, 'model_eval': 9102, 'temp_record': 9103}
+LOG_INTERVAL = 10.0            # seconds between snapshots in the binary log
+LOG_MAX_BYTES = 4 * 1024 * 1024
+LOG_BACKUPS = 3                # metrics_<job>.bin.1 .. .3
+# Latency histogram buckets in seconds (upper bounds; +Inf is implied)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Sysfs files behind the system gauges
+SOC_TEMP_PATH = '/sys/class/thermal/thermal_zone0/temp'
+CPU_FREQ_PATH = '/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq'
+THROTTLED_PATH = '/sys/devices/platform/soc/soc:firmware/get_throttled'
+
+# One fixed-width record per metric per snapshot; `metric` is the CRC32 of the
+# name, resolved through the <log>.names sidecar (see read_log)
+RECORD = np.dtype([('t', '<f8'), ('metric', '<u4'), ('value', '<f8'), ('count', '<u8'),
+                   ('buckets', '<u8', (len(BUCKETS) + 1,))])
+
+
+# Hot-path instruments. When metrics are disabled every constructor returns
+# _NULL, whose methods do nothing, so call sites stay unconditional.
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help=''):
+        self.name, self.help = name, help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+class Gauge:
+    """Set from the hot path, or computed by `fn` only when scraped or logged."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help='', fn=None):
+        self.name, self.help = name, help
+        self.fn = fn
+        self.value = float('nan')
+
+    def set(self, value):
+        self.value = value
+
+    def read(self):
+        if self.fn is not None:
+            try:
+                self.value = self.fn()
+            except (OSError, ValueError):
+                self.value = float('nan')
+        return self.value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help='', buckets=BUCKETS):
+        if len(buckets) > len(BUCKETS):
+            raise ValueError(f"At most {len(BUCKETS)} buckets fit a log record")
+        self.name, self.help = name, help
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Timer(Histogram):
+    """
+    Histogram of durations in seconds: `with timer:` or start()/stop().
+
+    The context form keeps its start time on the instance, so one timer must
+    not be entered from two threads at once; give each stage its own.
+    """
+
+    def start(self):
+        return time.perf_counter()
+
+    def stop(self, start):
+        self.observe(time.perf_counter() - start)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.observe(time.perf_counter() - self._start)
+
+
+class _Null:
+    value = float('nan')
+
+    def inc(self, n=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def start(self):
+        return 0.0
+
+    def stop(self, start):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL = _Null()
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _get(cls, name, *args, **kwargs):
+    if not ENABLED:
+        return _NULL
+    name = PREFIX + name
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = cls(name, *args, **kwargs)
+        return _registry[name]
+
+
+def counter(name, help=''):
+    return _get(Counter, name, help)
+
+
+def gauge(name, help='', fn=None):
+    return _get(Gauge, name, help, fn)
+
+
+def histogram(name, help='', buckets=BUCKETS):
+    return _get(Histogram, name, help, buckets)
+
+
+def timer(name, help=''):
+    return _get(Timer, name, help)
+
+
+# ── system gauges ────────────────────────────────────────────────────────────
+def _read_number(path):
+    with open(path) as f:
+        return float(int(f.read().strip(), 0))
+
+
+def system_gauges():
+    gauge('soc_temperature_celsius', "SoC temperature", lambda: _read_number(SOC_TEMP_PATH) / 1000)
+    gauge('cpu_frequency_hertz', "Current frequency of CPU 0", lambda: _read_number(CPU_FREQ_PATH) * 1000)
+    # Firmware throttling flags (bit 2: currently throttled, bit 18: has been throttled)
+    gauge('throttled_flags', "Raspberry Pi firmware get_throttled bits", lambda: _read_number(THROTTLED_PATH))
+
+
+# ── exposition ───────────────────────────────────────────────────────────────
+def _format(value):
+    if value != value:
+        return 'NaN'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for m in metrics:
+        lines.append(f"# HELP {m.name} {m.help or m.name}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        if m.kind == 'histogram':
+            counts, total = m.snapshot()
+            cumulative = 0
+            for bound, n in zip(list(m.buckets) + ['+Inf'], counts):
+                cumulative += n
+                lines.append(f'{m.name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{m.name}_sum {_format(total)}")
+            lines.append(f"{m.name}_count {cumulative}")
+        elif m.kind == 'gauge':
+            lines.append(f"{m.name} {_format(m.read())}")
+        else:
+            lines.append(f"{m.name} {_format(m.value)}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port, host=HOST):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # one line per scrape would drown the scripts' own output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+class BinaryLog:
+    """Periodic snapshots of every metric as RECORD rows, rotated by size."""
+
+    def __init__(self, path, interval=LOG_INTERVAL, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.known = set()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='metrics-log', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            self.write_snapshot()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def write_snapshot(self, now=None):
+        now = time.time() if now is None else now
+        with _registry_lock:
+            metrics = list(_registry.values())
+        records = np.zeros(len(metrics), dtype=RECORD)
+        new_names = []
+        for record, m in zip(records, metrics):
+            record['t'] = now
+            record['metric'] = zlib.crc32(m.name.encode())
+            if m.kind == 'histogram':
+                counts, total = m.snapshot()
+                record['value'], record['count'] = total, sum(counts)
+                record['buckets'][:len(counts)] = counts
+            else:
+                record['value'] = m.read() if m.kind == 'gauge' else m.value
+            if m.name not in self.known:
+                new_names.append({'id': int(record['metric']), 'name': m.name, 'kind': m.kind})
+                self.known.add(m.name)
+        if new_names:
+            with open(self.path + '.names', 'a') as f:
+                f.writelines(json.dumps(n) + "\n" for n in new_names)
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        with open(self.path, 'ab') as f:
+            f.write(records.tobytes())
+
+    def close(self):
+        self.stopping.set()
+        self.thread.join(timeout=1)
+        self.write_snapshot()
+
+
+def read_log(path):
+    """Load a metrics log and its name table; a torn last record is ignored."""
+    size = os.path.getsize(path) // RECORD.itemsize * RECORD.itemsize
+    with open(path, 'rb') as f:
+        records = np.frombuffer(f.read(size), dtype=RECORD)
+    names = {}
+    names_path = path.split('.bin')[0] + '.bin.names'
+    if os.path.exists(names_path):
+        with open(names_path) as f:
+            for line in f:
+                entry = json.loads(line)
+                names[entry['id']] = entry['name']
+    return records, names
+
+
+def start(job, port=None, log_path=None):
+    """Serve /metrics and start the binary log for one script; no-op when disabled."""
+    if not ENABLED:
+        return None
+    system_gauges()
+    port = int(os.environ.get('CARTAKER_METRICS_PORT', port or PORTS[job]))
+    serve(port)
+    log = BinaryLog(log_path or f"metrics_{job}.bin").start()
+    print(f"[{time.ctime()}] metrics on http://{HOST}:{port}/metrics, log {log.path}")
+    return log
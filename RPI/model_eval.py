@@ -1,19 +1,95 @@
-import cv2
-import numpy as np
 import os
 import time
-from tensorflow.keras.models import load_model
-import tensorflow as tf
+from concurrent.futures import ThreadPoolExecutor
+from startup import StartupTimeline
+
+timeline = StartupTimeline()  # printed and logged at the first decision
+with timeline.stage('import cv2 + modules'):
+    import cv2
+    import numpy as np
+    import metrics
+    from frame_ring import FrameRing, RING_NAME
+    from inference_backends import load_backend, export_pending
+    from face_tracker import FaceTracker
+    from status_bus import StatusBus
+    from file_watcher import open_watcher
+    from inference_scheduler import InferenceScheduler, RISE_WINDOW
+    from sensor_history import LogFollower
 
 # Constants
 IMG_SIZE = (48, 48)
-MODEL_PATH = '/home/thala/model1.h5'
+# Backend and model can be overridden from the environment (used by the benchmarks)
+BACKEND = os.environ.get('CARTAKER_BACKEND', 'keras')  # 'keras' (model1.h5), 'tflite-float' or 'tflite-int8'
+MODEL_PATH = os.environ.get('CARTAKER_MODEL')  # None uses the backend's default file, see inference_backends.MODEL_PATHS
 IMAGE_PATH = '/home/thala/high_quality_image.jpg'  # Hardcoded path to the image
+HANDOFF = 'ring'  # 'ring' reads frames from cam_qual.py's shared memory, 'file' watches IMAGE_PATH
+DETECTION = 'multires'  # 'full' scans every frame at full resolution, 'multires' downscales and tracks
+DETECT_WIDTH = 1152  # Haar scans a copy at most this wide: a 4608x2592 still at 1/4, a dual-stream luma frame as is
+RESCAN_INTERVAL = 10  # frames between full Haar scans while faces are tracked
+SCHEDULING = 'adaptive'  # 'adaptive' skips static frames (inference_scheduler.py), 'fixed' runs on every frame
+REPORT_EVERY = 100  # frames between scheduler reports
+SENSOR_LOG = 'sensor_history.bin'  # temp_record.py's log; its temperature switches the scheduler to alert mode
+SENSOR_POLL = 5.0  # seconds between reads of SENSOR_LOG (temp_record.py flushes it once a minute)
+SENSOR_STALE = 180  # seconds after which the last logged reading no longer counts
+STATUS_OUTPUT = ('bus', 'file')  # 'bus' publishes every result (status_bus.py), 'file' keeps face.status for master.sh
+STARTUP = os.environ.get('CARTAKER_STARTUP', 'parallel')  # 'parallel' loads model and cascade concurrently, 'sequential' in turn
+FAST_LOAD = os.environ.get('CARTAKER_FAST_LOAD', '1') == '1'  # keep a float32 .tflite copy of the Keras model, loaded without TensorFlow on later starts
+WARMUP = True  # run one dummy inference at start-up so the first real frame isn't slow
 LABELS = ['Angry', 'Disgust', 'Fear', 'Happy', 'Neutral', 'Sad', 'Surprise']
 
-# Load model and face detector
-model = load_model(MODEL_PATH)
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+# Instrumentation (metrics.py; no-ops unless CARTAKER_METRICS=1)
+DETECT_TIME = metrics.timer('detect_seconds', "Face detection per frame")
+CLASSIFY_TIME = metrics.timer('classify_seconds', "Emotion classification per batch")
+CAPTURE_TO_PREDICTION = metrics.histogram('capture_to_prediction_seconds', "Frame timestamp to published result")
+FRAMES = metrics.counter('frames_processed_total', "Frames run through detection")
+SKIPPED = metrics.counter('frames_skipped_total', "Frames skipped by the inference scheduler")
+DROPPED = metrics.counter('frames_dropped_total', "Ring frames overwritten before they were read")
+FACES = metrics.counter('faces_classified_total', "Face crops classified")
+
+# Load model (TensorFlow is imported here, if at all) and face detector
+def load_model():
+    with timeline.stage(f'load model ({BACKEND})'):
+        return load_backend(BACKEND, MODEL_PATH, fast=FAST_LOAD)
+
+def load_cascade():
+    with timeline.stage('load Haar cascade'):
+        return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+if STARTUP == 'parallel':
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='load') as pool:
+        model_future = pool.submit(load_model)
+        face_cascade = load_cascade()
+        backend = model_future.result()
+else:
+    backend = load_model()
+    face_cascade = load_cascade()
+tracker = FaceTracker(face_cascade, scale=1.0, rescan_interval=RESCAN_INTERVAL)
+scheduler = InferenceScheduler() if SCHEDULING == 'adaptive' else None
+sensors = LogFollower(SENSOR_LOG) if scheduler is not None else None
+last_sensor_poll = None
+
+status_bus = None  # created on first publish
+last_face_status = None
+first_decision = None  # seconds from process start to the first published result
+
+# Publish face presence for master.sh
+def write_status(value):
+    with open("face.status", "w") as f:
+        f.write(f"{value}\n")
+
+# Publish a frame's (box, emotion, confidence) results to subscribers
+def publish_status(results, timestamp=None):
+    global status_bus, last_face_status
+    if 'bus' in STATUS_OUTPUT:
+        if status_bus is None:
+            status_bus = StatusBus.create()
+        status_bus.publish(results, timestamp)
+    if 'file' in STATUS_OUTPUT:
+        # master.sh only needs 0/1, so rewrite the file only when it changes
+        value = int(bool(results))
+        if value != last_face_status:
+            write_status(value)
+            last_face_status = value
 
 # Preprocess the face
 def preprocess_face(face):
@@ -22,35 +98,73 @@ def preprocess_face(face):
     face = face.reshape(1, IMG_SIZE[0], IMG_SIZE[1], 1)
     return face
 
-# Run prediction
+# Preprocess every face box of a grayscale frame into one (N,48,48,1) batch
+def preprocess_faces(gray, faces):
+    batch = np.empty((len(faces), IMG_SIZE[1], IMG_SIZE[0]), dtype=np.uint8)
+    for i, (x, y, w, h) in enumerate(faces):
+        batch[i] = cv2.resize(gray[y:y+h, x:x+w], IMG_SIZE)
+    # Normalize once for the whole batch, in float32 rather than float64
+    return np.multiply(batch, np.float32(1 / 255.0))[..., np.newaxis]
+
+# Classify a preprocessed batch in one forward pass
+def classify_batch(batch):
+    if len(batch) == 0:
+        return np.empty((0, len(LABELS)), dtype=np.float32)
+    FACES.inc(len(batch))
+    with CLASSIFY_TIME:
+        return backend.predict(batch)
+
+# Detect and classify faces across several frames with a single forward pass.
+# Returns one list of (box, emotion, confidence) per frame.
+def classify_frames(grays, faces_per_frame):
+    batches = [preprocess_faces(gray, faces) for gray, faces in zip(grays, faces_per_frame) if len(faces)]
+    predictions = classify_batch(np.concatenate(batches)) if batches else classify_batch([])
+    results, start = [], 0
+    for faces in faces_per_frame:
+        preds = predictions[start:start + len(faces)]
+        start += len(faces)
+        indices = np.argmax(preds, axis=1)
+        results.append([(tuple(box), LABELS[i], float(p[i])) for box, i, p in zip(faces, indices, preds)])
+    return results
+
+# Find faces in a grayscale frame, returning full-resolution boxes
+def detect_faces(gray):
+    with DETECT_TIME:
+        return _detect_faces(gray)
+
+def _detect_faces(gray):
+    if DETECTION == 'multires':
+        scale = min(1.0, DETECT_WIDTH / gray.shape[1])
+        if scale != tracker.scale:  # first frame, or the frame size changed
+            tracker.reset()
+            tracker.scale = scale
+        return tracker.detect(gray)
+    return face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+
+# Run prediction on an image file
 def predict_emotion(image_path):
     image = cv2.imread(image_path)
     if image is None:
         print(f"[{time.ctime()}] Error: Couldn't load image: {image_path}")
-        with open("face.status","w") as f:
-        	f.write("0\n")
+        publish_status([])
         return "Image not found"
+    return predict_emotion_frame(image)
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+# Run prediction on a BGR (or already grayscale) frame
+def predict_emotion_frame(image, timestamp=None):
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    FRAMES.inc()
+    faces = detect_faces(gray)
 
     if len(faces) == 0:
         print(f"[{time.ctime()}] No face detected.")
-        with open("face.status","w") as f:
-        	f.write("0\n")
+        publish_status([], timestamp)
         return "No face detected"
 
     print(f"[{time.ctime()}] Face detected.")
-    with open("face.status","w") as f:
-        	f.write("1\n")
-    for (x, y, w, h) in faces:
-        face = gray[y:y+h, x:x+w]
-        face_input = preprocess_face(face)
-        predictions = model.predict(face_input, verbose=0)
-        predicted_index = np.argmax(predictions)
-        emotion = LABELS[predicted_index]
-        confidence = predictions[0][predicted_index]
-
+    results = classify_frames([gray], [faces])[0]
+    publish_status(results, timestamp)
+    for (x, y, w, h), emotion, confidence in results:
         print(f"Detected Emotion: {emotion} ({confidence:.2f} confidence)")
 
         # Draw box and label on original image (optional display)
@@ -64,25 +178,119 @@ def predict_emotion(image_path):
 
     return "Face detected"
 
-# Monitor image for changes
-def watch_image(image_path, check_interval=2):
-    print("Watching for changes in:", image_path)
-    last_modified = None
-
-    while True:
-        try:
-            if os.path.exists(image_path):
-                current_modified = os.path.getmtime(image_path)
-                if last_modified is None or current_modified != last_modified:
-                    print("\n--- Change Detected ---")
-                    last_modified = current_modified
-                    predict_emotion(image_path)
-            else:
-                print(f"[{time.ctime()}] File not found: {image_path}")
-        except Exception as e:
-            print(f"[{time.ctime()}] Error: {e}")
-
-        time.sleep(check_interval)  # Check every N seconds
+# Pass the cabin temperature and its rise rate to the scheduler. Under the
+# supervisor it gets them directly; run from master.sh, they come from the
+# log temp_record.py writes alongside.
+def update_scheduler_temperature():
+    global last_sensor_poll
+    now = time.monotonic()
+    if last_sensor_poll is not None and now - last_sensor_poll < SENSOR_POLL:
+        return
+    last_sensor_poll = now
+    try:
+        sensors.poll()
+    except FileNotFoundError:
+        return
+    latest = sensors.history.latest()
+    if latest is None or time.time() - latest['t'] > SENSOR_STALE:
+        scheduler.update_temperature()  # temp_record.py stopped: no heat alert from stale readings
+        return
+    temperature = None if np.isnan(latest['temperature']) else float(latest['temperature'])
+    scheduler.update_temperature(temperature, sensors.history.temperature_rise_rate(RISE_WINDOW))
+
+# Run prediction on a frame unless the scheduler decides it can be skipped
+def scheduled_predict(image, timestamp=None):
+    if scheduler is None:
+        result = predict_emotion_frame(image, timestamp)
+        record_first_decision()
+        return result
+    update_scheduler_temperature()
+    run, _ = scheduler.should_infer(image)
+    if scheduler.frames % REPORT_EVERY == 0:
+        scheduler.report()
+    if not run:
+        SKIPPED.inc()
+        return "Skipped"
+    cpu = time.process_time()
+    result = predict_emotion_frame(image, timestamp)
+    scheduler.record(result == "Face detected", time.process_time() - cpu)
+    record_first_decision()
+    return result
+
+# Log the startup timeline once the first decision has been published
+def record_first_decision():
+    global first_decision
+    if first_decision is None:
+        first_decision = timeline.mark('first decision')
+        timeline.report()
+        timeline.save(backend=BACKEND, startup=STARTUP, fast_load=FAST_LOAD, first_decision=round(first_decision, 3))
+        export_pending(backend)
+
+# Monitor one or more image files (or frame directories) for finished writes.
+# Uses inotify where available; check_interval only applies to the polling fallback.
+def watch_image(image_paths, check_interval=2):
+    print("Watching for changes in:", image_paths)
+    watcher = open_watcher(image_paths, poll_interval=check_interval)
+
+    try:
+        while True:
+            try:
+                # Only the newest frame per input is returned, so bursts are coalesced
+                for path in watcher.wait().values():
+                    image = cv2.imread(path)
+                    if image is None:
+                        print(f"[{time.ctime()}] Error: Couldn't load image: {path}")
+                        continue
+                    scheduled_predict(image)
+            except Exception as e:
+                print(f"[{time.ctime()}] Error: {e}")
+    finally:
+        watcher.close()
+
+# Consume frames from the camera's shared-memory ring
+def watch_ring(name=RING_NAME):
+    print("Waiting for frames in shared memory:", name)
+    ring = FrameRing.attach(name)
+    frame = None
+    last_seq = 0
+    generation = ring.generation
+
+    try:
+        while True:
+            try:
+                seq, timestamp, frame = ring.wait(after=last_seq, out=frame)
+                if ring.generation != generation:
+                    # cam_qual.py restarted: its new ring counts from 1 again
+                    generation, last_seq = ring.generation, 0
+                if seq > last_seq + 1 and last_seq:
+                    DROPPED.inc(seq - last_seq - 1)
+                    print(f"[{time.ctime()}] Skipped {seq - last_seq - 1} stale frame(s)")
+                last_seq = seq
+                if scheduled_predict(frame, timestamp) == "Skipped":
+                    continue
+                latency = time.time() - timestamp
+                CAPTURE_TO_PREDICTION.observe(latency)
+                print(f"Capture-to-prediction: {latency * 1000:.0f} ms")
+            except Exception as e:
+                print(f"[{time.ctime()}] Error: {e}")
+    finally:
+        ring.close()
+
+# Compile the model's graph and the cascade's buffers before the first real frame
+def warm_up():
+    with timeline.stage('warm-up'):
+        # Straight to the backend: a dummy face must not show up in the metrics
+        backend.predict(np.zeros((1, IMG_SIZE[1], IMG_SIZE[0], 1), dtype=np.float32))
+        face_cascade.detectMultiScale(np.zeros((240, 320), dtype=np.uint8))
+
+if WARMUP:
+    warm_up()
+timeline.mark('ready')
 
 # Start watching
-watch_image(IMAGE_PATH, check_interval=2)
+if __name__ == "__main__":
+    metrics.start('model_eval')
+    if HANDOFF == 'ring':
+        watch_ring()
+    else:
+        watch_image(IMAGE_PATH, check_interval=2)
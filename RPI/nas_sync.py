@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Constants
+LOCAL_DIR = "/home/thala/Videos"
+NAS_DIR = "/mnt/File_share"
+MANIFEST_FILE = "/home/thala/.nas_sync_manifest.json"
+SEGMENT_INDEX = "segments.json"      # written by segment_recorder.py; marks pinned footage
+CHUNK_SIZE = 4 * 1024 * 1024
+MAX_TRANSFERS = 2
+BANDWIDTH_LIMIT = 2 * 1024 * 1024    # bytes/s across all transfers (None for no cap)
+SETTLE_SECONDS = 120                 # files modified more recently may still be recording
+SYNC_INTERVAL = 60
+EXTENSIONS = ('.h264', '.mp4', '.mkv', '.enc')
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+class TokenBucket:
+    """Shared bandwidth cap; take() blocks until `n` bytes may be sent."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, n):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= n or self.tokens >= self.rate:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class LocalDirDestination:
+    """
+    A directory as upload target: the SMB mount on the Pi, or any local
+    directory in tests. Partial uploads live in <name>.part so a transfer
+    can resume from however many bytes actually arrived.
+    """
+
+    def __init__(self, root, require_mount=False):
+        self.root = root
+        self.require_mount = require_mount
+
+    def available(self):
+        if self.require_mount:
+            return os.path.ismount(self.root)
+        return os.path.isdir(self.root)
+
+    def _path(self, name, partial=False):
+        return os.path.join(self.root, name + (".part" if partial else ""))
+
+    def uploaded_bytes(self, name):
+        try:
+            return os.path.getsize(self._path(name, partial=True))
+        except FileNotFoundError:
+            return 0
+
+    def write(self, name, offset, data):
+        path = self._path(name, partial=True)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+    def finalize(self, name):
+        os.replace(self._path(name, partial=True), self._path(name))
+
+    def sha256(self, name):
+        path = self._path(name)
+        return file_sha256(path) if os.path.exists(path) else None
+
+
+class SyncEngine:
+    """
+    Incremental, resumable upload of recorded footage.
+
+    A persistent manifest remembers every file's size, mtime, content hash
+    and state (pending -> verified), so a pass only hashes new or changed
+    files. Uploads go in chunks that resume after a dropped link, run
+    concurrently under a shared bandwidth cap, and pinned (event) segments
+    go first. Local files are deleted only once the remote hash matches.
+    """
+
+    def __init__(self, local_dir=LOCAL_DIR, destination=None, manifest_path=MANIFEST_FILE,
+                 max_transfers=MAX_TRANSFERS, bandwidth=BANDWIDTH_LIMIT, settle_seconds=SETTLE_SECONDS,
+                 delete_after_verify=True):
+        self.local_dir = local_dir
+        self.destination = destination or LocalDirDestination(NAS_DIR, require_mount=True)
+        self.manifest_path = manifest_path
+        self.max_transfers = max_transfers
+        self.bucket = TokenBucket(bandwidth)
+        self.settle_seconds = settle_seconds
+        self.delete_after_verify = delete_after_verify
+        self.lock = threading.Lock()
+        self.manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def save_manifest(self):
+        with self.lock:
+            tmp = self.manifest_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.manifest, f)
+            os.replace(tmp, self.manifest_path)
+
+    def _pinned_files(self):
+        try:
+            with open(os.path.join(self.local_dir, SEGMENT_INDEX)) as f:
+                return {s['file'] for s in json.load(f) if s.get('pinned')}
+        except (FileNotFoundError, ValueError):
+            return set()
+
+    def scan(self):
+        """Update the manifest from the directory; only new or changed files are hashed."""
+        now = time.time()
+        pinned = self._pinned_files()
+        seen = set()
+        for entry in os.scandir(self.local_dir):
+            if not entry.is_file() or not entry.name.endswith(EXTENSIONS):
+                continue
+            st = entry.stat()
+            if now - st.st_mtime < self.settle_seconds:
+                continue  # still being written
+            seen.add(entry.name)
+            record = self.manifest.get(entry.name)
+            if record is None or record['size'] != st.st_size or record['mtime'] != st.st_mtime:
+                record = {'size': st.st_size, 'mtime': st.st_mtime, 'sha256': file_sha256(entry.path),
+                          'state': 'pending'}
+                self.manifest[entry.name] = record
+            record['pinned'] = entry.name in pinned
+
+        # Forget files that are gone locally (uploaded and deleted, or evicted by the recorder's quota)
+        for name in list(self.manifest):
+            if name not in seen and not os.path.exists(os.path.join(self.local_dir, name)):
+                del self.manifest[name]
+        self.save_manifest()
+
+    def queue(self):
+        pending = [(name, r) for name, r in self.manifest.items() if r['state'] != 'verified']
+        return sorted(pending, key=lambda item: (not item[1].get('pinned'), item[1]['mtime']))
+
+    def upload(self, name, record):
+        path = os.path.join(self.local_dir, name)
+        offset = self.destination.uploaded_bytes(name)
+        if offset > record['size']:
+            offset = 0  # stale partial from an older version of the file
+        if offset:
+            print(f"[{time.ctime()}] Resuming {name} at {offset / 1e6:.1f} MB")
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while offset < record['size']:
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    break
+                self.bucket.take(len(data))
+                self.destination.write(name, offset, data)
+                offset += len(data)
+        self.destination.finalize(name)
+
+        # Verify the remote copy before touching the local one
+        if self.destination.sha256(name) != record['sha256']:
+            print(f"[{time.ctime()}] ERROR: Verification failed for {name}. Keeping it for next attempt.")
+            with self.lock:
+                record['state'] = 'pending'
+            return False
+        with self.lock:
+            record['state'] = 'verified'
+        if self.delete_after_verify:
+            os.remove(path)
+        print(f"[{time.ctime()}] Successfully uploaded {name}")
+        return True
+
+    def _upload_safe(self, item):
+        name, record = item
+        try:
+            return self.upload(name, record)
+        except OSError as e:
+            print(f"[{time.ctime()}] ERROR: Failed to upload {name}: {e}. Will resume next pass.")
+            return False
+        finally:
+            self.save_manifest()
+
+    def sync_once(self):
+        if not self.destination.available():
+            print(f"[{time.ctime()}] NAS not available. Will retry later...")
+            return 0
+        self.scan()
+        queue = self.queue()
+        if not queue:
+            return 0
+        print(f"[{time.ctime()}] Syncing {len(queue)} file(s)...")
+        with ThreadPoolExecutor(max_workers=self.max_transfers) as pool:
+            return sum(pool.map(self._upload_safe, queue))
+
+    def run(self, interval=SYNC_INTERVAL):
+        while True:
+            self.sync_once()
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    SyncEngine().run()
@@ -1,13 +1,34 @@
 #!/usr/bin/env python3
 import os
+import sys
 import subprocess
 import time
 from datetime import datetime
+from segment_recorder import SegmentRecorder, libcamera_command, synthetic_command
+from segment_crypto import encrypted_libcamera_command, encrypted_synthetic_command
 
 # Define video folder
 video_folder = "/home/thala/Videos"
 os.makedirs(video_folder, exist_ok=True)
 
+# 'segmented' rolls fixed-length segments under a disk quota (see segment_recorder.py);
+# 'single' writes one unbounded file as before
+MODE = 'segmented'
+# Segmented footage is encrypted as it is recorded (segment_crypto.py); run
+# `python3 segment_crypto.py keygen` once and move the private key it writes to the NAS
+ENCRYPT = True
+
+if MODE == 'segmented':
+    # "synthetic" swaps libcamera-vid for a stand-in that writes dummy segments
+    synthetic = len(sys.argv) > 1 and sys.argv[1] == "synthetic"
+    if ENCRYPT:
+        command = encrypted_synthetic_command if synthetic else encrypted_libcamera_command
+        SegmentRecorder(video_folder, command=command, extension='.h264.enc').run()
+    else:
+        command = synthetic_command if synthetic else libcamera_command
+        SegmentRecorder(video_folder, command=command).run()
+    sys.exit(0)
+
 # Generate timestamped filename
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 video_file = f"{video_folder}/surveillance_{timestamp}.mp4"
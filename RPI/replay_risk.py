@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# Replays cabin logs through the risk engine (risk_engine.py) far faster than
+# real time: the whole log is evaluated with array operations (replay()),
+# then the first --check events go through the live path (update()) one at
+# a time. That run checks both paths make the same decisions and measures
+# the decision latency per input event. Logs are the supervisor's
+# cabin_events.bin (and its rotated .1 .. .3), optionally merged with the
+# sensor_history.bin readings they do not already hold, or synthetic
+# scenarios (parked in the sun, occupied, distress, stuffy air).
+#
+#   python3 replay_risk.py --hours 1000                      # synthetic
+#   python3 replay_risk.py cabin_events.bin.1 cabin_events.bin --history sensor_history.bin
+#   python3 replay_risk.py --hours 1000 --save golden.npz    # then, after a rule change:
+#   python3 replay_risk.py --hours 1000 --expect golden.npz  # exits 1 if any decision moved
+import argparse
+import sys
+import time
+import numpy as np
+import risk_engine
+import sensor_history
+from risk_engine import CHANGE, EVENT, SIGNALS, CabinRiskEngine, replay
+
+# Synthetic scenarios
+SEGMENT = 1800            # scenario length (s); conditions ramp linearly between segments
+SENSOR_INTERVAL = 2.0     # DHT22 / MQ135 cadence, as in the supervisor
+FRAME_INTERVAL = 1.0      # face results per second, as master.sh polls face.status
+SENSOR_FAIL_RATE = 0.1    # DHT22 reads that fail and leave a gap
+
+
+def synthetic_events(hours, seed=0):
+    rng = np.random.default_rng(seed)
+    duration = hours * 3600.0
+    knots = np.arange(0.0, duration + SEGMENT, SEGMENT)
+    k = len(knots)
+    occupied = rng.random(k) < 0.35
+    sunny = rng.random(k) < 0.3
+    temperature = rng.uniform(18, 32, k) + sunny * rng.uniform(10, 32, k)
+    humidity = rng.uniform(30, 90, k)
+    co2 = np.where(occupied, rng.uniform(800, 4000, k), rng.uniform(400, 700, k))
+
+    parts = []
+
+    def add(t, signal, value):
+        part = np.zeros(len(t), dtype=EVENT)
+        part['t'], part['signal'], part['value'] = t, SIGNALS.index(signal), value
+        parts.append(part)
+
+    t = np.arange(0.0, duration, SENSOR_INTERVAL)
+    read = rng.random(len(t)) >= SENSOR_FAIL_RATE
+    add(t[read], 'temperature', np.interp(t[read], knots, temperature) + rng.normal(0, 0.3, int(read.sum())))
+    add(t[read], 'humidity', np.clip(np.interp(t[read], knots, humidity) + rng.normal(0, 1.0, int(read.sum())), 0, 100))
+    add(t, 'co2', np.interp(t, knots, co2) + rng.normal(0, 50, len(t)))
+
+    t = np.arange(0.0, duration, FRAME_INTERVAL) + 0.5
+    segment = (t // SEGMENT).astype(int)
+    face = rng.random(len(t)) < np.where(occupied[segment], 0.9, 0.01)  # missed detections, false positives
+    add(t, 'face', face)
+    distress_rate = np.where(sunny[segment] & occupied[segment], 0.7, 0.1)[face]
+    add(t[face], 'distress', rng.random(int(face.sum())) < distress_rate)
+    return risk_engine.merge_events(*parts)
+
+
+def live_changes(events, count):
+    # The first `count` events through update(), as the supervisor feeds them
+    engine = CabinRiskEngine(latency_samples=max(1, count))
+    names = list(engine.decisions)
+    out = []
+    for i, (t, signal, value) in enumerate(events[:count].tolist()):
+        for d in engine.update(t, SIGNALS[signal], value):
+            out.append((d.t, i, names.index(d.name), d.active))
+    return np.array(out, dtype=CHANGE), engine
+
+
+def summary(changes, events, names):
+    span = events['t'][-1] - events['t'][0] if len(events) else 0.0
+    print(f"\n{'decision':<12} {'switched on':>12} {'hours active':>13} {'share':>7}")
+    for d, name in enumerate(names):
+        mine = changes[changes['decision'] == d]
+        # Pair every switch-on with the next switch-off (or the end of the log)
+        on_t = mine['t'][mine['active']]
+        off_t = mine['t'][~mine['active']]
+        off_t = np.concatenate([off_t, [events['t'][-1]] * (len(on_t) - len(off_t))])
+        active_s = float(np.sum(off_t - on_t)) if len(on_t) else 0.0
+        print(f"{name:<12} {len(on_t):>12} {active_s / 3600:>13.1f} {active_s / max(span, 1e-9):>7.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Faster-than-real-time replay of the cabin risk engine')
+    parser.add_argument('logs', nargs='*', help="event logs from the supervisor (cabin_events.bin and its rotations)")
+    parser.add_argument('--history', help="sensor_history.bin from temp_record.py to merge in")
+    parser.add_argument('--hours', type=float, default=100.0, help="synthetic hours when no log is given")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check', type=int, default=200_000, help="events replayed through update() as well")
+    parser.add_argument('--save', help="write the decisions to this .npz")
+    parser.add_argument('--expect', help="compare the decisions with a --save file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.logs or args.history:
+        events = risk_engine.merge_events(*[risk_engine.read_events(p) for p in args.logs],
+                                          np.zeros(0, dtype=EVENT))
+        if args.history:
+            history = risk_engine.events_from_history(sensor_history.read_log(args.history))
+            events = risk_engine.merge_events(events, risk_engine.missing_events(events, history))
+        source = " + ".join(args.logs + ([args.history] if args.history else []))
+    else:
+        events = synthetic_events(args.hours, args.seed)
+        source = f"synthetic, seed {args.seed}"
+    if not len(events):
+        sys.exit(f"No events in {source}")
+    load_s = time.perf_counter() - start
+    span_h = (events['t'][-1] - events['t'][0]) / 3600
+
+    start = time.perf_counter()
+    changes = replay(events)
+    replay_s = time.perf_counter() - start
+    names = list(risk_engine.DECISIONS)
+    print(f"[{time.ctime()}] {len(events):,} events over {span_h:.1f} h ({source}, loaded in {load_s:.1f} s)")
+    print(f"replay: {replay_s:.2f} s, {span_h * 3600 / replay_s:,.0f}x real time, "
+          f"{replay_s / len(events) * 1e6:.2f} µs/event, {len(changes)} decision changes")
+    summary(changes, events, names)
+
+    count = min(args.check, len(events))
+    start = time.perf_counter()
+    live, engine = live_changes(events, count)
+    live_s = time.perf_counter() - start
+    expected = changes[changes['event'] < count]
+    same = np.array_equal(live, expected)
+    s = engine.latency_stats()
+    print(f"\nupdate() on the first {count:,} events: {live_s:.2f} s, "
+          f"{(events['t'][count - 1] - events['t'][0]) / live_s:,.0f}x real time")
+    print(f"decision latency per event: p50 {s['p50'] * 1e6:.1f} µs, p99 {s['p99'] * 1e6:.1f} µs, "
+          f"max {s['max'] * 1e6:.1f} µs")
+    print(f"update() and replay() agree: {same} ({len(live)} vs {len(expected)} changes)")
+
+    failed = not same
+    if args.save:
+        np.savez(args.save, changes=changes, names=np.array(names), events=len(events))
+        print(f"Decisions saved to {args.save}")
+    if args.expect:
+        golden = np.load(args.expect)['changes']
+        if np.array_equal(golden, changes):
+            print(f"Decisions match {args.expect}")
+        else:
+            failed = True
+            n = min(len(golden), len(changes))
+            diff = np.flatnonzero(golden[:n] != changes[:n])
+            first = diff[0] if len(diff) else n
+            print(f"Decisions differ from {args.expect}: {len(golden)} expected, {len(changes)} now, "
+                  f"first difference at change {first}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,331 @@
+import os
+import time
+from collections import namedtuple
+import numpy as np
+import metrics
+
+# Constants
+SIGNALS = ('temperature', 'humidity', 'co2', 'face', 'distress')
+DISTRESS_EMOTIONS = ('Angry', 'Fear', 'Sad')  # model_eval.LABELS that count as distress
+EVENT_LOG = "cabin_events.bin"
+FLUSH_EVERY = 256          # events per disk write
+LOG_MAX_BYTES = 16 * 1024 * 1024  # about a week of supervisor events (17-byte records)
+LOG_BACKUPS = 3            # cabin_events.bin.1 .. .3
+DUPLICATE_WINDOW = 1.0     # s; a sensor_history.bin reading this close to a logged one is the same reading
+LATENCY_SAMPLES = 4096     # most recent per-event latencies kept for report()
+REPLAY_CHUNK = 1 << 20     # events evaluated at a time by replay()
+
+# One fixed-width record per input event; `signal` indexes SIGNALS
+EVENT = np.dtype([('t', '<f8'), ('signal', 'u1'), ('value', '<f8')])
+# One record per decision change from replay(); `decision` indexes the decision names
+CHANGE = np.dtype([('t', '<f8'), ('event', '<i8'), ('decision', 'u1'), ('active', '?')])
+
+# A rule reduces one signal over the last `window` seconds to a value, either
+# 'mean' or 'rise' (mean of the newer half minus mean of the older half, per
+# minute). It switches on once the value has been >= `on` for `delay` seconds
+# and off when it drops to <= `off`; an empty window counts as off.
+Rule = namedtuple('Rule', 'name signal stat window on off delay')
+RULES = (
+    Rule('occupied', 'face', 'mean', 10, 0.8, 0.2, 10),        # a face in most frames, for master.sh's 10 s
+    Rule('heat', 'temperature', 'mean', 10, 50.0, 47.0, 10),   # master.sh's TEMP_LIMIT, for 10 s
+    Rule('heat_rise', 'temperature', 'rise', 300, 0.5, 0.2, 0),  # °C/min, inference_scheduler.RISE_ALERT
+    Rule('warm', 'temperature', 'mean', 60, 35.0, 33.0, 0),
+    Rule('humid', 'humidity', 'mean', 60, 75.0, 70.0, 0),      # with 'warm': heat index above ~50 °C
+    Rule('stuffy', 'co2', 'mean', 60, 2500.0, 1500.0, 30),     # ppm
+    Rule('distress', 'distress', 'mean', 30, 0.6, 0.3, 5),
+)
+# Decisions combine rule states with & and |, so the same expression works on
+# single states (update) and on arrays of states (replay)
+DECISIONS = {
+    'open_window': lambda r: r['occupied'] & (r['heat'] | r['stuffy'] | (r['warm'] & r['humid'])),
+    'alert': lambda r: r['occupied'] & (r['heat'] | r['stuffy'] | r['heat_rise'] | r['distress']),
+}
+
+Decision = namedtuple('Decision', 't name active rules latency')
+
+DECISION_TIME = metrics.timer('decision_seconds', "Risk engine evaluation per input event")
+DECISION_CHANGES = metrics.counter('decision_changes_total', "Actuation and alert decisions switched on or off")
+
+
+# Face and distress events for one inference result, a list of (box, emotion, confidence)
+def detection_events(results):
+    events = [('face', 1.0 if results else 0.0)]
+    if results:
+        events.append(('distress', 1.0 if any(e in DISTRESS_EMOTIONS for _, e, _ in results) else 0.0))
+    return events
+
+
+class _Series:
+    """Recent samples of one signal with running sums; keeps at least the longest window over it."""
+
+    def __init__(self, horizon, capacity=1024):
+        self.horizon = horizon
+        self.t = np.empty(capacity)
+        self.before = np.empty(capacity)  # sum of every earlier sample, so window sums are differences
+        self.size = 0
+        self.total = 0.0
+
+    def add(self, t, value):
+        if self.size == len(self.t):
+            self._compact(t)
+        self.t[self.size] = t
+        self.before[self.size] = self.total
+        self.size += 1
+        self.total += value
+
+    def _compact(self, now):
+        first = int(np.searchsorted(self.t[:self.size], now - self.horizon, 'right'))
+        keep = self.size - first
+        if keep * 2 > len(self.t):
+            self.t = np.concatenate([self.t, np.empty_like(self.t)])
+            self.before = np.concatenate([self.before, np.empty_like(self.before)])
+        self.t[:keep] = self.t[first:self.size]
+        self.before[:keep] = self.before[first:self.size]
+        self.size = keep
+
+    def value(self, rule, now):
+        # Same arithmetic, in the same order, as replay()
+        times = self.t[:self.size]
+        lo = int(np.searchsorted(times, now - rule.window, 'right'))
+        if rule.stat == 'mean':
+            n = self.size - lo
+            return (self.total - self.before[lo]) / n if n else float('nan')
+        mid = int(np.searchsorted(times, now - rule.window / 2, 'right'))
+        older, newer = mid - lo, self.size - mid
+        if not older or not newer:
+            return float('nan')
+        return (((self.total - self.before[mid]) / newer - (self.before[mid] - self.before[lo]) / older)
+                / (rule.window / 2) * 60)
+
+
+class CabinRiskEngine:
+    """
+    Fuses temperature, humidity, CO2, face presence and emotion into
+    actuation ('open_window') and alert decisions.
+
+    Every event appends to its signal's series and re-evaluates all RULES at
+    the event's time; a window is read from running sums with two binary
+    searches, whatever its length. Hysteresis (separate on/off thresholds)
+    and the on-delay keep a reading hovering around a threshold from
+    toggling the window. update() returns the decisions that changed;
+    replay() evaluates a whole event log with array operations and yields
+    the same changes, which replay_risk.py checks.
+    """
+
+    def __init__(self, rules=RULES, decisions=DECISIONS, log_path=None, latency_samples=LATENCY_SAMPLES,
+                 max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.rules = rules
+        self.decisions = decisions
+        horizons = {}
+        for rule in rules:
+            horizons[rule.signal] = max(horizons.get(rule.signal, 0), rule.window)
+        self.series = {s: _Series(horizons.get(s, 0)) for s in SIGNALS}
+        self.state = {rule.name: False for rule in rules}
+        self.on_since = {rule.name: None for rule in rules}
+        self.active = {name: False for name in decisions}
+        self.last_t = float('-inf')
+        self.events = 0
+        self.latencies = np.zeros(latency_samples)
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.pending = []
+
+    def update(self, t, signal, value):
+        """Feed one event; returns a list of Decision for the decisions that changed."""
+        started = time.perf_counter()
+        # Producers run concurrently, so keep time non-decreasing (the log records the clamped time)
+        t = self.last_t = max(float(t), self.last_t)
+        value = float(value)
+        self.series[signal].add(t, value)
+        for rule in self.rules:
+            self._step(rule, self.series[rule.signal].value(rule, t), t)
+
+        changed = []
+        for name, fn in self.decisions.items():
+            active = bool(fn(self.state))
+            if active != self.active[name]:
+                self.active[name] = active
+                changed.append((name, active))
+        latency = time.perf_counter() - started
+        self.latencies[self.events % len(self.latencies)] = latency
+        self.events += 1
+        DECISION_TIME.observe(latency)
+
+        if self.log_path is not None:
+            self.pending.append((t, SIGNALS.index(signal), value))
+            if len(self.pending) >= FLUSH_EVERY:
+                self.flush()
+        rules = tuple(name for name, on in self.state.items() if on)
+        DECISION_CHANGES.inc(len(changed))
+        return [Decision(t, name, active, rules, latency) for name, active in changed]
+
+    def _step(self, rule, value, t):
+        if value >= rule.on:  # NaN (empty window) compares False
+            if self.on_since[rule.name] is None:
+                self.on_since[rule.name] = t
+            if t - self.on_since[rule.name] >= rule.delay:
+                self.state[rule.name] = True
+        else:
+            self.on_since[rule.name] = None
+            if not value > rule.off:
+                self.state[rule.name] = False
+
+    def latency_stats(self):
+        samples = self.latencies[:min(self.events, len(self.latencies))]
+        if not len(samples):
+            return None
+        return {'events': self.events, 'p50': float(np.percentile(samples, 50)),
+                'p99': float(np.percentile(samples, 99)), 'max': float(samples.max())}
+
+    def report(self):
+        s = self.latency_stats()
+        if s is not None:
+            print(f"[{time.ctime()}] risk engine: {s['events']} events, decision latency "
+                  f"p50 {s['p50'] * 1e6:.0f} µs, p99 {s['p99'] * 1e6:.0f} µs, max {s['max'] * 1e6:.0f} µs")
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.log_path}.{i}"):
+                os.replace(f"{self.log_path}.{i}", f"{self.log_path}.{i + 1}")
+        os.replace(self.log_path, f"{self.log_path}.1")
+
+    def flush(self):
+        if not self.pending:
+            return
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) >= self.max_bytes:
+            self._rotate()
+        with open(self.log_path, "ab") as f:
+            f.write(np.array(self.pending, dtype=EVENT).tobytes())
+        self.pending = []
+
+    def close(self):
+        if self.log_path is not None:
+            self.flush()
+
+
+# ── whole-log evaluation ─────────────────────────────────────────────────────
+def _last_index(mask):
+    # For each position, index of the latest True at or before it (-1 if none)
+    return np.maximum.accumulate(np.where(mask, np.arange(len(mask)), -1))
+
+
+def replay(events, rules=RULES, decisions=DECISIONS, chunk=REPLAY_CHUNK):
+    """
+    Evaluate an EVENT array in log order with array operations, REPLAY_CHUNK
+    events at a time. Returns the decision changes as a CHANGE array; they
+    match what update() returns for the same events.
+    """
+    t = np.maximum.accumulate(events['t'])
+    signal, value = events['signal'], events['value']
+    names = list(decisions)
+    series, seen = {}, {}
+    for rule in rules:
+        if rule.signal not in series:
+            mask = signal == SIGNALS.index(rule.signal)
+            series[rule.signal] = (t[mask], np.concatenate([[0.0], np.cumsum(value[mask])]))
+            seen[rule.signal] = 0
+    state = {rule.name: False for rule in rules}
+    pending_on = {rule.name: False for rule in rules}   # value was >= on at the previous event
+    on_since = {rule.name: np.nan for rule in rules}
+    active = np.zeros(len(names), dtype=bool)
+    changes = []
+
+    for a in range(0, len(t), chunk):
+        now = t[a:a + chunk]
+        positions = np.arange(len(now))
+        hi = {}
+        for name in series:
+            hi[name] = seen[name] + np.cumsum(signal[a:a + chunk] == SIGNALS.index(name))
+            seen[name] = int(hi[name][-1])
+
+        states = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for rule in rules:
+                times, sums = series[rule.signal]
+                end = hi[rule.signal]
+                lo = np.searchsorted(times, now - rule.window, 'right')
+                if rule.stat == 'mean':
+                    v = (sums[end] - sums[lo]) / (end - lo)
+                else:
+                    mid = np.searchsorted(times, now - rule.window / 2, 'right')
+                    older, newer = mid - lo, end - mid
+                    v = ((sums[end] - sums[mid]) / newer - (sums[mid] - sums[lo]) / older) / (rule.window / 2) * 60
+                    v[(older == 0) | (newer == 0)] = np.nan
+
+                # On-delay: time since the current run of value >= on began
+                raw_on = v >= rule.on
+                starts = raw_on & ~np.concatenate([[pending_on[rule.name]], raw_on[:-1]])
+                first = _last_index(starts)
+                since = np.where(first >= 0, now[np.maximum(first, 0)], on_since[rule.name])
+                switch_on = raw_on & (now - since >= rule.delay)
+                switch_off = ~raw_on & ~(v > rule.off)
+
+                # Hysteresis: each event keeps the state set by the latest switch
+                last = _last_index(switch_on | switch_off)
+                states[rule.name] = np.where(last >= 0, switch_on[np.maximum(last, 0)], state[rule.name])
+                state[rule.name] = bool(states[rule.name][-1])
+                pending_on[rule.name] = bool(raw_on[-1])
+                on_since[rule.name] = since[-1] if raw_on[-1] else np.nan
+
+        for d, name in enumerate(names):
+            now_active = np.asarray(decisions[name](states), dtype=bool)
+            flips = np.flatnonzero(now_active != np.concatenate([[active[d]], now_active[:-1]]))
+            if len(flips):
+                change = np.zeros(len(flips), dtype=CHANGE)
+                change['t'], change['event'] = now[flips], a + positions[flips]
+                change['decision'], change['active'] = d, now_active[flips]
+                changes.append(change)
+            active[d] = now_active[-1]
+
+    if not changes:
+        return np.zeros(0, dtype=CHANGE)
+    changes = np.concatenate(changes)
+    return changes[np.argsort(changes['event'], kind='stable')]
+
+
+# ── logs ─────────────────────────────────────────────────────────────────────
+def read_events(path=EVENT_LOG):
+    """Load an event log; a torn last record from a power cut is ignored."""
+    size = os.path.getsize(path) // EVENT.itemsize * EVENT.itemsize
+    with open(path, "rb") as f:
+        return np.frombuffer(f.read(size), dtype=EVENT)
+
+
+def events_from_history(records):
+    # sensor_history.RECORD rows to events; gaps (NaN) are failed reads and are skipped
+    parts = []
+    for field in ('temperature', 'humidity', 'co2'):
+        ok = ~np.isnan(records[field])
+        part = np.zeros(int(ok.sum()), dtype=EVENT)
+        part['t'], part['signal'], part['value'] = records['t'][ok], SIGNALS.index(field), records[field][ok]
+        parts.append(part)
+    return merge_events(*parts)
+
+
+def missing_events(events, extra, window=DUPLICATE_WINDOW):
+    """
+    The events of `extra` that `events` does not already hold. The supervisor
+    feeds each DHT22 reading to the engine and to sensor_history.bin a few
+    milliseconds apart, so a history reading within `window` seconds of a
+    logged reading of the same signal is a duplicate; readings from when
+    only temp_record.py was running are kept.
+    """
+    keep = np.ones(len(extra), dtype=bool)
+    for s in np.unique(extra['signal']):
+        logged = np.sort(events['t'][events['signal'] == s])
+        if not len(logged):
+            continue
+        mine = np.flatnonzero(extra['signal'] == s)
+        t = extra['t'][mine]
+        i = np.searchsorted(logged, t)
+        nearest = np.minimum(np.abs(t - logged[np.maximum(i - 1, 0)]),
+                             np.abs(logged[np.minimum(i, len(logged) - 1)] - t))
+        keep[mine[nearest < window]] = False
+    return extra[keep]
+
+
+def merge_events(*arrays):
+    # One log ordered by time; events with equal times keep their argument order
+    events = np.concatenate(arrays)
+    return events[np.argsort(events['t'], kind='stable')]
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# Encrypts the dashcam stream on its way to the SD card, so plaintext footage
+# never touches the disk. The recorder writes raw H.264 to a pipe. This
+# stage cuts it into segments at SPS headers, so every segment decodes on its
+# own, and writes each segment as fixed-size authenticated-encrypted chunks.
+# Memory stays at about two chunks. Each chunk carries the time its first byte
+# arrived, and all chunks but the last have the same size, so any time range
+# can be found by binary search and decrypted without reading the rest.
+#
+# The Pi never holds a key that can decrypt its own footage. It keeps only an
+# X25519 public key; every segment is encrypted with a fresh key derived
+# (HKDF-SHA256) from an ephemeral key pair and that public key, and the
+# ephemeral public half goes in the segment header. Only the private key,
+# which keygen hands over to be moved to the NAS, can derive it again.
+#
+#   python3 segment_crypto.py keygen footage_private.key   # then move it off the Pi
+#   python3 segment_crypto.py record /home/thala/Videos/surveillance_%06d.h264.enc 60
+#   python3 segment_crypto.py decrypt segment.h264.enc out.h264 [--key K --start T --end T]
+import argparse
+import bisect
+import os
+import signal
+import stat
+import struct
+import subprocess
+import sys
+import time
+from collections import deque
+
+# Constants
+PUBLIC_KEY_FILE = os.environ.get('CARTAKER_PUBLIC_KEY', '/home/thala/.cartaker/footage.pub')
+PRIVATE_KEY_FILE = os.environ.get('CARTAKER_PRIVATE_KEY', 'footage_private.key')  # on the NAS, never on the Pi
+CHUNK_SIZE = 64 * 1024        # plaintext bytes per chunk, ~0.1 s of video at 5 Mbit/s
+READ_SIZE = 16 * 1024
+CIPHER = 'aes-256-gcm'        # 'chacha20-poly1305' is faster on CPUs without AES instructions (Pi 4)
+MAGIC = b'CTKENC02'
+TAG_SIZE = 16
+KEY_SIZE = 32                 # raw X25519 keys and the derived segment key
+
+# File header: magic, cipher id, chunk size, nonce prefix, segment start time,
+# ephemeral public key. Chunk record: arrival time of its first byte,
+# ciphertext length, ciphertext + tag.
+HEADER = struct.Struct('<8sII8sd32s')
+CHUNK_HEADER = struct.Struct('<dI')
+CIPHERS = {'aes-256-gcm': 1, 'chacha20-poly1305': 2}
+SPS_START = b'\x00\x00\x00\x01'  # followed by a NAL header byte with type 7
+
+
+def _raw_public(key):
+    from cryptography.hazmat.primitives import serialization
+    return key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+
+def _write_new(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, stat.S_IRUSR | stat.S_IWUSR)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+
+
+def keygen(private_path=PRIVATE_KEY_FILE, public_path=PUBLIC_KEY_FILE):
+    """Create the footage key pair; the private half is for the NAS, only the public half stays on the Pi."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+
+    for path in (private_path, public_path):
+        if os.path.exists(path):
+            raise FileExistsError(f"{path} already exists")
+    private = X25519PrivateKey.generate()
+    _write_new(private_path, private.private_bytes(serialization.Encoding.Raw, serialization.PrivateFormat.Raw,
+                                                   serialization.NoEncryption()))
+    _write_new(public_path, _raw_public(private.public_key()))
+    print(f"[{time.ctime()}] Footage public key written to {public_path}")
+    print(f"[{time.ctime()}] Private key written to {private_path}: move it to the NAS and delete it here, "
+          f"the recorder does not need it")
+
+
+def _load_raw(path, what):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if len(raw) != KEY_SIZE:
+        raise ValueError(f"{path} is not an X25519 {what} key")
+    return raw
+
+
+def load_public_key(path=PUBLIC_KEY_FILE):
+    # Never created here: a recorder that makes up its own key writes footage nobody can read
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PublicKey
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No footage public key at {path}; run `segment_crypto.py keygen` once")
+    return X25519PublicKey.from_public_bytes(_load_raw(path, 'public'))
+
+
+def load_private_key(path=PRIVATE_KEY_FILE):
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+    return X25519PrivateKey.from_private_bytes(_load_raw(path, 'private'))
+
+
+def _segment_key(shared, ephemeral, recipient):
+    # Both public keys go into the derivation, binding the key to this exchange
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    return HKDF(hashes.SHA256(), KEY_SIZE, salt=None, info=MAGIC + ephemeral + recipient).derive(shared)
+
+
+def _aead(cipher_id, key):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    return AESGCM(key) if cipher_id == CIPHERS['aes-256-gcm'] else ChaCha20Poly1305(key)
+
+
+# Chunk i's nonce is the file's random prefix plus i, and its associated data
+# binds the file header, the index, the timestamp and whether it is the last
+# chunk, so chunks can't be reordered, moved between files or cut off unnoticed
+def _nonce(prefix, index):
+    return prefix + index.to_bytes(4, 'big')
+
+
+def _aad(header, index, timestamp, final):
+    return header + struct.pack('<IdB', index, timestamp, final)
+
+
+class EncryptedWriter:
+    """One encrypted segment file; the newest full chunk is held back until it is known not to be the last."""
+
+    def __init__(self, path, public_key, start_time, chunk_size=CHUNK_SIZE, cipher=CIPHER):
+        from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.prefix = os.urandom(8)
+        ephemeral = X25519PrivateKey.generate()
+        ephemeral_public = _raw_public(ephemeral.public_key())
+        key = _segment_key(ephemeral.exchange(public_key), ephemeral_public, _raw_public(public_key))
+        self.header = HEADER.pack(MAGIC, CIPHERS[cipher], chunk_size, self.prefix, start_time, ephemeral_public)
+        self.aead = _aead(CIPHERS[cipher], key)
+        self.file = open(path, 'wb')
+        self.file.write(self.header)
+        self.index = 0
+        self.held = None
+        self.bytes = 0
+        self.torn = False
+
+    def _emit(self, data, timestamp, final):
+        sealed = self.aead.encrypt(_nonce(self.prefix, self.index), bytes(data),
+                                   _aad(self.header, self.index, timestamp, final))
+        # One write per record; if it fails part-way the record is torn, and
+        # close() must not append after it or every later chunk is misaligned
+        self.torn = True
+        self.file.write(CHUNK_HEADER.pack(timestamp, len(sealed)) + sealed)
+        self.torn = False
+        self.index += 1
+
+    def write_chunk(self, data, timestamp):
+        if self.held is not None:
+            self._emit(*self.held, final=False)
+        self.held = (data, timestamp)
+        self.bytes += len(data)
+
+    def close(self):
+        # Nothing goes after a torn record; the reader reports the segment as truncated
+        if not self.torn:
+            self._emit(*(self.held or (b'', time.time())), final=True)
+        self.file.close()
+
+
+class StreamEncryptor:
+    """
+    Reads raw H.264 from a stream and writes encrypted segments named
+    `pattern % n`, cutting at the first SPS after `segment_seconds`.
+    """
+
+    def __init__(self, pattern, public_key, segment_seconds, chunk_size=CHUNK_SIZE, cipher=CIPHER):
+        self.pattern = pattern
+        self.public_key = public_key
+        self.segment_seconds = segment_seconds
+        self.chunk_size = chunk_size
+        self.cipher = cipher
+        self.writer = None
+        self.segment_start = None
+        self.segments = 0
+        self.pending = bytearray()
+        self.offset = 0          # stream offset of pending[0]
+        self.marks = deque()     # (stream offset, arrival time) of each read still in pending
+        self.stopping = False
+
+    def _open(self, now):
+        if self.writer is not None:
+            self.writer.close()
+        self.writer = EncryptedWriter(self.pattern % self.segments, self.public_key, now, self.chunk_size, self.cipher)
+        self.segment_start = now
+        self.segments += 1
+
+    def _time_at(self, offset):
+        while len(self.marks) > 1 and self.marks[1][0] <= offset:
+            self.marks.popleft()
+        return self.marks[0][1]
+
+    def _flush(self, length):
+        self.writer.write_chunk(self.pending[:length], self._time_at(self.offset))
+        del self.pending[:length]
+        self.offset += length
+
+    def _find_sps(self, start):
+        i = self.pending.find(SPS_START, start)
+        while i != -1 and i + 4 < len(self.pending) and self.pending[i + 4] & 0x1F != 7:
+            i = self.pending.find(SPS_START, i + 1)
+        return i if i != -1 and i + 4 < len(self.pending) else -1
+
+    def feed(self, data, now=None):
+        now = time.time() if now is None else now
+        if self.writer is None:
+            self._open(now)
+        search_from = max(0, len(self.pending) - len(SPS_START))
+        self.marks.append((self.offset + len(self.pending), now))
+        self.pending += data
+        if now - self.segment_start >= self.segment_seconds:
+            cut = self._find_sps(search_from)
+            if cut != -1:
+                while cut >= self.chunk_size:
+                    self._flush(self.chunk_size)
+                    cut -= self.chunk_size
+                if cut:
+                    self._flush(cut)
+                self._open(now)
+        # Keep the last bytes back so a start code split across reads is still found
+        while len(self.pending) >= self.chunk_size + len(SPS_START):
+            self._flush(self.chunk_size)
+
+    def close(self):
+        if self.writer is not None:
+            if self.pending:
+                self._flush(len(self.pending))
+            self.writer.close()
+            self.writer = None
+
+    def stop(self):
+        # Safe from a signal handler: run() checks it between reads, never mid-chunk
+        self.stopping = True
+
+    def run(self, stream):
+        try:
+            while not self.stopping:
+                data = stream.read1(READ_SIZE) if hasattr(stream, 'read1') else stream.read(READ_SIZE)
+                if not data:
+                    break
+                self.feed(data)
+        finally:
+            self.close()
+
+
+class EncryptedSegment:
+    """Random-access reader for one encrypted segment."""
+
+    def __init__(self, path, private_key):
+        from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PublicKey
+
+        self.file = open(path, 'rb')
+        self.header = self.file.read(HEADER.size)
+        if len(self.header) < HEADER.size or self.header[:len(MAGIC)] != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not an encrypted segment")
+        magic, cipher_id, self.chunk_size, self.prefix, self.start_time, ephemeral = HEADER.unpack(self.header)
+        shared = private_key.exchange(X25519PublicKey.from_public_bytes(ephemeral))
+        self.aead = _aead(cipher_id, _segment_key(shared, ephemeral, _raw_public(private_key.public_key())))
+        self.record_size = CHUNK_HEADER.size + self.chunk_size + TAG_SIZE
+        full, rest = divmod(os.fstat(self.file.fileno()).st_size - HEADER.size, self.record_size)
+        self.chunks = full + (rest >= CHUNK_HEADER.size)
+
+    def timestamp(self, index):
+        self.file.seek(HEADER.size + index * self.record_size)
+        return CHUNK_HEADER.unpack(self.file.read(CHUNK_HEADER.size))[0]
+
+    def read_chunk(self, index):
+        """
+        Decrypt chunk `index`; returns (timestamp, plaintext, final). Raises
+        InvalidTag if the chunk was modified and EOFError if it was only
+        partly written.
+        """
+        from cryptography.exceptions import InvalidTag
+
+        self.file.seek(HEADER.size + index * self.record_size)
+        timestamp, length = CHUNK_HEADER.unpack(self.file.read(CHUNK_HEADER.size))
+        sealed = self.file.read(length)
+        if len(sealed) < length:
+            raise EOFError(f"Chunk {index} is incomplete")
+        nonce = _nonce(self.prefix, index)
+        if index < self.chunks - 1:
+            return timestamp, self.aead.decrypt(nonce, sealed, _aad(self.header, index, timestamp, False)), False
+        # The last chunk present is sealed as final unless the recorder was cut off
+        try:
+            return timestamp, self.aead.decrypt(nonce, sealed, _aad(self.header, index, timestamp, True)), True
+        except InvalidTag:
+            return timestamp, self.aead.decrypt(nonce, sealed, _aad(self.header, index, timestamp, False)), False
+
+    def find(self, t):
+        # Last chunk whose first byte arrived at or before t (timestamps increase)
+        times = _LazyTimes(self)
+        return max(bisect.bisect_right(times, t) - 1, 0)
+
+    def decrypt(self, out, start=None, end=None):
+        """Write the plaintext of [start, end] (whole chunks) to `out`; returns False if the file is truncated."""
+        first = 0 if start is None else self.find(start)
+        final = False
+        for index in range(first, self.chunks):
+            try:
+                timestamp, data, final = self.read_chunk(index)
+            except EOFError:
+                return False
+            if end is not None and timestamp > end:
+                return True
+            out.write(data)
+        return final
+
+    def close(self):
+        self.file.close()
+
+
+class _LazyTimes:
+    """Chunk timestamps as a sequence, read from disk only where bisect looks."""
+
+    def __init__(self, segment):
+        self.segment = segment
+
+    def __len__(self):
+        return self.segment.chunks
+
+    def __getitem__(self, index):
+        return self.segment.timestamp(index)
+
+
+def decrypt_file(path, out, private_key=None, start=None, end=None):
+    # Needs the private key, so this runs where it lives (the NAS), not on the Pi
+    segment = EncryptedSegment(path, private_key or load_private_key())
+    try:
+        complete = segment.decrypt(out, start, end)
+    finally:
+        segment.close()
+    if not complete:
+        print(f"[{time.ctime()}] Warning: {path} is truncated (recorder stopped mid-segment)")
+    return complete
+
+
+# Recorder commands for segment_recorder.SegmentRecorder: the camera (or a
+# stand-in) writes to stdout and this script encrypts into the pattern's files
+def encrypted_libcamera_command(pattern, segment_seconds):
+    return [sys.executable, os.path.abspath(__file__), 'record', pattern, str(segment_seconds)]
+
+
+def encrypted_synthetic_command(pattern, segment_seconds):
+    return [sys.executable, os.path.abspath(__file__), 'record', pattern, str(segment_seconds), '--synthetic']
+
+
+def camera_argv():
+    # Raw H.264 with an SPS/PPS before every I-frame (once a second), to stdout
+    return ["libcamera-vid", "-t", "0", "--width", "1920", "--height", "1080", "--framerate", "30",
+            "--bitrate", "5000000", "--codec", "h264", "--inline", "--intra", "30", "-o", "-"]
+
+
+def synthetic_argv(bitrate=5_000_000):
+    code = ("import os, sys, time\n"
+            f"chunk = {bitrate} // 8 // 10\n"
+            "n = 0\n"
+            "while True:\n"
+            "    head = b'\\x00\\x00\\x00\\x01\\x67' if n % 10 == 0 else b''\n"  # an SPS every second
+            "    sys.stdout.buffer.write(head + os.urandom(chunk).replace(b'\\x00\\x00\\x00\\x01', b'\\x00\\x00\\x03\\x01'))\n"
+            "    sys.stdout.buffer.flush()\n"
+            "    n += 1\n"
+            "    time.sleep(0.1)\n")
+    return [sys.executable, '-c', code]
+
+
+def record(pattern, segment_seconds, synthetic=False):
+    encryptor = StreamEncryptor(pattern, load_public_key(), segment_seconds)
+    proc = None
+
+    # SIGTERM from the recorder (or Ctrl+C) stops the camera, which ends the
+    # pipe; run() leaves its loop between chunks and seals the last segment
+    def stop(*_):
+        encryptor.stop()
+        if proc is not None:
+            proc.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    proc = subprocess.Popen(synthetic_argv() if synthetic else camera_argv(), stdout=subprocess.PIPE)
+    try:
+        encryptor.run(proc.stdout)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Streaming dashcam encryption')
+    sub = parser.add_subparsers(dest='command', required=True)
+    gen = sub.add_parser('keygen', help="create the footage key pair")
+    gen.add_argument('private_key', nargs='?', default=PRIVATE_KEY_FILE, help="where to write the private key")
+    rec = sub.add_parser('record', help="record from the camera into encrypted segments")
+    rec.add_argument('pattern')
+    rec.add_argument('segment_seconds', type=float)
+    rec.add_argument('--synthetic', action='store_true', help="random stand-in stream instead of the camera")
+    dec = sub.add_parser('decrypt', help="decrypt a segment, or a time range of it")
+    dec.add_argument('input')
+    dec.add_argument('output')
+    dec.add_argument('--key', default=PRIVATE_KEY_FILE, help="private key file")
+    dec.add_argument('--start', type=float, help="Unix time")
+    dec.add_argument('--end', type=float, help="Unix time")
+    args = parser.parse_args()
+
+    if args.command == 'keygen':
+        keygen(args.private_key)
+    elif args.command == 'record':
+        record(args.pattern, args.segment_seconds, args.synthetic)
+    else:
+        with open(args.output, 'wb') as out:
+            decrypt_file(args.input, out, load_private_key(args.key), args.start, args.end)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import bisect
+import signal
+import subprocess
+
+# Constants
+VIDEO_FOLDER = "/home/thala/Videos"
+SEGMENT_SECONDS = 60
+QUOTA_BYTES = 20 * 1024**3        # evict oldest unpinned segments beyond this
+PRE_EVENT_SECONDS = 120           # footage kept from before a safety event
+POST_EVENT_SECONDS = 120          # and after it
+INDEX_FILE = "segments.json"
+POLL_INTERVAL = 1.0
+
+
+# Recorder commands. Each takes the output pattern (with a %06d counter) and
+# the segment length, and returns an argv list that writes consecutive files.
+def libcamera_command(pattern, segment_seconds):
+    # Raw H.264 with inline headers: every segment decodes on its own and a
+    # killed recorder leaves at most one truncated (still playable) segment
+    return [
+        "libcamera-vid", "-t", "0", "--width", "1920", "--height", "1080",
+        "--framerate", "30", "--bitrate", "5000000", "--codec", "h264", "--inline",
+        "--segment", str(segment_seconds * 1000), "-o", pattern,
+    ]
+
+
+def synthetic_command(pattern, segment_seconds, bitrate=5_000_000):
+    # Local stand-in for tests: writes random bytes at the recorder's bitrate
+    return [sys.executable, os.path.abspath(__file__), "synthetic", pattern, str(segment_seconds), str(bitrate)]
+
+
+def run_synthetic_writer(pattern, segment_seconds, bitrate):
+    chunk = bitrate // 8 // 10  # 100 ms of "video"
+    n = 0
+    while True:
+        with open(pattern % n, "wb") as f:
+            start = time.monotonic()
+            while time.monotonic() - start < segment_seconds:
+                f.write(os.urandom(chunk))
+                f.flush()
+                time.sleep(0.1)
+        n += 1
+
+
+class SegmentIndex:
+    """Segments sorted by start time, persisted as JSON next to the footage."""
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, INDEX_FILE)
+        self.segments = []
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.segments = json.load(f)
+        self.starts = [s['start'] for s in self.segments]
+
+    def add(self, segment):
+        i = bisect.bisect(self.starts, segment['start'])
+        self.starts.insert(i, segment['start'])
+        self.segments.insert(i, segment)
+
+    def remove(self, segment):
+        i = self.segments.index(segment)
+        del self.segments[i]
+        del self.starts[i]
+
+    def overlapping(self, start, end):
+        """Segments whose [start, end] overlaps the given range, oldest first."""
+        # Segments are contiguous, so only the one starting before `start` can reach into the range
+        i = max(bisect.bisect_right(self.starts, start) - 1, 0)
+        j = bisect.bisect_right(self.starts, end)
+        return [s for s in self.segments[i:j] if (s['end'] or float('inf')) >= start]
+
+    def total_bytes(self):
+        return sum(s['bytes'] for s in self.segments)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.segments, f)
+        os.replace(tmp, self.path)
+
+
+class SegmentRecorder:
+    """
+    Runs a recorder that rolls fixed-length segments, keeps an index of them
+    by time, and evicts the oldest unpinned ones to stay under a disk quota.
+    mark_event() pins every segment overlapping the pre/post-event window.
+    """
+
+    def __init__(self, folder=VIDEO_FOLDER, command=libcamera_command, segment_seconds=SEGMENT_SECONDS,
+                 quota_bytes=QUOTA_BYTES, pre_event=PRE_EVENT_SECONDS, post_event=POST_EVENT_SECONDS,
+                 extension='.h264'):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.command = command
+        self.segment_seconds = segment_seconds
+        self.quota_bytes = quota_bytes
+        self.pre_event = pre_event
+        self.post_event = post_event
+        self.index = SegmentIndex(folder)
+        self._recover()
+        self.events = []  # (start, end) windows that pin footage
+        self.signalled = []  # SIGUSR1 times not yet marked, see run()
+        self.session = time.strftime("%Y%m%d_%H%M%S")
+        self.pattern = os.path.join(folder, f"surveillance_{self.session}_%06d{extension}")
+        self.next_segment = 0
+        self.open_segment = None
+        self.process = None
+        self.started_at = None
+
+    def _recover(self):
+        # Close segments left open by a recorder that was killed
+        for segment in list(self.index.segments):
+            if segment['end'] is None:
+                path = os.path.join(self.folder, segment['file'])
+                if os.path.exists(path):
+                    segment['end'] = os.path.getmtime(path)
+                    segment['bytes'] = os.path.getsize(path)
+                else:
+                    self.index.remove(segment)
+
+    def start(self):
+        self.started_at = time.time()
+        self.process = subprocess.Popen(self.command(self.pattern, self.segment_seconds))
+        print(f"Recording started: {self.pattern} ({self.segment_seconds} s segments)")
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+        self.poll(final=True)
+        self.index.save()
+
+    def mark_event(self, t=None):
+        t = time.time() if t is None else t
+        window = (t - self.pre_event, t + self.post_event)
+        self.events.append(window)
+        for segment in self.index.overlapping(*window):
+            segment['pinned'] = True
+        self.index.save()
+        print(f"[{time.ctime()}] Event marked, footage pinned from {time.ctime(window[0])} to {time.ctime(window[1])}")
+
+    def _pinned(self, segment):
+        end = segment['end'] or time.time()
+        return any(segment['start'] <= e_end and end >= e_start for e_start, e_end in self.events)
+
+    def poll(self, final=False):
+        """Pick up newly opened segments, close finished ones, enforce the quota."""
+        changed = False
+        while os.path.exists(self.pattern % self.next_segment):
+            path = self.pattern % self.next_segment
+            # Segments are back to back: each starts where the previous one ended
+            start = self.started_at
+            if self.open_segment is not None:
+                self._close(self.open_segment)
+                start = self.open_segment['end']
+            self.open_segment = {'file': os.path.basename(path), 'start': start,
+                                 'end': None, 'bytes': 0, 'pinned': False}
+            self.index.add(self.open_segment)
+            self.next_segment += 1
+            changed = True
+        if final and self.open_segment is not None:
+            self._close(self.open_segment)
+            self.open_segment = None
+            changed = True
+        if changed:
+            self.enforce_quota()
+            self.index.save()
+
+    def _close(self, segment):
+        path = os.path.join(self.folder, segment['file'])
+        segment['end'] = os.path.getmtime(path)
+        segment['bytes'] = os.path.getsize(path)
+        segment['pinned'] = segment['pinned'] or self._pinned(segment)
+
+    def enforce_quota(self):
+        # Segments already uploaded and removed by nas_sync.py no longer count
+        for segment in list(self.index.segments):
+            if segment['end'] is not None and not os.path.exists(os.path.join(self.folder, segment['file'])):
+                self.index.remove(segment)
+        total = self.index.total_bytes()
+        for segment in list(self.index.segments):
+            if total <= self.quota_bytes:
+                break
+            if segment['pinned'] or segment['end'] is None or self._pinned(segment):
+                continue
+            try:
+                os.remove(os.path.join(self.folder, segment['file']))
+            except FileNotFoundError:
+                pass
+            total -= segment['bytes']
+            self.index.remove(segment)
+            print(f"[{time.ctime()}] Quota: evicted {segment['file']}")
+
+    def clip(self, start, end, dest, private_key=None):
+        """
+        Concatenate the segments covering [start, end] into one file (raw
+        H.264 concatenates cleanly). Encrypted segments need the footage
+        private key (segment_crypto.load_private_key), which is not on the Pi.
+        """
+        segments = self.index.overlapping(start, end)
+        with open(dest, "wb") as out:
+            for segment in segments:
+                path = os.path.join(self.folder, segment['file'])
+                if path.endswith('.enc'):
+                    from segment_crypto import decrypt_file
+                    decrypt_file(path, out, private_key)
+                    continue
+                with open(path, "rb") as f:
+                    while True:
+                        block = f.read(1 << 20)
+                        if not block:
+                            break
+                        out.write(block)
+        return [s['file'] for s in segments]
+
+    def _mark_signalled(self):
+        while self.signalled:
+            self.mark_event(self.signalled.pop(0))
+
+    def run(self):
+        # SIGUSR1 from the supervisor marks a safety event. The handler only
+        # records the time: the loop marks it, so the index is never saved
+        # from inside a signal handler while the loop is saving it too.
+        signal.signal(signal.SIGUSR1, lambda *_: self.signalled.append(time.time()))
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        self.start()
+        try:
+            while self.process.poll() is None:
+                self._mark_signalled()
+                self.poll()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            self._mark_signalled()
+            self.stop()
+
+
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "synthetic":
+    run_synthetic_writer(sys.argv[2], float(sys.argv[3]), int(sys.argv[4]))
@@ -0,0 +1,218 @@
+import os
+import time
+import math
+from collections import deque
+import numpy as np
+
+# Constants
+LOG_PATH = "sensor_history.bin"
+SAMPLE_INTERVAL = 2.0          # temp_record.py reads the DHT22 every 2 s
+CAPACITY = 4 * 3600 // 2       # 4 hours of samples in memory
+FLUSH_EVERY = 30               # samples per disk write (one SD-card write a minute)
+ROLLUP_WINDOWS = {'1min': 60, '10min': 600, '1h': 3600}
+FIELDS = ('temperature', 'humidity', 'co2')
+
+# One fixed-width record per sample; a failed read is stored with NaN values
+RECORD = np.dtype([('t', '<f8'), ('temperature', '<f4'), ('humidity', '<f4'), ('co2', '<f4')])
+
+
+class WindowStats:
+    """Running min/max/mean over the last `seconds`, amortized O(1) per sample."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+        self.mins = deque()  # increasing values: front is the minimum
+        self.maxs = deque()  # decreasing values: front is the maximum
+        self.total = 0.0
+
+    def add(self, t, value):
+        if not math.isnan(value):
+            self.samples.append((t, value))
+            self.total += value
+            while self.mins and self.mins[-1][1] >= value:
+                self.mins.pop()
+            self.mins.append((t, value))
+            while self.maxs and self.maxs[-1][1] <= value:
+                self.maxs.pop()
+            self.maxs.append((t, value))
+        self.expire(t)
+
+    def expire(self, now):
+        cutoff = now - self.seconds
+        while self.samples and self.samples[0][0] <= cutoff:
+            self.total -= self.samples.popleft()[1]
+        while self.mins and self.mins[0][0] <= cutoff:
+            self.mins.popleft()
+        while self.maxs and self.maxs[0][0] <= cutoff:
+            self.maxs.popleft()
+
+    def summary(self):
+        if not self.samples:
+            return {'min': None, 'max': None, 'mean': None, 'count': 0}
+        return {'min': self.mins[0][1], 'max': self.maxs[0][1],
+                'mean': self.total / len(self.samples), 'count': len(self.samples)}
+
+
+class SensorHistory:
+    """
+    In-memory ring of recent sensor samples plus an append-only binary log.
+
+    Samples are written to disk in batches of `flush_every` (or only kept in
+    memory when `log_path` is None). Alongside the
+    ring we keep prefix sums of (n, t, T, t*t, t*T) over valid temperature
+    samples, so the least-squares temperature slope over any recent window is
+    a binary search for its start, two array lookups and a few arithmetic
+    operations.
+    """
+
+    def __init__(self, log_path=LOG_PATH, capacity=CAPACITY, interval=SAMPLE_INTERVAL, flush_every=FLUSH_EVERY):
+        self.log_path = log_path
+        self.capacity = capacity
+        self.interval = interval
+        self.flush_every = flush_every
+        self.ring = np.zeros(capacity, dtype=RECORD)
+        self.times = np.zeros(capacity)  # ring['t'] as a contiguous array, for binary searches
+        self.prefix = np.zeros((capacity, 5), dtype=np.float64)
+        self.count = 0
+        self.t0 = None
+        self.pending = []
+        self.gaps = 0
+        self.rollups = {name: {f: WindowStats(sec) for f in FIELDS} for name, sec in ROLLUP_WINDOWS.items()}
+
+    def add(self, t, temperature=None, humidity=None, co2=None):
+        """Record a sample; any value left as None is stored as a gap (NaN)."""
+        values = [np.nan if v is None else float(v) for v in (temperature, humidity, co2)]
+        if math.isnan(values[0]) and math.isnan(values[1]):
+            self.gaps += 1
+        if self.t0 is None:
+            self.t0 = t
+
+        idx = self.count % self.capacity
+        self.ring[idx] = (t, *values)
+        self.times[idx] = t
+
+        # Prefix sums use time relative to the first sample to keep precision
+        prev = self.prefix[(self.count - 1) % self.capacity] if self.count else np.zeros(5)
+        temp = values[0]
+        if math.isnan(temp):
+            self.prefix[idx] = prev
+        else:
+            x = t - self.t0
+            self.prefix[idx] = prev + (1.0, x, temp, x * x, x * temp)
+        self.count += 1
+
+        for windows in self.rollups.values():
+            for field, value in zip(FIELDS, values):
+                windows[field].add(t, value)
+
+        if self.log_path is None:
+            return
+        self.pending.append(self.ring[idx].copy())
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def add_gap(self, t):
+        self.add(t)
+
+    def _index_before(self, t):
+        # Newest sample index (counting from the first sample) with timestamp
+        # <= t, or None. Once the ring has wrapped it holds two sorted runs,
+        # times[head:] (older) and times[:head] (newer): at most one binary
+        # search in each.
+        if self.count <= self.capacity:
+            i = int(np.searchsorted(self.times[:self.count], t, side='right'))
+            return i - 1 if i else None
+        head = self.count % self.capacity
+        i = int(np.searchsorted(self.times[:head], t, side='right'))
+        if i:
+            return self.count - head + i - 1
+        i = int(np.searchsorted(self.times[head:], t, side='right'))
+        return self.count - self.capacity + i - 1 if i else None
+
+    def temperature_rise_rate(self, seconds):
+        """Least-squares temperature slope over the last `seconds`, in °C per minute (None if too few samples)."""
+        if self.count == 0:
+            return None
+        newest = self.prefix[(self.count - 1) % self.capacity]
+        start = self._index_before(self.ring[(self.count - 1) % self.capacity]['t'] - seconds)
+        if start is None:
+            if self.count > self.capacity:
+                return None  # window reaches past what the ring still holds
+            start_sums = np.zeros(5)
+        else:
+            start_sums = self.prefix[start % self.capacity]
+        n, sx, sy, sxx, sxy = newest - start_sums
+        denom = n * sxx - sx * sx
+        if n < 2 or denom <= 0:
+            return None
+        return (n * sxy - sx * sy) / denom * 60.0
+
+    def rollup(self, window='1min'):
+        now = self.ring[(self.count - 1) % self.capacity]['t'] if self.count else time.time()
+        result = {}
+        for field, stats in self.rollups[window].items():
+            stats.expire(now)
+            result[field] = stats.summary()
+        return result
+
+    def latest(self):
+        return self.ring[(self.count - 1) % self.capacity].copy() if self.count else None
+
+    def recent(self, seconds):
+        """Samples from the last `seconds`, oldest first, as a RECORD array."""
+        if self.count == 0:
+            return np.zeros(0, dtype=RECORD)
+        start = self._index_before(self.ring[(self.count - 1) % self.capacity]['t'] - seconds)
+        first = max(0, self.count - self.capacity) if start is None else start + 1
+        idx = np.arange(first, self.count) % self.capacity
+        return self.ring[idx].copy()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with open(self.log_path, "ab") as f:
+            f.write(np.array(self.pending, dtype=RECORD).tobytes())
+        self.pending = []
+
+    def close(self):
+        self.flush()
+
+
+def read_log(path=LOG_PATH):
+    """Load an append-only log; a torn last record from a power cut is ignored."""
+    size = os.path.getsize(path) // RECORD.itemsize * RECORD.itemsize
+    with open(path, "rb") as f:
+        return np.frombuffer(f.read(size), dtype=RECORD)
+
+
+class LogFollower:
+    """
+    Follows the log another process appends to (temp_record.py) and keeps
+    its recent samples in a memory-only SensorHistory, for processes that
+    do not read the sensor themselves. Only records appended since the last
+    poll() are read; a log that shrank (deleted and restarted) is read again
+    from its tail.
+    """
+
+    def __init__(self, path=LOG_PATH, capacity=CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self.offset = None
+        self.history = SensorHistory(log_path=None, capacity=capacity)
+
+    def poll(self):
+        """Read newly flushed samples; returns how many (FileNotFoundError if there is no log yet)."""
+        size = os.path.getsize(self.path) // RECORD.itemsize * RECORD.itemsize
+        if self.offset is None or size < self.offset:
+            self.history = SensorHistory(log_path=None, capacity=self.capacity)
+            self.offset = max(0, size - self.capacity * RECORD.itemsize)
+        if size == self.offset:
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            records = np.frombuffer(f.read(size - self.offset), dtype=RECORD)
+        self.offset = size
+        for t, temperature, humidity, co2 in records.tolist():
+            self.history.add(t, temperature, humidity, co2)
+        return len(records)
@@ -9,20 +9,29 @@ SERVO_PIN = 18  # BCM numbering (physical pin 12)
 def angle_to_duty(angle):
     return 2.5 + (angle / 180.0) * 10
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(SERVO_PIN, GPIO.OUT)
+# Set up the pin with 50 Hz PWM, resting at 0°
+def setup_servo(pin=SERVO_PIN, gpio=GPIO):
+    gpio.setmode(gpio.BCM)
+    gpio.setup(pin, gpio.OUT)
+    pwm = gpio.PWM(pin, 50)
+    pwm.start(angle_to_duty(0))  # start at 0°
+    return pwm
 
-# 50 Hz PWM
-pwm = GPIO.PWM(SERVO_PIN, 50)
-pwm.start(angle_to_duty(0))  # start at 0°
-
-try:
-    # move to 180° (or wherever “spin” is for you)
+# move to 180° (or wherever “spin” is for you) and back
+def spin(pwm):
     pwm.ChangeDutyCycle(angle_to_duty(180))
     time.sleep(2)    # run for 2 seconds
     # return to 0° (resting position)
     pwm.ChangeDutyCycle(angle_to_duty(0))
     time.sleep(0.5)  # give it time to settle
-finally:
+
+def release_servo(pwm, gpio=GPIO):
     pwm.stop()
-    GPIO.cleanup()
+    gpio.cleanup()
+
+if __name__ == "__main__":
+    pwm = setup_servo()
+    try:
+        spin(pwm)
+    finally:
+        release_servo(pwm)
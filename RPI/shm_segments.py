@@ -0,0 +1,69 @@
+import os
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+# Constants
+SHM_DIR = '/dev/shm'  # where POSIX shared memory segments live on Linux
+
+# Segments created by this process. Only the creator unlinks a segment;
+# readers in other processes drop it from their resource tracker so their
+# exit does not remove it (a reader in the creating process must not, or the
+# creator's own unlink later fails inside the tracker).
+_created = set()
+
+
+def create(name, size):
+    """Create segment `name`, replacing one left behind by a crashed owner."""
+    try:
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+    except FileNotFoundError:
+        pass
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    _created.add(shm._name)
+    return shm
+
+
+def open_existing(name):
+    # Raises FileNotFoundError while the owner has not created it
+    shm = shared_memory.SharedMemory(name=name)
+    if shm._name not in _created:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def attach(name, timeout=None):
+    # Wait for the owner to create segment `name`
+    start = time.monotonic()
+    while True:
+        try:
+            return open_existing(name)
+        except FileNotFoundError:
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise
+            time.sleep(0.1)
+
+
+def inode(shm):
+    return os.fstat(shm._fd).st_ino
+
+
+def replaced(name, ino):
+    """True once segment `name` was unlinked or recreated (its owner restarted) since we mapped inode `ino`."""
+    if not os.path.isdir(SHM_DIR):
+        return False  # no way to tell on this platform
+    try:
+        return os.stat(os.path.join(SHM_DIR, name)).st_ino != ino
+    except FileNotFoundError:
+        return True
+
+
+def release(shm, owner):
+    shm.close()
+    if owner:
+        _created.discard(shm._name)
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,70 @@
+import os
+import json
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+
+# Constants
+HISTORY_FILE = "startup_history.jsonl"  # one line per start, to track time-to-first-decision over releases
+
+
+# Seconds since this process was created (includes interpreter start-up and
+# imports before this module ran), from /proc; falls back to "now" elsewhere.
+def process_age():
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupTimeline:
+    """Start/end of each start-up stage, relative to process creation, from any thread."""
+
+    def __init__(self):
+        self.t0 = time.monotonic() - process_age()
+        self.stages = []   # (label, start, end, thread)
+        self.lock = threading.Lock()
+        self.stages.append(('interpreter + imports', 0.0, self.now(), 'MainThread'))
+
+    def now(self):
+        return time.monotonic() - self.t0
+
+    @contextmanager
+    def stage(self, label):
+        start = self.now()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages.append((label, start, self.now(), threading.current_thread().name))
+
+    def mark(self, label):
+        t = self.now()
+        with self.lock:
+            self.stages.append((label, t, t, threading.current_thread().name))
+        return t
+
+    def report(self, width=40):
+        total = max(end for _, _, end, _ in self.stages) or 1.0
+        print(f"[{time.ctime()}] Startup timeline ({total:.2f} s):")
+        for label, start, end, thread in sorted(self.stages, key=lambda s: s[1]):
+            a, b = int(start / total * width), max(int(end / total * width), int(start / total * width) + 1)
+            bar = " " * a + "#" * (b - a)
+            print(f"  {start:6.2f} {end - start:6.2f} s  {bar:<{width}}  {label} [{thread}]")
+
+    def save(self, path=HISTORY_FILE, **extra):
+        try:
+            commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                             stderr=subprocess.DEVNULL, cwd=os.path.dirname(__file__) or None).strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        record = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit,
+                  'stages': [{'label': l, 'start': round(s, 4), 'end': round(e, 4)} for l, s, e, _ in self.stages],
+                  **extra}
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
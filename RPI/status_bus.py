@@ -0,0 +1,202 @@
+import os
+import time
+import select
+import socket
+import numpy as np
+import shm_segments
+
+# Constants
+STATUS_NAME = 'cartaker_status'
+SUBSCRIBER_DIR = '/tmp/cartaker_status.d'  # one datagram socket per waiting subscriber
+MAX_FACES = 8
+LABEL_BYTES = 12
+MAGIC = 0xCA7F57A7
+REATTACH_INTERVAL = 0.5  # seconds between checks for a restarted publisher while waiting
+
+_FACE_DTYPE = np.dtype([('box', '<i4', (4,)), ('label', f'S{LABEL_BYTES}'), ('confidence', '<f4')])
+_RECORD_DTYPE = np.dtype([('magic', '<u8'), ('generation', '<u8'), ('seq', '<u8'), ('ts', '<f8'),
+                          ('count', '<u4'), ('faces', _FACE_DTYPE, (MAX_FACES,))])
+
+
+class StatusBus:
+    """
+    Latest detection result in POSIX shared memory, guarded by a seqlock.
+
+    The publisher bumps `seq` to an odd value, writes the record and bumps it
+    back to even; readers copy the record and retry if `seq` was odd or moved.
+    latest() is therefore a handful of loads from mapped memory, with no
+    syscalls. wait() blocks on a Unix datagram socket that the publisher
+    pokes after each publish, so subscribers wake on change instead of polling.
+
+    A restarted publisher creates a new segment with a new generation and
+    numbers its statuses from 2 again; wait() notices and reattaches.
+    """
+
+    def __init__(self, shm, owner):
+        self._map(shm)
+        self.owner = owner
+        self.sock = None
+        self.sock_path = None
+        self._subscribers = []
+        self._dir_mtime = None
+
+    def _map(self, shm):
+        self.shm = shm
+        self.inode = shm_segments.inode(shm)
+        self.record = np.ndarray((), dtype=_RECORD_DTYPE, buffer=shm.buf)
+        self.seq_word = np.ndarray((1,), dtype='<u8', buffer=shm.buf, offset=_RECORD_DTYPE.fields['seq'][1])
+        if int(self.record['magic']) != MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a status bus")
+        self.generation = int(self.record['generation'])
+
+    @classmethod
+    def create(cls, name=STATUS_NAME):
+        shm = shm_segments.create(name, _RECORD_DTYPE.itemsize)
+        record = np.ndarray((), dtype=_RECORD_DTYPE, buffer=shm.buf)
+        record[()] = np.zeros((), dtype=_RECORD_DTYPE)
+        record['generation'] = time.time_ns()
+        record['magic'] = MAGIC
+        os.makedirs(SUBSCRIBER_DIR, exist_ok=True)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=STATUS_NAME, timeout=None):
+        return cls(shm_segments.attach(name, timeout), owner=False)
+
+    def reattach(self):
+        """Map the publisher's new segment if it was replaced; returns True if it was."""
+        if self.owner or not shm_segments.replaced(self.shm.name, self.inode):
+            return False
+        try:
+            shm = shm_segments.open_existing(self.shm.name)
+        except (FileNotFoundError, ValueError):
+            return False  # publisher not back yet; keep the old mapping until it is
+        if shm.size < _RECORD_DTYPE.itemsize or int(np.ndarray((1,), dtype='<u8', buffer=shm.buf)[0]) != MAGIC:
+            shm.close()  # publisher still initialising the record
+            return False
+        self.record = self.seq_word = None
+        self.shm.close()
+        self._map(shm)
+        print(f"[{time.ctime()}] Status bus '{shm.name}' was recreated by its publisher, reattached")
+        return True
+
+    # ── publisher ───────────────────────────────────────────────────────────
+    def publish(self, faces, timestamp=None):
+        """Publish a list of (box, emotion, confidence); returns the new sequence number."""
+        record = self.record
+        seq = int(record['seq'])
+        record['seq'] = seq + 1  # odd: write in progress
+        record['ts'] = time.time() if timestamp is None else timestamp
+        record['count'] = min(len(faces), MAX_FACES)
+        for i, (box, emotion, confidence) in enumerate(faces[:MAX_FACES]):
+            record['faces'][i] = (box, emotion.encode()[:LABEL_BYTES], confidence)
+        record['seq'] = seq + 2
+        self._notify()
+        return seq + 2
+
+    def _notify(self):
+        # Re-list subscriber sockets only when one has come or gone
+        try:
+            mtime = os.stat(SUBSCRIBER_DIR).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._dir_mtime:
+            self._dir_mtime = mtime
+            self._subscribers = [os.path.join(SUBSCRIBER_DIR, n) for n in os.listdir(SUBSCRIBER_DIR)]
+            if self.sock is None:
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self.sock.setblocking(False)
+        for path in self._subscribers:
+            try:
+                self.sock.sendto(b'\0', path)
+            except BlockingIOError:
+                pass  # subscriber already has a wake-up queued
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(path)  # subscriber died without cleaning up
+                except FileNotFoundError:
+                    pass
+
+    # ── subscriber ──────────────────────────────────────────────────────────
+    def latest(self, after=0):
+        """
+        Return {'seq', 'generation', 'ts', 'faces': [(box, emotion, confidence), ...]}
+        for the newest status newer than `after`, or None.
+        """
+        record, seq_word = self.record, self.seq_word
+        for _ in range(1000):
+            seq = int(seq_word[0])
+            if seq <= after:
+                return None
+            if seq & 1:
+                continue
+            snapshot = record.item()  # one copy of the whole record
+            if int(seq_word[0]) == seq:
+                _, generation, _, ts, count, faces = snapshot
+                return {'seq': seq, 'generation': generation, 'ts': ts, 'faces': [(tuple(box.tolist()), label.decode(), confidence)
+                                                         for box, label, confidence in faces[:count].tolist()]}
+        return None  # publisher stuck mid-write
+
+    def fileno(self):
+        # Readable when a new status has been published (for select/asyncio add_reader)
+        if self.sock is None:
+            os.makedirs(SUBSCRIBER_DIR, exist_ok=True)
+            self.sock_path = os.path.join(SUBSCRIBER_DIR, f"{os.getpid()}_{id(self)}.sock")
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.sock.bind(self.sock_path)
+            self.sock.setblocking(False)
+        return self.sock.fileno()
+
+    def wait(self, after=0, timeout=None):
+        # Block until a status newer than `after` is published. If the
+        # publisher restarted, follow it to its new segment and start again
+        # from 0; callers spot the restart by 'generation' changing.
+        fd = self.fileno()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Check before sleeping: a wake-up sent after this check stays queued
+            item = self.latest(after)
+            if item is not None:
+                return item
+            if self.reattach():
+                after = 0
+                continue
+            remaining = REATTACH_INTERVAL
+            if deadline is not None:
+                remaining = min(remaining, deadline - time.monotonic())
+                if remaining <= 0:
+                    return None
+            if not select.select([fd], [], [], remaining)[0]:
+                continue
+            try:
+                while True:
+                    self.sock.recv(64)
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        self.record = self.seq_word = None
+        if self.sock is not None:
+            self.sock.close()
+            if self.sock_path:
+                try:
+                    os.unlink(self.sock_path)
+                except FileNotFoundError:
+                    pass
+        shm_segments.release(self.shm, self.owner)
+
+
+if __name__ == "__main__":
+    # Print every status as it is published
+    bus = StatusBus.attach()
+    last = 0
+    try:
+        while True:
+            status = bus.wait(after=last)
+            last = status['seq']
+            labels = ", ".join(f"{e} ({c:.2f})" for _, e, c in status['faces']) or "no face"
+            print(f"[{time.ctime(status['ts'])}] {labels}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.close()
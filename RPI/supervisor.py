@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# One asyncio process in place of master.sh + cam_qual.py + model_eval.py +
+# temp_record.py + servo_control.py (+ record_surveillance.py). Each stage is
+# a coroutine; blocking work (capture, inference, sensor reads, servo moves)
+# runs in executors and stages talk through bounded queues.
+#
+#   python3 supervisor.py                 # on the Pi
+#   python3 supervisor.py --mock --duration 60   # desktop: mocked camera, DHT22, GPIO
+import argparse
+import asyncio
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import metrics
+import risk_engine
+from sensor_history import SensorHistory
+from inference_scheduler import InferenceScheduler, RISE_WINDOW
+from risk_engine import CabinRiskEngine, detection_events
+
+# Constants (the decision rules themselves are risk_engine.RULES)
+SENSOR_INTERVAL = 2.0    # DHT22 needs ~2 s between reads
+LATENCY_BUDGET = 0.5     # warn when sensor-to-actuation exceeds this (s)
+RECORD_COMMAND = ["python3", "record_surveillance.py"]
+
+# Instrumentation (metrics.py; no-ops unless CARTAKER_METRICS=1)
+CAPTURE_TIME = metrics.timer('capture_seconds', "Camera capture per frame")
+INFERENCE_TIME = metrics.timer('inference_seconds', "Detection + classification per frame")
+DROPPED = metrics.counter('frames_dropped_total', "Frames replaced before inference took them")
+SKIPPED = metrics.counter('frames_skipped_total', "Frames skipped by the inference scheduler")
+SENSOR_TO_ACTUATION = metrics.histogram('sensor_to_actuation_seconds', "Danger decision to servo command")
+
+
+# Put an item on a bounded queue, dropping the oldest entry when full, so a
+# slow consumer always gets the newest frame. Returns True if one was dropped.
+def put_latest(queue, item):
+    dropped = False
+    if queue.full():
+        queue.get_nowait()
+        dropped = True
+    queue.put_nowait(item)
+    return dropped
+
+
+# Close a generator that an io thread may still be inside (a capture that
+# outlived its cancelled task): wait for that step to return first
+def close_iterator(it):
+    close = getattr(it, 'close', None)
+    while close is not None:
+        try:
+            return close()
+        except ValueError:  # generator already executing
+            time.sleep(0.01)
+
+
+class Supervisor:
+    def __init__(self, camera, detector, sensor, servo, record_command=None, scheduler=None):
+        self.camera = camera            # iterable of (timestamp, frame)
+        self.detector = detector        # frame -> list of (box, emotion, confidence)
+        self.sensor = sensor            # callable -> (temperature, humidity[, co2]) or None
+        self.servo = servo              # object with setup() / open() / close() / release()
+        self.record_command = record_command
+        self.scheduler = scheduler      # InferenceScheduler, or None to infer on every frame
+        self.recorder = None
+        self.frames_iter = None         # the camera's iterator, closed at shutdown
+        self.history = SensorHistory()
+        self.engine = CabinRiskEngine(log_path=risk_engine.EVENT_LOG)  # replayable with replay_risk.py
+        # Engine time: monotonic, shifted once to wall time so its log lines up with sensor_history.bin
+        self.engine_offset = time.time() - time.monotonic()
+
+        self.frames = asyncio.Queue(maxsize=1)
+        self.events = asyncio.Queue(maxsize=64)
+        self.actions = asyncio.Queue(maxsize=4)
+        self.io_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="io")
+        self.infer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infer")
+
+        self.dropped_frames = 0
+        self.inferences = 0
+        self.latencies = []
+        self.stopping = asyncio.Event()
+
+    async def _run(self, pool, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+    # ── stages ──────────────────────────────────────────────────────────────
+    async def camera_loop(self):
+        frames = self.frames_iter = iter(self.camera)
+        while not self.stopping.is_set():
+            start = CAPTURE_TIME.start()
+            item = await self._run(self.io_pool, next, frames, None)
+            CAPTURE_TIME.stop(start)
+            if item is None:
+                return
+            if put_latest(self.frames, (time.monotonic(), item[1])):
+                self.dropped_frames += 1
+                DROPPED.inc()
+
+    async def inference_loop(self):
+        results = []
+        while True:
+            ts, frame = await self.frames.get()
+            if self.scheduler is not None and not self.scheduler.should_infer(frame)[0]:
+                # Static scene: the previous result still holds
+                SKIPPED.inc()
+                await self.events.put(('face', ts, results))
+                continue
+            cpu = time.process_time()
+            start = INFERENCE_TIME.start()
+            results = await self._run(self.infer_pool, self.detector, frame)
+            INFERENCE_TIME.stop(start)
+            self.inferences += 1
+            if self.scheduler is not None:
+                self.scheduler.record(bool(results), time.process_time() - cpu)
+            await self.events.put(('face', ts, results))
+
+    async def sensor_loop(self):
+        while True:
+            start = time.monotonic()
+            reading = await self._run(self.io_pool, self.sensor)
+            if reading is None:
+                self.history.add_gap(time.time())
+            else:
+                self.history.add(time.time(), *reading)
+                if self.scheduler is not None:
+                    self.scheduler.update_temperature(reading[0], self.history.temperature_rise_rate(RISE_WINDOW))
+            await self.events.put(('temp', time.monotonic(), reading))
+            await asyncio.sleep(max(0.0, SENSOR_INTERVAL - (time.monotonic() - start)))
+
+    async def decision_loop(self):
+        while True:
+            kind, ts, value = await self.events.get()
+            inputs = []
+            if kind == 'face':
+                if value:
+                    labels = ", ".join(f"{e} ({c:.2f})" for _, e, c in value)
+                    print(f"[{time.ctime()}] {len(value)} face(s): {labels}")
+                inputs = detection_events(value)
+            elif kind == 'temp' and value is not None:
+                temperature, humidity, *co2 = value
+                print(f"[{time.ctime()}] Temp: {temperature:.1f}°C | Humidity: {humidity:.1f}%")
+                inputs = [('temperature', temperature), ('humidity', humidity)]
+                if co2 and co2[0] is not None:
+                    inputs.append(('co2', co2[0]))
+            for name, v in inputs:
+                for decision in self.engine.update(ts + self.engine_offset, name, v):
+                    self.act(ts, decision)
+
+    def act(self, ts, decision):
+        reasons = ", ".join(decision.rules)
+        if decision.active and self.recorder is not None and self.recorder.returncode is None:
+            self.recorder.send_signal(signal.SIGUSR1)  # pin the dashcam footage around now
+        if decision.name == 'open_window':
+            print(f"[{time.ctime()}] {'danger' if decision.active else 'all clear'} ({reasons})")
+            # Only the newest window state matters; an older one may be dropped
+            put_latest(self.actions, (ts, decision.active))
+        elif decision.active:
+            print(f"[{time.ctime()}] ⚠ {decision.name} ({reasons})")
+
+    async def actuator_loop(self):
+        await self._run(self.io_pool, self.servo.setup)
+        try:
+            while True:
+                trigger_ts, open_window = await self.actions.get()
+                if open_window:
+                    latency = time.monotonic() - trigger_ts
+                    self.latencies.append(latency)
+                    SENSOR_TO_ACTUATION.observe(latency)
+                    if latency > LATENCY_BUDGET:
+                        print(f"[{time.ctime()}] ⚠ sensor-to-actuation {latency * 1000:.0f} ms over budget")
+                await self._run(self.io_pool, self.servo.open if open_window else self.servo.close)
+        finally:
+            self.servo.release()
+
+    async def recorder_loop(self):
+        # Keep the dashcam recorder running; restart it if it exits
+        while True:
+            proc = self.recorder = await asyncio.create_subprocess_exec(*self.record_command)
+            try:
+                code = await proc.wait()
+            except asyncio.CancelledError:
+                proc.terminate()
+                await proc.wait()
+                raise
+            print(f"[{time.ctime()}] recorder exited ({code}), restarting")
+            await asyncio.sleep(1)
+
+    # ── lifecycle ───────────────────────────────────────────────────────────
+    async def run(self, duration=None):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        stages = [self.camera_loop(), self.inference_loop(), self.sensor_loop(),
+                  self.decision_loop(), self.actuator_loop()]
+        if self.record_command:
+            stages.append(self.recorder_loop())
+        tasks = [asyncio.create_task(s) for s in stages]
+
+        try:
+            await asyncio.wait_for(self.stopping.wait(), timeout=duration)
+        except asyncio.TimeoutError:
+            pass
+        print(f"\n[{time.ctime()}] 🛑 shutting down…")
+        self.stopping.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.frames_iter is not None:
+            # Runs the source's cleanup (PicameraSource stops and closes the
+            # camera) on the io threads that drive it
+            await self._run(self.io_pool, close_iterator, self.frames_iter)
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+        self.infer_pool.shutdown(wait=False, cancel_futures=True)
+        self.history.close()
+        self.engine.close()
+        self.report()
+
+    def report(self):
+        print(f"inferences: {self.inferences}, dropped frames: {self.dropped_frames}")
+        if self.scheduler is not None:
+            self.scheduler.report()
+        self.engine.report()
+        if self.latencies:
+            ms = np.array(self.latencies) * 1000
+            print(f"sensor-to-actuation: {len(ms)} actuation(s), p50 {np.percentile(ms, 50):.1f} ms,"
+                  f" max {ms.max():.1f} ms (budget {LATENCY_BUDGET * 1000:.0f} ms)")
+
+
+# ── pluggable components ─────────────────────────────────────────────────────
+class GPIOServo:
+    """Keeps one PWM channel for the daemon's lifetime; moves run on the actuator thread."""
+
+    def __init__(self, gpio=None):
+        self.gpio = gpio
+
+    def setup(self):
+        from actuator import ServoActuator
+        self.actuator = ServoActuator(gpio=self.gpio).start()
+
+    def spin(self):
+        # Returns at once; a new danger while the window is closing reopens it
+        return self.actuator.spin()
+
+    def open(self):
+        # Emergency priority: cancels a close that is queued or already moving
+        return self.actuator.open()
+
+    def close(self):
+        return self.actuator.close()
+
+    def release(self):
+        self.actuator.stop()
+
+
+def model_detector():
+    # Imported here so TensorFlow loads in the supervisor only when needed
+    import cv2
+    import model_eval as me
+
+    def detect(frame):
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = me.detect_faces(gray)
+        results = me.classify_frames([gray], [faces])[0] if len(faces) else []
+        # Once the first result is out, write the fast-load copy of the Keras
+        # model for the next start (a no-op after the first call)
+        me.export_pending(me.backend)
+        return results
+    return detect
+
+
+def synthetic_detector(source):
+    # Reports the synthetic ellipses as neutral faces, with a model-like delay
+    boxes = [tuple(b) for b in source.boxes()]
+
+    def detect(frame):
+        time.sleep(0.05)
+        return [(b, 'Neutral', 0.9) for b in boxes]
+    return detect
+
+
+def dht_sensor():
+    import board
+    import adafruit_dht
+    from temp_record import read_sensor
+    sensor = adafruit_dht.DHT22(board.D17)  # GPIO17 (pin 11)
+    return lambda: read_sensor(sensor)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='CarTaker supervisor daemon')
+    parser.add_argument('--mock', action='store_true', help="mock camera, DHT22, GPIO and model")
+    parser.add_argument('--duration', type=float, help="stop after N seconds")
+    parser.add_argument('--no-record', action='store_true', help="don't start the dashcam recorder")
+    parser.add_argument('--fixed-rate', action='store_true', help="infer on every frame (no adaptive scheduling)")
+    args = parser.parse_args()
+
+    if args.mock:
+        import hw_mocks
+        hw_mocks.install()
+        from frame_sources import SyntheticSource
+        camera = SyntheticSource(size=(640, 480), faces=1, interval=0.2)
+        detector = synthetic_detector(camera)
+        from temp_record import read_sensor
+        mock_dht = hw_mocks.MockDHT22(start_temp=48.0, rise_per_min=20.0, fail_rate=0.1)
+        sensor = lambda: read_sensor(mock_dht)
+    else:
+        from frame_sources import PicameraSource
+        camera = PicameraSource(interval=0.5)
+        detector = model_detector()
+        sensor = dht_sensor()
+
+    record = None if args.mock or args.no_record else RECORD_COMMAND
+    scheduler = None if args.fixed_rate else InferenceScheduler()
+    metrics_log = metrics.start('supervisor')
+    asyncio.run(Supervisor(camera, detector, sensor, GPIOServo(), record, scheduler).run(args.duration))
+    if metrics_log is not None:
+        metrics_log.close()
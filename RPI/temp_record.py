@@ -1,21 +1,55 @@
 import time
 import board
 import adafruit_dht
+import metrics
+from sensor_history import SensorHistory
 
-# Initialize DHT22 sensor on GPIO17 (pin 11)
-dht_sensor = adafruit_dht.DHT22(board.D17)
+RISE_WINDOW = 300  # seconds over which the rate of temperature rise is reported
 
-while True:
-    try:
-        temperature = dht_sensor.temperature
-        humidity    = dht_sensor.humidity
-
-        if temperature is not None and humidity is not None:
-            print(f"Temp: {temperature:.1f}°C | Humidity: {humidity:.1f}%")
-        else:
-            print("Sensor error, retrying…")
+SENSOR_READ = metrics.timer('sensor_read_seconds', "DHT22 temperature + humidity read")
+SENSOR_FAILURES = metrics.counter('sensor_failures_total', "Failed DHT22 reads")
+TEMPERATURE = metrics.gauge('cabin_temperature_celsius', "Last cabin temperature")
+HUMIDITY = metrics.gauge('cabin_humidity_percent', "Last cabin relative humidity")
 
+# Read temperature and humidity once; None on a failed read
+def read_sensor(dht_sensor):
+    try:
+        with SENSOR_READ:
+            temperature = dht_sensor.temperature
+            humidity    = dht_sensor.humidity
     except RuntimeError as e:
+        SENSOR_FAILURES.inc()
         print(f"Runtime error: {e}, retrying in 2 seconds…")
+        return None
+
+    if temperature is None or humidity is None:
+        SENSOR_FAILURES.inc()
+        print("Sensor error, retrying…")
+        return None
+    TEMPERATURE.set(temperature)
+    HUMIDITY.set(humidity)
+    return temperature, humidity
+
+if __name__ == "__main__":
+    # Initialize DHT22 sensor on GPIO17 (pin 11)
+    dht_sensor = adafruit_dht.DHT22(board.D17)
+    history = SensorHistory()
+    metrics_log = metrics.start('temp_record')
+
+    try:
+        while True:
+            reading = read_sensor(dht_sensor)
+            if reading is not None:
+                temperature, humidity = reading
+                history.add(time.time(), temperature, humidity)
+                rate = history.temperature_rise_rate(RISE_WINDOW)
+                trend = f" | {rate:+.2f}°C/min" if rate is not None else ""
+                print(f"Temp: {temperature:.1f}°C | Humidity: {humidity:.1f}%{trend}")
+            else:
+                history.add_gap(time.time())
 
-    time.sleep(2)
+            time.sleep(2)
+    finally:
+        history.close()
+        if metrics_log is not None:
+            metrics_log.close()